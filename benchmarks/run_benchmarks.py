@@ -0,0 +1,273 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+
+from benchmarks.synthetic import SCALES, build_database
+from db import db_init
+from db.db_pool import get_pooled_connection, close_connection
+from utils import logger
+
+# ============================================
+# 🔹 BENCHMARKI GORĄCYCH ŚCIEŻEK db_manager
+# ============================================
+# python -m benchmarks.run_benchmarks --scales small,medium --ops 200
+# Każdy benchmark dostaje świeżą kopię bazy danej skali, więc wyniki są
+# powtarzalne. Wyniki trafiają do benchmarks/results/*.json.
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    """Rejestruje benchmark: funkcja(ctx) -> callable wykonujący jedną operację."""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+#region BENCHMARKI
+@benchmark("get_new_events")
+def _bench_get_new_events(ctx):
+    from db.db_manager import get_new_events
+    return lambda: get_new_events()
+
+
+@benchmark("process_event")
+def _bench_process_event(ctx):
+    from db.db_manager import get_new_events
+    from core.event_processor import process_event
+    events = iter(get_new_events(ctx["ops"] + ctx["warmup"]))
+    # process_event zwraca False dla eventu oznaczonego jako błędny — liczy się jako błąd
+    return lambda: process_event(next(events))
+
+
+@benchmark("drain_events_batch")
+def _bench_drain_events(ctx):
+    from core.event_processor import drain_events
+
+    def op():
+        # błąd: paczka z błędnymi eventami albo pusta kolejka (nic nie przetworzono)
+        done, failed = drain_events(batch_size=100, max_batches=1)
+        return done > 0 and failed == 0
+    return op
+
+
+@benchmark("add_products_to_stock")
+def _bench_add_products_to_stock(ctx):
+    from db.db_manager import add_products_to_stock
+    product_ids = ctx["pallet_products"]
+    rng = ctx["rng"]
+    return lambda: add_products_to_stock(rng.choice(product_ids), rng.randint(1, 30))
+
+
+@benchmark("get_all_boxes")
+def _bench_get_all_boxes(ctx):
+    from db.db_manager import get_all_boxes
+    return lambda: get_all_boxes()
+
+
+@benchmark("iter_boxes")
+def _bench_iter_boxes(ctx):
+    from db.db_manager import iter_boxes
+    return lambda: sum(1 for _ in iter_boxes())
+
+
+@benchmark("get_boxes_page_by_product")
+def _bench_get_boxes_page_by_product(ctx):
+    from db.db_manager import get_boxes_page
+    product_ids = ctx["pallet_products"]
+    rng = ctx["rng"]
+    return lambda: get_boxes_page(0, 20, product_id=rng.choice(product_ids))
+
+
+@benchmark("take_products_from_palets")
+def _bench_take_products_from_palets(ctx):
+    from db.db_manager import take_products_from_palets
+    product_ids = ctx["pallet_products"]
+    rng = ctx["rng"]
+
+    def op():
+        # pobranie mniejsze niż żądane (albo None) liczy się jako błąd
+        quantity = rng.randint(1, 30)
+        return (take_products_from_palets(rng.choice(product_ids), quantity) or 0) >= quantity
+    return op
+
+
+@benchmark("assign_product_from_pallet_to_box")
+def _bench_assign_product_from_pallet_to_box(ctx):
+    from db.db_manager import assign_product_from_pallet_to_box
+    conn = get_pooled_connection()
+    empty_boxes = iter([r[0] for r in conn.execute(
+        "SELECT id FROM boxes WHERE product_id IS NULL ORDER BY id")])
+    pallets = conn.execute("SELECT id, product_id FROM external_palets ORDER BY id").fetchall()
+    rng = ctx["rng"]
+
+    def op():
+        pallet_id, product_id = rng.choice(pallets)
+        return assign_product_from_pallet_to_box(pallet_id, product_id, next(empty_boxes), 1)
+    return op
+#endregion
+#region POMIAR
+def _copy_database(src, dst):
+    source = sqlite3.connect(src)
+    target = sqlite3.connect(dst)
+    source.backup(target)
+    target.close()
+    source.close()
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))]
+
+
+def run_one(name, base_db, workdir, ops, warmup, seed):
+    db_path = os.path.join(workdir, f"{name}.db")
+    _copy_database(base_db, db_path)
+    old_path = db_init.DB_PATH
+    db_init.DB_PATH = db_path
+
+    statements = [0]
+    try:
+        conn = get_pooled_connection()
+        ctx = {
+            "ops": ops,
+            "warmup": warmup,
+            "rng": random.Random(seed),
+            "pallet_products": [r[0] for r in conn.execute(
+                "SELECT DISTINCT product_id FROM external_palets")],
+        }
+        op = BENCHMARKS[name](ctx)
+
+        for _ in range(warmup):
+            op()
+
+        conn.set_trace_callback(lambda sql: statements.__setitem__(0, statements[0] + 1))
+        latencies = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(ops):
+            t0 = time.perf_counter()
+            result = op()
+            latencies.append(time.perf_counter() - t0)
+            if result is None or result is False:
+                errors += 1
+        total = time.perf_counter() - started
+        conn.set_trace_callback(None)
+    finally:
+        close_connection()
+        db_init.DB_PATH = old_path
+
+    latencies.sort()
+    return {
+        "ops": ops,
+        "errors": errors,
+        "seconds": round(total, 6),
+        "ops_per_sec": round(ops / total, 2) if total else None,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 4),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 4),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 4),
+        "sql_statements": statements[0],
+        "sql_per_op": round(statements[0] / ops, 2) if ops else None,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def _print_table(scale, sizes, results, baseline=None):
+    print(f"\n=== {scale}: {sizes['products']} products, {sizes['boxes']} boxes, "
+          f"{sizes['pallets']} pallets, {sizes['events']} events (built in {sizes['build_seconds']}s) ===")
+    header = f"{'benchmark':<36}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'sql/op':>9}{'err':>6}"
+    if baseline:
+        header += f"{'Δ ops/s':>10}"
+    print(header)
+    for name, r in results.items():
+        line = (f"{name:<36}{r['ops_per_sec']:>12,.1f}{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+                f"{r['sql_per_op']:>9.1f}{r['errors']:>6}")
+        old = (baseline or {}).get(name)
+        if old and old.get("ops_per_sec"):
+            line += f"{(r['ops_per_sec'] / old['ops_per_sec'] - 1) * 100:>+9.1f}%"
+        print(line)
+#endregion
+#region URUCHAMIANIE
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for db_manager hot paths.")
+    parser.add_argument("--scales", default="small", help=f"comma separated: {', '.join(SCALES)}")
+    parser.add_argument("--only", default="", help="comma separated benchmark names")
+    parser.add_argument("--ops", type=int, default=200, help="measured operations per benchmark")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured operations before timing")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare", help="previous results JSON to compare against")
+    parser.add_argument("--no-save", action="store_true", help="don't write results JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    names = [n for n in args.only.split(",") if n] or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f).get("scales", {})
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "ops": args.ops,
+        "seed": args.seed,
+        "scales": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="warehouse-bench-") as workdir:
+        # logi benchmarku nie zaśmiecają konsoli ani katalogu projektu
+        logger.LOG_DIR = os.path.join(workdir, "logs")
+        logger.set_console_level(None)
+
+        for scale in [s for s in args.scales.split(",") if s]:
+            base_db = os.path.join(workdir, f"base_{scale}.db")
+            sizes = build_database(base_db, scale, seed=args.seed)
+            results = {name: run_one(name, base_db, workdir, args.ops, args.warmup, args.seed)
+                       for name in names}
+            report["scales"][scale] = {"sizes": sizes, "results": results}
+            _print_table(scale, sizes, results,
+                         (baseline or {}).get(scale, {}).get("results"))
+
+        logger.flush()
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"bench_{stamp}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results saved to {path}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
+#endregion
@@ -0,0 +1,119 @@
+import json
+import random
+import time
+
+from db import db_init
+
+# ============================================
+# 🔹 SYNTETYCZNE MAGAZYNY DO BENCHMARKÓW
+# ============================================
+
+SCALES = {
+    "small":  {"products": 100,    "boxes": 1_000,   "pallets": 500,    "events": 2_000},
+    "medium": {"products": 1_000,  "boxes": 20_000,  "pallets": 5_000,  "events": 20_000},
+    "large":  {"products": 10_000, "boxes": 200_000, "pallets": 50_000, "events": 100_000},
+}
+
+# Ile wierszy na jeden executemany
+CHUNK = 20_000
+
+
+def _chunks(rows, size=CHUNK):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _grid_for(num_boxes):
+    """Siatka slotów z ~30% zapasem nad liczbą boxów (10 kolumn x 20 poziomów na alejkę)."""
+    per_aisle = 10 * 20
+    aisles = max(1, int(num_boxes * 1.3) // per_aisle + 1)
+    return aisles, 10, 20
+
+
+def build_database(path, scale="small", seed=42):
+    """
+    Tworzy bazę pod `path` z produktami, boxami (w slotach), paletami
+    i zaległymi eventami. Zwraca słownik z rozmiarami.
+    """
+    sizes = SCALES[scale] if isinstance(scale, str) else scale
+    rng = random.Random(seed)
+    old_path = db_init.DB_PATH
+    db_init.DB_PATH = path
+    started = time.perf_counter()
+    try:
+        db_init.initialize_database()
+        db_init.generate_slots(*_grid_for(sizes["boxes"]))
+
+        conn = db_init.get_connection()
+        n_products = sizes["products"]
+        conn.executemany(
+            "INSERT INTO products (name, weight, max_per_box) VALUES (?, ?, ?)",
+            ((f"SKU-{i:06d}", round(rng.uniform(0.1, 5.0), 2), rng.choice((5, 10, 20, 50)))
+             for i in range(n_products)),
+        )
+        max_per_box = dict(conn.execute("SELECT id, max_per_box FROM products"))
+        product_ids = list(max_per_box)
+
+        # boxy: ~1/3 pustych, reszta częściowo/pełne; każdy w swoim slocie
+        slot_ids = (r[0] for r in conn.execute("SELECT id FROM slots ORDER BY aisle, col, slot").fetchall())
+
+        def box_rows():
+            for i in range(sizes["boxes"]):
+                slot_id = next(slot_ids)
+                barcode = f"BOX_S{i:08d}"
+                if i % 3 == 0:
+                    yield (barcode, None, 0, 0, slot_id)
+                else:
+                    pid = rng.choice(product_ids)
+                    cap = max_per_box[pid]
+                    yield (barcode, pid, rng.randint(1, cap), cap, slot_id)
+
+        for chunk in _chunks(box_rows()):
+            conn.executemany(
+                "INSERT INTO boxes (barcode, product_id, quantity, max_capacity, slot_id) VALUES (?, ?, ?, ?, ?)",
+                chunk,
+            )
+        conn.execute("""
+            UPDATE slots SET
+                box_barcode = b.barcode,
+                status = CASE WHEN b.quantity > 0 THEN 'BOX_WITH_PRODUCTS' ELSE 'BOX_EMPTY' END
+            FROM boxes b
+            WHERE b.slot_id = slots.id
+        """)
+
+        for chunk in _chunks(
+            (f"PAL_S{i:08d}", rng.choice(product_ids), rng.randint(100, 1000))
+            for i in range(sizes["pallets"])
+        ):
+            conn.executemany(
+                "INSERT INTO external_palets (barcode, product_id, quantity) VALUES (?, ?, ?)", chunk
+            )
+
+        def event_rows():
+            for i in range(sizes["events"]):
+                kind = rng.random()
+                if kind < 0.2:
+                    yield ("ADD_PRODUCT_TYPE", json.dumps(
+                        {"name": f"EV-SKU-{i:08d}", "weight": 1.0, "max_per_box": 10}))
+                elif kind < 0.6:
+                    yield ("ADD_PALETTE", json.dumps(
+                        {"product_id": rng.choice(product_ids), "quantity": 200, "palet_name": f"EV-PAL-{i:08d}"}))
+                else:
+                    yield ("ADD_PRODUCTS_TO_STOCK", json.dumps(
+                        {"product_id": rng.choice(product_ids), "quantity": rng.randint(1, 40)}))
+
+        for chunk in _chunks(event_rows()):
+            conn.executemany("INSERT INTO events (event_type, payload) VALUES (?, ?)", chunk)
+
+        conn.commit()
+        conn.close()
+    finally:
+        db_init.DB_PATH = old_path
+
+    return {**sizes, "build_seconds": round(time.perf_counter() - started, 3)}
@@ -1,15 +1,75 @@
+import itertools
+
 from db.db_manager import *
+from core import metrics
+from db.consolidation import consolidate, apply_consolidation, print_plan
+from core.event_consumer import start_consumers, stop_consumers, wake_consumers
+
+# Ile pozycji listy pokazujemy na jednej stronie w menu
+MENU_PAGE_SIZE = 20
 
 def handle_exception(e):
     print(f"❌ Wystąpił błąd: {e}")
+
+
+def show_paged(items, format_item, page_size=MENU_PAGE_SIZE, prompt="Enter = dalej, q = koniec: "):
+    """
+    Wypisuje elementy strumienia stronami po `page_size`.
+    Zwraca (ile_pokazano, odpowiedź) — odpowiedź to tekst wpisany zamiast Enter
+    (np. wybrane ID) albo None, gdy lista się skończyła lub przerwano ją przez q.
+    """
+    shown = 0
+    for item in items:
+        print(format_item(item))
+        shown += 1
+        if shown % page_size == 0:
+            answer = input(prompt).strip()
+            if answer.lower() == "q":
+                return shown, None
+            if answer:
+                return shown, answer
+    return shown, None
+
+
+def format_box(b):
+    status = "ZAPEŁNIONY" if b.quantity > 0 else "WOLNY"
+    prod_name = b.product_name or "Brak produktu"
+    return f"{b.id}. {b.barcode} | {prod_name} | {b.quantity}/{b.max_capacity} szt. | {status} | Slot: {b.slot_id or 'Brak'}"
+
+
+def ask_box_filters():
+    """Pyta o filtry listy boxów; zwraca słownik dla iter_boxes."""
+    print("Filtr: Enter = wszystkie, e = puste, c = częściowe, f = pełne, p = produkt, a = alejka")
+    choice = input("Wybierz filtr: ").strip().lower()
+    if choice == "e":
+        return {"state": BOX_STATE_EMPTY}
+    if choice == "c":
+        return {"state": BOX_STATE_PARTIAL}
+    if choice == "f":
+        return {"state": BOX_STATE_FULL}
+    if choice == "p":
+        product = get_product_by_name(input("Nazwa produktu: ").strip())
+        if not product:
+            print("❌ Nie ma takiego produktu.")
+            return None
+        return {"product_id": product.id}
+    if choice == "a":
+        return {"aisle": input("Alejka (np. A): ").strip().upper()}
+    return {}
 #region GŁÓWNA PĘTLA APLIKACJI
 def core_loop():
-    while True:
-        # 🔹 Przetwarzanie nowych eventów
-        events = get_new_events()
-        for e in events:
-            process_event(e)
+    # 🔹 Eventy przetwarzają wątki w tle — menu nie wstrzymuje kolejki
+    metrics.start_dumper(backlog_fn=count_pending_by_lane)
+    start_consumers()
+    try:
+        _main_menu()
+    finally:
+        print("⏳ Kończenie przetwarzania eventów...")
+        stop_consumers()
 
+
+def _main_menu():
+    while True:
         # 🔹 Menu główne
         print("\n--- MENU GŁÓWNE ---")
         print("1️⃣ Dodaj typ produktu")
@@ -17,6 +77,9 @@ def core_loop():
         print("3️⃣ Pokaż stan magazynu")
         print("4️⃣ Zarządzanie paletami")
         print("5 Zarządzanie boxami")
+        print("7 Metryki eventów")
+        print("8 Zamówienie do kompletacji")
+        print("9 Lista kompletacji zamówienia")
         print("6 Wyjście")
         print("q️⃣ Pokaż kolejkę eventów")
 
@@ -33,51 +96,14 @@ def core_loop():
                     "weight": weight,
                     "max_per_box": max_per_box
                 })
+                wake_consumers()
 
             elif choice == "2":
                 add_product_from_pallet_to_warehouse()
 
             elif choice == "3":
-                # Wyświetlanie stanu magazynu
-                print("\n====== STAN MAGAZYNU ======\n")
-
-                # 1️⃣ Produkty w boksach (>0 sztuk)
-                boxes = get_all_boxes()  # pełne info o wszystkich boxach
-                items_in_boxes = [b for b in boxes if b["quantity"] > 0]
-
-                print("📦 Produkty w boksach:")
-                if not items_in_boxes:
-                    print("  - Brak produktów w boksach.")
-                else:
-                    for b in items_in_boxes:
-                        print(
-                            f"  - {b['product_name']} | Box: {b['barcode']} "
-                            f"| {b['quantity']}/{b['max_capacity']} szt."
-                        )
-
-                # 2️⃣ Palety zewnętrzne
-                palets = get_external_palets()
-                print("\n🪵 Palety zewnętrzne:")
-
-                if not palets:
-                    print("  - Brak palet.")
-                else:
-                    for p in palets:
-                        barcode = p["barcode"]
-                        product_id = p["product_id"]
-                        quantity = p["quantity"]
-                        prod = get_product_info(product_id)
-                        print(f" - Paleta {barcode}: {prod['name'] if prod else 'UNKNOWN'} x {quantity}")
-
-                # 3️⃣ Łączna liczba produktów w boksach
-                total_in_boxes = sum(b["quantity"] for b in items_in_boxes)
-                print(f"\n📊 Łączna liczba produktów w boksach: {total_in_boxes} szt.")
-
-                # 4️⃣ Liczba pustych boxów
-                empty_boxes = get_empty_boxes_count()
-                print(f"📭 Liczba pustych boksów: {empty_boxes}")
-
-                print("\n============================\n")
+                # Wyświetlanie stanu magazynu (z agregatów, bez skanowania boxów)
+                show_stock()
 
             elif choice == "4":
                 manage_palets_menu()
@@ -88,6 +114,28 @@ def core_loop():
                 print("👋 Koniec programu.")
                 break
 
+            elif choice == "7":
+                metrics.set_backlog(count_pending_by_lane())
+                metrics.print_metrics()
+                # błędy z wątków w tle nie idą na konsolę — tu je widać
+                failed = get_failed_events(5) or []
+                if failed:
+                    print("--- ❌ Ostatnie błędne eventy ---")
+                for event_id, event_type, error, processed_at in failed:
+                    print(f"#{event_id} | {event_type} | {processed_at} | {error}")
+                print(f"💾 Zapisano: {metrics.dump_metrics()}")
+
+            elif choice == "8":
+                add_pick_order()
+
+            elif choice == "9":
+                order_id = input("Numer zamówienia: ").strip()
+                lines = get_pick_list(order_id=order_id) or []
+                if not lines:
+                    print("❌ Brak listy kompletacji (zamówienie nieprzetworzone albo nie istnieje).")
+                for seq, _, name, barcode, slot_id, quantity in lines:
+                    print(f"{seq}. Slot {slot_id or 'Brak'} | box {barcode or '?'} | {name or '?'} x {quantity}")
+
             elif choice.lower() == "q":
                 show_pending_events()  # teraz pokazuje tylko nieprzetworzone eventy
 
@@ -97,6 +145,34 @@ def core_loop():
         except Exception as e:
             handle_exception(e)
 #endregion
+#region ZAMÓWIENIA
+def add_pick_order():
+    """Zbiera linie zamówienia i dodaje event PICK_ORDER."""
+    order_id = input("Numer zamówienia: ").strip()
+    if not order_id:
+        print("❌ Numer zamówienia jest wymagany.")
+        return
+    lines = []
+    while True:
+        name = input("Nazwa produktu (Enter = koniec): ").strip()
+        if not name:
+            break
+        product = get_product_by_name(name)
+        if not product:
+            print("❌ Nie ma takiego produktu.")
+            continue
+        qty = input("Ilość: ").strip()
+        if not qty.isdigit() or int(qty) <= 0:
+            print("❌ Nieprawidłowa ilość.")
+            continue
+        lines.append({"product_id": product.id, "quantity": int(qty)})
+    if not lines:
+        print("❌ Zamówienie bez linii — pomijam.")
+        return
+    add_event("PICK_ORDER", payload={"order_id": order_id, "lines": lines})
+    wake_consumers()
+    print(f"✅ Dodano zamówienie {order_id} ({len(lines)} linii) do kompletacji")
+#endregion
 #region ZARZĄDZANIE PALETAMI
 def manage_palets_menu():
     while True:
@@ -115,7 +191,7 @@ def manage_palets_menu():
                     print("❌ Brak produktów w bazie. Dodaj najpierw produkt typu.")
                     continue
                 for i, p in enumerate(products, start=1):
-                    print(f"{i}. {p['name']} (waga: {p['weight']} kg, max w boxie: {p['max_per_box']})")
+                    print(f"{i}. {p.name} (waga: {p.weight} kg, max w boxie: {p.max_per_box})")
 
                 try:
                     selection = int(input("Wybierz numer produktu: "))
@@ -125,14 +201,15 @@ def manage_palets_menu():
 
                     chosen = products[selection - 1]
                     palet_name = input("Nazwa palety: ").strip()
-                    quantity = int(input(f"Ilość produktu '{chosen['name']}' na palecie: "))
+                    quantity = int(input(f"Ilość produktu '{chosen.name}' na palecie: "))
 
                     add_event("ADD_PALETTE", payload={
-                        "product_id": chosen["id"],
+                        "product_id": chosen.id,
                         "quantity": quantity,
                         "palet_name": palet_name
                     })
-                    print(f"✅ Dodano event dodania palety '{palet_name}' z produktem '{chosen['name']}'")
+                    wake_consumers()
+                    print(f"✅ Dodano event dodania palety '{palet_name}' z produktem '{chosen.name}'")
 
                 except ValueError:
                     print("⚠️ Niepoprawny wybór — wprowadź numer.")
@@ -144,11 +221,11 @@ def manage_palets_menu():
                 else:
                     print("\n--- DOSTĘPNE PALETY ---")
                     for p in palets:
-                        barcode = p["barcode"]
-                        product_id = p["product_id"]
-                        quantity = p["quantity"]
+                        barcode = p.barcode
+                        product_id = p.product_id
+                        quantity = p.quantity
                         prod = get_product_info(product_id)
-                        print(f" - Paleta {barcode}: {prod['name'] if prod else 'UNKNOWN'} x {quantity}")
+                        print(f" - Paleta {barcode}: {prod.name if prod else 'UNKNOWN'} x {quantity}")
 
             elif choice == "3":
                 break
@@ -160,34 +237,6 @@ def manage_palets_menu():
             handle_exception(e)
 
 
-def process_event(event):
-    try:
-        payload = event.get("payload", {})
-
-        if event["event_type"] == "ADD_PRODUCT_TYPE":
-            add_product_type(
-                payload["name"],
-                payload["weight"],
-                payload["max_per_box"]
-            )
-
-        elif event["event_type"] == "ADD_PRODUCTS_TO_STOCK":
-            add_products_to_stock(payload["product_id"], payload["quantity"])
-
-        elif event["event_type"] == "ADD_PALETTE":
-            add_external_palet(
-                product_id=payload["product_id"],
-                quantity=payload["quantity"],
-                palet_name=payload.get("palet_name")
-            )
-
-        mark_event_processed(event["id"])
-
-    except Exception as e:
-        mark_event_as_failed(event["id"], str(e))
-        print(f"❌ Błąd podczas przetwarzania eventu {event['event_type']}: {e}")
-
-
 def add_product_from_pallet_to_warehouse():
     print("\n=== DODAWANIE PRODUKTU Z PALETY DO MAGAZYNU ===\n")
 
@@ -198,14 +247,19 @@ def add_product_from_pallet_to_warehouse():
         return
 
     # === 2. Wyświetl palety ===
-    print("Dostępne palety:")
-    for idx, p in enumerate(pallets, start=1):
-        prod = get_product_info(p["product_id"])
-        prod_name = prod["name"] if prod else "UNKNOWN"
-        print(f"{idx}. Paleta {p['barcode']} ({prod_name} x {p['quantity']})")
+    def format_pallet(item):
+        idx, p = item
+        prod = get_product_info(p.product_id)
+        prod_name = prod.name if prod else "UNKNOWN"
+        return f"{idx}. Paleta {p.barcode} ({prod_name} x {p.quantity})"
+
+    print("Dostępne palety (wpisz numer, aby wybrać od razu):")
+    _, choice = show_paged(enumerate(pallets, start=1), format_pallet,
+                           prompt="Enter = dalej, numer = wybierz, q = koniec listy: ")
 
     # === 3. Wybór palety indeksem, nie ID ===
-    choice = input("\nWybierz numer palety: ").strip()
+    if choice is None:
+        choice = input("\nWybierz numer palety: ").strip()
 
     if not choice.isdigit() or not (1 <= int(choice) <= len(pallets)):
         print("❌ Niepoprawny numer palety.\n")
@@ -214,10 +268,10 @@ def add_product_from_pallet_to_warehouse():
     pallet = pallets[int(choice) - 1]
 
     # paleta ma jeden produkt
-    product = get_product_info(pallet["product_id"])
-    available_qty = pallet["quantity"]
+    product = get_product_info(pallet.product_id)
+    available_qty = pallet.quantity
 
-    print(f"\n📦 Produkt na palecie: {product['name']} (x{available_qty})\n")
+    print(f"\n📦 Produkt na palecie: {product.name} (x{available_qty})\n")
 
     # === 4. Ile przenieść? ===
     qty_str = input("Ile sztuk chcesz przenieść do magazynu? ").strip()
@@ -230,20 +284,20 @@ def add_product_from_pallet_to_warehouse():
         print("❌ Ilość poza zakresem.\n")
         return
 
-    # === 5. Pobierz boxy ===
-    boxes = get_all_boxes()
-    if not boxes:
-        print("❌ Brak boxów w magazynie! Najpierw dodaj box.\n")
+    # === 5. Boxy z tym produktem (z wolnym miejscem) i puste — stronami ===
+    candidates = itertools.chain(
+        iter_boxes(product_id=product.id, state=BOX_STATE_PARTIAL),
+        iter_boxes(state=BOX_STATE_EMPTY),
+    )
+    print("\nDostępne boxy (wpisz ID, aby wybrać od razu):")
+    shown, box_id_str = show_paged(candidates, format_box, prompt="Enter = dalej, ID = wybierz, q = koniec listy: ")
+    if not shown:
+        print("❌ Brak wolnych boxów w magazynie! Najpierw dodaj box.\n")
         return
 
-    print("\nDostępne boxy:")
-    for b in boxes:
-        prod_name = b["product_name"] if b["product_name"] else "—"
-        status = "ZAPEŁNIONY" if b["quantity"] > 0 else "WOLNY"
-        print(f"{b['id']}. Box {b['barcode']} [{status}] (zawiera: {prod_name})")
-
     # === 6. Wybór boxa ===
-    box_id_str = input("\nWybierz ID boxa: ").strip()
+    if box_id_str is None:
+        box_id_str = input("\nWybierz ID boxa: ").strip()
 
     if not box_id_str.isdigit():
         print("❌ Nieprawidłowe ID boxa.\n")
@@ -253,8 +307,8 @@ def add_product_from_pallet_to_warehouse():
 
     # === 7. Przenieś produkty i zapisz w DB ===
     success = assign_product_from_pallet_to_box(
-        pallet_id=pallet["id"],
-        product_id=product["id"],
+        pallet_id=pallet.id,
+        product_id=product.id,
         box_id=box_id,
         quantity=qty_to_move
     )
@@ -272,6 +326,7 @@ def manage_boxes_menu():
         print("2️⃣ Pokaż wszystkie boxy")
         print("3️⃣ Usuń pusty box")
         print("4️⃣ Wróć do głównego menu")
+        print("5 Konsolidacja częściowych boxów")
 
         choice = input("Wybierz opcję: ").strip()
 
@@ -280,28 +335,26 @@ def manage_boxes_menu():
             print(f"\n📦 Utworzono pusty box {barcode}")
 
         elif choice == "2":
-            boxes = get_all_boxes()
-            if not boxes:
-                print("\nBrak boxów w magazynie.")
+            filters = ask_box_filters()
+            if filters is None:
+                continue
+            print("\nLista boxów:")
+            shown, _ = show_paged(iter_boxes(**filters), format_box)
+            if not shown:
+                print("Brak boxów w magazynie.")
             else:
-                print("\nLista boxów:")
-                for b in boxes:
-                    status = "ZAPEŁNIONY" if b["quantity"] > 0 else "WOLNY"
-                    prod_name = b["product_name"] or "Brak produktu"
-                    print(f"{b['id']}. {b['barcode']} | {prod_name} | {b['quantity']}/{b['max_capacity']} szt. | {status} | Slot: {b['slot_id'] or 'Brak'}")
+                print(f"📦 Łącznie: {count_boxes(**filters)} boxów")
 
         elif choice == "3":
-            boxes = get_all_boxes()
-            empty_boxes = [b for b in boxes if b["quantity"] == 0]
-            if not empty_boxes:
+            print("\nPuste boxy (wpisz ID, aby wybrać od razu):")
+            shown, box_id = show_paged(iter_boxes(state=BOX_STATE_EMPTY), lambda b: f"{b.id}. {b.barcode}",
+                                       prompt="Enter = dalej, ID = wybierz, q = koniec listy: ")
+            if not shown:
                 print("\nBrak pustych boxów do usunięcia.")
                 continue
 
-            print("\nPuste boxy:")
-            for b in empty_boxes:
-                print(f"{b['id']}. {b['barcode']}")
-
-            box_id = input("Wybierz ID boxa do usunięcia: ").strip()
+            if box_id is None:
+                box_id = input("Wybierz ID boxa do usunięcia: ").strip()
             if not box_id.isdigit():
                 print("❌ Niepoprawne ID.")
                 continue
@@ -315,6 +368,30 @@ def manage_boxes_menu():
         elif choice == "4":
             break
 
+        elif choice == "5":
+            # najpierw plan (dry-run), zapis dopiero po potwierdzeniu
+            plan, _ = consolidate()
+            print_plan(plan)
+            if not plan.moves:
+                print("✅ Nie ma czego konsolidować.")
+                continue
+            if input("Wykonać konsolidację? (t/n): ").strip().lower() != "t":
+                continue
+            # domyślnie opróżnione boxy są usuwane, a ich sloty zwalniane
+            delete_empty = input("Usunąć opróżnione boxy i zwolnić ich sloty? (T/n): ").strip().lower() != "n"
+            # zapisujemy pokazany plan (ruchy zmienione w międzyczasie są pomijane)
+            try:
+                stats = apply_consolidation(plan, delete_empty=delete_empty)
+            except Exception as e:
+                handle_exception(e)
+                stats = None
+            if stats:
+                print(f"🧩 Przeniesiono {stats['units_moved']} szt. w {stats['moves']} ruchach, "
+                      f"{'usunięto' if delete_empty else 'opróżniono'} {stats['boxes_freed']} boxów "
+                      f"(pominięte: {stats['skipped']})")
+            else:
+                print("❌ Błąd podczas konsolidacji.")
+
         else:
             print("❌ Niepoprawna opcja. Spróbuj ponownie.")
 #endregion
\ No newline at end of file
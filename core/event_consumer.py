@@ -0,0 +1,101 @@
+import os
+import threading
+
+from core.event_processor import drain_events, default_worker_id, EVENT_BATCH_SIZE
+from db.db_manager import EVENT_LEASE_SECONDS
+from db.db_pool import close_connection
+from utils import logger
+from utils.logger import log_info as log, log_error
+
+# ============================================
+# 🔹 KONSUMENT EVENTÓW W TLE (KONSOLA)
+# ============================================
+# Wątki w procesie konsoli, które cały czas opróżniają kolejkę eventów,
+# także wtedy, gdy operator siedzi w input(). Liczba wątków ogranicza
+# współbieżność (każdy ma własne połączenie z puli i własny lease),
+# a paczka po CONSUMER_BATCH_SIZE eventów ogranicza czas trzymania blokady
+# zapisu. stop_consumers() kończy bieżące paczki i zamyka połączenia.
+# Póki wątki działają, logi nie są wypisywane na konsolę (tylko do pliku) —
+# inaczej błędy eventów z tła przerywałyby operatorowi wpisywanie w menu.
+# Liczniki i ostatnie błędy są w menu 7 (metryki).
+
+CONSUMER_THREADS = max(int(os.environ.get("WAREHOUSE_CONSOLE_CONSUMERS", 1)), 1)
+# Mniejsze paczki niż w workerze — konsola też pisze do bazy
+CONSUMER_BATCH_SIZE = min(EVENT_BATCH_SIZE, 100)
+# Ile sekund wątek czeka, gdy kolejka jest pusta (wake_consumers() budzi wcześniej)
+CONSUMER_IDLE_SECONDS = 0.5
+# Pauza między paczkami — bez niej wątek od razu bierze blokadę zapisu ponownie
+# i zapisy z menu (add_event) czekałyby na busy_timeout aż kolejka się opróżni
+CONSUMER_BATCH_PAUSE_SECONDS = 0.01
+# Poziom logów na konsoli, gdy działają wątki (None = wyłączone)
+CONSUMER_CONSOLE_LEVEL = None
+
+_threads = []
+_stop = threading.Event()
+_wake = threading.Event()
+_console_level = None   # poziom sprzed start_consumers, przywracany w stop_consumers
+
+
+def _consume(worker_id, batch_size, lease_seconds, idle_seconds):
+    processed = failed = 0
+    try:
+        while not _stop.is_set():
+            try:
+                ok, bad = drain_events(batch_size, worker_id, lease_seconds, max_batches=1)
+            except Exception as e:
+                log_error(f"❌ Consumer {worker_id}: {e}")
+                ok = bad = 0
+            processed += ok
+            failed += bad
+            if ok or bad:
+                _stop.wait(CONSUMER_BATCH_PAUSE_SECONDS)
+                continue
+            _wake.wait(idle_seconds)
+            _wake.clear()
+    finally:
+        close_connection()
+        log(f"🛑 Consumer {worker_id} stopped: {processed} processed, {failed} failed")
+
+
+def start_consumers(threads=None, batch_size=CONSUMER_BATCH_SIZE, lease_seconds=EVENT_LEASE_SECONDS,
+                    idle_seconds=CONSUMER_IDLE_SECONDS):
+    """Uruchamia wątki konsumujące eventy (jeśli jeszcze nie działają)."""
+    global _console_level
+    if any(t.is_alive() for t in _threads):
+        return
+    _threads.clear()
+    _stop.clear()
+    threads = threads or CONSUMER_THREADS
+    _console_level = logger.CONSOLE_LEVEL
+    logger.set_console_level(CONSUMER_CONSOLE_LEVEL)
+    for i in range(threads):
+        worker_id = f"{default_worker_id('console')}:{i}"
+        t = threading.Thread(target=_consume, name=f"event-consumer-{i}", daemon=True,
+                             args=(worker_id, batch_size, lease_seconds, idle_seconds))
+        t.start()
+        _threads.append(t)
+    log(f"🛠 Started {threads} event consumer thread(s) (batch={batch_size})")
+
+
+def wake_consumers():
+    """Budzi czekające wątki (np. zaraz po dodaniu eventu)."""
+    _wake.set()
+
+
+def stop_consumers(timeout=None):
+    """Zatrzymuje wątki po dokończeniu bieżących paczek. True, jeśli wszystkie się zakończyły."""
+    global _console_level
+    _stop.set()
+    _wake.set()
+    for t in _threads:
+        t.join(timeout)
+    alive = [t for t in _threads if t.is_alive()]
+    _threads[:] = alive
+    if not alive and _console_level is not None:
+        logger.set_console_level(_console_level)
+        _console_level = None
+    return not alive
+
+
+def consumers_running():
+    return any(t.is_alive() for t in _threads)
@@ -0,0 +1,184 @@
+import os
+import socket
+import time
+
+from db.db_manager import *
+from core import metrics
+from utils.errors import LeaseLostError
+from utils.logger import log_info as log, log_error
+
+# Ile eventów pobieramy i zatwierdzamy w jednej transakcji
+EVENT_BATCH_SIZE = 500
+# Ile zamówień PICK_ORDER z jednej paczki kompletujemy jedną falą (jedną trasą)
+PICK_WAVE_SIZE = 100
+
+
+#region OBSŁUGA EVENTÓW
+def apply_event(event):
+    """
+    Wykonuje akcję eventu. Rzuca wyjątek przy błędnym payloadzie, nieznanym
+    typie eventu i błędzie zapisu — event zostanie wtedy oznaczony jako nieudany.
+    Funkcje db_manager wołamy przez .strict (bez połykania wyjątków).
+    """
+    payload = event.payload or {}
+
+    if event.event_type == "ADD_PRODUCT_TYPE":
+        # walidacja tutaj, bo add_product_type tylko loguje złe dane
+        name, weight, max_per_box = validate_product(payload["name"], payload["weight"], payload["max_per_box"])
+        add_product_type.strict(name, weight, max_per_box)
+
+    elif event.event_type == "ADD_PRODUCTS_TO_STOCK":
+        add_products_to_stock.strict(payload["product_id"], payload["quantity"], payload.get("reservation_id"))
+
+    elif event.event_type == "ADD_PALETTE":
+        product_id, quantity, palet_name = validate_palet(
+            payload["product_id"], payload["quantity"], payload.get("palet_name")
+        )
+        add_external_palet.strict(product_id=product_id, quantity=quantity, palet_name=palet_name)
+
+    elif event.event_type == "PICK_ORDER":
+        pick_orders([payload], allow_partial=bool(payload.get("allow_partial")))
+
+    else:
+        raise ValueError(f"Nieznany typ eventu: {event.event_type}")
+
+
+def process_event(event):
+    """
+    Przetwarza pojedynczy event (osobna transakcja + potwierdzenie).
+    Zwraca True, gdy event się udał, False, gdy został oznaczony jako błędny.
+    """
+    started = time.perf_counter()
+    try:
+        with transaction():
+            apply_event(event)
+        mark_event_processed(event.id)
+        metrics.record_event(event.event_type, time.perf_counter() - started, event.created_at)
+        return True
+
+    except Exception as e:
+        mark_event_as_failed(event.id, str(e))
+        metrics.record_event(event.event_type, time.perf_counter() - started, event.created_at, ok=False)
+        log_error(f"❌ Błąd podczas przetwarzania eventu {event.id} {event.event_type}: {e}")
+        return False
+#endregion
+#region PRZETWARZANIE WSADOWE
+def process_events_batch(events, worker_id=None):
+    """
+    Przetwarza paczkę eventów w jednej transakcji, po kolei (po id).
+    Każdy event ma własny SAVEPOINT — błąd wycofuje tylko ten event,
+    a potwierdzenia (processed / failed) idą jednym zbiorczym UPDATE.
+    Jeśli podano worker_id, a część lease już wygasła (event przejął inny
+    worker), cała paczka jest wycofywana — LeaseLostError.
+    Kolejne po sobie zamówienia PICK_ORDER są kompletowane falą (_pick_wave) —
+    wszystkie starsze eventy z paczki są już wtedy wykonane.
+    Zwraca (liczba_ok, liczba_błędów).
+    """
+    done, failed = [], []
+    timings = []   # (event, czas, ok) — do metryk po zatwierdzeniu paczki
+
+    # IMMEDIATE: blokada zapisu od razu — przy kilku workerach transakcja
+    # odroczona mogłaby dostać SQLITE_BUSY przy pierwszym zapisie po odczycie
+    with transaction(immediate=True):
+        i = 0
+        while i < len(events):
+            run = _wave_run(events, i) or [events[i]]
+            if len(run) < 2 or not _pick_wave(run, done, timings):
+                # pojedynczo: zwykły event albo zamówienia z fali, która się nie udała
+                for event in run:
+                    _apply_one(event, done, failed, timings)
+            i += len(run)
+
+        acked = mark_events_processed(done, worker_id) if done else 0
+        if acked is None:
+            raise RuntimeError("Nie udało się potwierdzić przetworzonych eventów")
+        nacked = mark_events_as_failed(failed, worker_id) if failed else 0
+        if nacked is None:
+            raise RuntimeError("Nie udało się oznaczyć błędnych eventów")
+        if worker_id is not None and acked + nacked < len(events):
+            raise LeaseLostError(
+                f"{len(events) - acked - nacked} z {len(events)} eventów przejął inny worker"
+            )
+
+    done_at = time.time()
+    for event, seconds, ok in timings:
+        metrics.record_event(event.event_type, seconds, event.created_at, ok, done_at)
+    return len(done), len(failed)
+
+
+def _apply_one(event, done, failed, timings):
+    started = time.perf_counter()
+    try:
+        with transaction():
+            apply_event(event)
+        done.append(event.id)
+        timings.append((event, time.perf_counter() - started, True))
+    except Exception as e:
+        failed.append((event.id, str(e)))
+        timings.append((event, time.perf_counter() - started, False))
+        log_error(f"❌ Błąd podczas przetwarzania eventu {event.id} {event.event_type}: {e}")
+
+
+def _wavable(event):
+    return event.event_type == "PICK_ORDER" and not (event.payload or {}).get("allow_partial")
+
+
+def _wave_run(events, start):
+    """Ciąg kolejnych zamówień PICK_ORDER (bez allow_partial) od `start`, najwyżej PICK_WAVE_SIZE."""
+    end = start
+    while end < len(events) and end - start < PICK_WAVE_SIZE and _wavable(events[end]):
+        end += 1
+    return events[start:end]
+
+
+def _pick_wave(wave, done, timings):
+    """
+    Kompletuje zamówienia jedną falą (wspólna trasa). Fala, która się nie uda
+    (brak towaru w którymś zamówieniu), jest wycofywana (SAVEPOINT) — False,
+    a jej zamówienia idą potem pojedynczo.
+    """
+    started = time.perf_counter()
+    try:
+        with transaction():
+            pick_orders([e.payload or {} for e in wave])
+    except Exception:
+        return False
+    per_event = (time.perf_counter() - started) / len(wave)
+    for event in wave:
+        done.append(event.id)
+        timings.append((event, per_event, True))
+    return True
+
+
+def default_worker_id(role="worker"):
+    return f"{role}:{socket.gethostname()}:{os.getpid()}"
+
+
+def drain_events(batch_size=EVENT_BATCH_SIZE, worker_id=None, lease_seconds=EVENT_LEASE_SECONDS,
+                 max_batches=None):
+    """
+    Przetwarza kolejkę paczkami po batch_size eventów.
+    Każda paczka jest najpierw rezerwowana (lease) dla worker_id, więc
+    kilka procesów może opróżniać kolejkę równolegle.
+    """
+    worker_id = worker_id or default_worker_id("console")
+    total_ok = total_failed = batches = 0
+
+    while max_batches is None or batches < max_batches:
+        events = claim_events(worker_id, batch_size, lease_seconds)
+        if not events:
+            break
+        batches += 1
+        try:
+            ok, failed = process_events_batch(events, worker_id)
+        except Exception as e:
+            log_error(f"❌ Batch of {len(events)} events rolled back: {e}")
+            release_events(worker_id, [ev.id for ev in events])
+            break
+        total_ok += ok
+        total_failed += failed
+
+    if total_ok or total_failed:
+        log(f"📬 Drained events: {total_ok} processed, {total_failed} failed")
+    return total_ok, total_failed
+#endregion
@@ -0,0 +1,297 @@
+import atexit
+import bisect
+import datetime
+import json
+import os
+import threading
+import time
+
+from utils import logger
+
+# ============================================
+# 🔹 METRYKI PRZETWARZANIA EVENTÓW
+# ============================================
+# Liczniki i histogramy per typ eventu, trzymane w pamięci procesu:
+#   - czas przetwarzania (apply_event),
+#   - opóźnienie od dodania eventu (created_at) do potwierdzenia,
+#   - przetworzone / błędne, długość kolejki przy zrzucie (także per pas
+#     priorytetów — db/event_lanes.py).
+# Zrzut do pliku co METRICS_INTERVAL_SECONDS (JSON albo tekst Prometheusa,
+# np. dla node_exporter --collector.textfile). Każdy proces pisze własny plik.
+
+# Granice kubełków histogramów (sekundy)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+METRICS_DIR = os.environ.get("WAREHOUSE_METRICS_DIR") or os.path.join(logger.BASE_DIR, "metrics")
+METRICS_FORMAT = os.environ.get("WAREHOUSE_METRICS_FORMAT", "json").lower()   # json | prom
+METRICS_INTERVAL_SECONDS = float(os.environ.get("WAREHOUSE_METRICS_INTERVAL", 15))
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # ostatni = +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Przybliżony kwantyl (górna granica kubełka)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class _TypeStats:
+    __slots__ = ("processed", "failed", "processing", "latency")
+
+    def __init__(self):
+        self.processed = 0
+        self.failed = 0
+        self.processing = Histogram()
+        self.latency = Histogram()
+
+
+_lock = threading.Lock()
+_types = {}
+_backlog = None
+_lane_backlog = {}
+_started = time.time()
+
+
+def _created_epoch(created_at):
+    # created_at z SQLite: "YYYY-MM-DD HH:MM:SS" w UTC
+    try:
+        return datetime.datetime.fromisoformat(created_at).replace(tzinfo=datetime.timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+#region API
+def record_event(event_type, processing_seconds, created_at=None, ok=True, done_at=None):
+    """Rejestruje jeden przetworzony (ok=True) albo błędny event."""
+    created = _created_epoch(created_at) if created_at else None
+    done_at = done_at or time.time()
+    with _lock:
+        stats = _types.get(event_type)
+        if stats is None:
+            stats = _types[event_type] = _TypeStats()
+        if ok:
+            stats.processed += 1
+        else:
+            stats.failed += 1
+        stats.processing.observe(processing_seconds)
+        if created is not None:
+            stats.latency.observe(max(done_at - created, 0.0))
+
+
+def set_backlog(pending):
+    """
+    Ostatnio zmierzona długość kolejki (oczekujące eventy) — liczba albo
+    słownik {pas: liczba} z count_pending_by_lane.
+    """
+    global _backlog, _lane_backlog
+    if isinstance(pending, dict):
+        _lane_backlog = dict(pending)
+        pending = sum(pending.values())
+    _backlog = pending
+
+
+def reset():
+    global _backlog, _lane_backlog, _started
+    with _lock:
+        _types.clear()
+        _backlog = None
+        _lane_backlog = {}
+        _started = time.time()
+
+
+def snapshot():
+    """Stan metryk jako słownik (do JSON / wyświetlenia)."""
+    with _lock:
+        types = {
+            name: {
+                "processed": s.processed,
+                "failed": s.failed,
+                "failure_rate": round(s.failed / (s.processed + s.failed), 4) if s.processed + s.failed else 0.0,
+                "processing_seconds": s.processing.as_dict(),
+                "latency_seconds": s.latency.as_dict(),
+            }
+            for name, s in sorted(_types.items())
+        }
+    processed = sum(t["processed"] for t in types.values())
+    failed = sum(t["failed"] for t in types.values())
+    uptime = time.time() - _started
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "pid": os.getpid(),
+        "uptime_seconds": round(uptime, 1),
+        "processed": processed,
+        "failed": failed,
+        "failure_rate": round(failed / (processed + failed), 4) if processed + failed else 0.0,
+        "throughput_per_second": round((processed + failed) / uptime, 2) if uptime > 0 else 0.0,
+        "backlog": _backlog,
+        "lane_backlog": dict(_lane_backlog),
+        "types": types,
+    }
+
+
+def render_prometheus(snap=None):
+    """Metryki w formacie tekstowym Prometheusa."""
+    snap = snap or snapshot()
+    pid = snap["pid"]
+    lines = [
+        "# HELP warehouse_events_total Events handled by this process.",
+        "# TYPE warehouse_events_total counter",
+    ]
+    for name, t in snap["types"].items():
+        lines.append(f'warehouse_events_total{{pid="{pid}",type="{name}",result="processed"}} {t["processed"]}')
+        lines.append(f'warehouse_events_total{{pid="{pid}",type="{name}",result="failed"}} {t["failed"]}')
+
+    for metric, key, help_text in (
+        ("warehouse_event_processing_seconds", "processing_seconds", "Time spent applying an event."),
+        ("warehouse_event_latency_seconds", "latency_seconds", "Time from enqueue (created_at) to done."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for name, t in snap["types"].items():
+            h = t[key]
+            cumulative = 0
+            for bound, n in h["buckets"].items():
+                cumulative += n
+                lines.append(f'{metric}_bucket{{pid="{pid}",type="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{pid="{pid}",type="{name}"}} {h["sum"]}')
+            lines.append(f'{metric}_count{{pid="{pid}",type="{name}"}} {h["count"]}')
+
+    if snap["backlog"] is not None:
+        lines += [
+            "# HELP warehouse_events_backlog Pending events in the queue.",
+            "# TYPE warehouse_events_backlog gauge",
+            f'warehouse_events_backlog{{pid="{pid}"}} {snap["backlog"]}',
+        ]
+    if snap["lane_backlog"]:
+        lines += [
+            "# HELP warehouse_events_lane_backlog Pending events per priority lane.",
+            "# TYPE warehouse_events_lane_backlog gauge",
+        ]
+        for lane, pending in sorted(snap["lane_backlog"].items()):
+            lines.append(f'warehouse_events_lane_backlog{{pid="{pid}",lane="{lane}"}} {pending}')
+    return "\n".join(lines) + "\n"
+
+
+def metrics_path(fmt=None):
+    fmt = fmt or METRICS_FORMAT
+    return os.path.join(METRICS_DIR, f"events_{os.getpid()}.{'prom' if fmt == 'prom' else 'json'}")
+
+
+def dump_metrics(path=None, fmt=None, backlog=None):
+    """Zapisuje metryki do pliku (atomowo: plik tymczasowy + rename). Zwraca ścieżkę."""
+    fmt = fmt or METRICS_FORMAT
+    path = path or metrics_path(fmt)
+    if backlog is not None:
+        set_backlog(backlog)
+    snap = snapshot()
+    text = render_prometheus(snap) if fmt == "prom" else json.dumps(snap, indent=2)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return path
+
+
+def print_metrics(snap=None):
+    snap = snap or snapshot()
+    print("\n====== METRYKI EVENTÓW ======")
+    print(f"⏱  Czas działania: {snap['uptime_seconds']:.0f}s | przepustowość: {snap['throughput_per_second']} ev/s")
+    print(f"📬 Kolejka: {snap['backlog'] if snap['backlog'] is not None else '?'} | "
+          f"przetworzone: {snap['processed']} | błędne: {snap['failed']} ({snap['failure_rate'] * 100:.1f}%)")
+    if snap["lane_backlog"]:
+        print("🛣  Pasy: " + ", ".join(f"{lane}: {n}" for lane, n in sorted(snap["lane_backlog"].items())))
+    if not snap["types"]:
+        print("  - Brak przetworzonych eventów w tym procesie.")
+    for name, t in snap["types"].items():
+        p, l = t["processing_seconds"], t["latency_seconds"]
+        print(f"  - {name}: {t['processed']} ok / {t['failed']} błędów | "
+              f"przetwarzanie śr. {p['mean'] * 1000:.2f} ms (p95 ≤ {p['p95'] * 1000:g} ms) | "
+              f"opóźnienie śr. {l['mean']:.2f} s (p95 ≤ {l['p95']:g} s)")
+    print("=============================\n")
+#endregion
+#region ZRZUT OKRESOWY
+_dumper = None
+_dumper_stop = threading.Event()
+
+
+def start_dumper(interval=None, backlog_fn=None):
+    """Uruchamia wątek zapisujący metryki co `interval` sekund (0 = wyłączone)."""
+    global _dumper
+    interval = METRICS_INTERVAL_SECONDS if interval is None else interval
+    if interval <= 0 or (_dumper is not None and _dumper.is_alive()):
+        return
+    _dumper_stop.clear()
+
+    def loop():
+        while not _dumper_stop.wait(interval):
+            _dump_quietly(backlog_fn)
+
+    _dumper = threading.Thread(target=loop, name="metrics-dumper", daemon=True)
+    _dumper.start()
+
+
+def stop_dumper(final_dump=True, backlog_fn=None):
+    global _dumper
+    if _dumper is None:
+        return
+    _dumper_stop.set()
+    _dumper.join()
+    _dumper = None
+    if final_dump:
+        _dump_quietly(backlog_fn)
+
+
+def _dump_quietly(backlog_fn=None):
+    try:
+        dump_metrics(backlog=backlog_fn() if backlog_fn else None)
+    except Exception as e:
+        logger.log_error(f"❌ Metrics dump failed: {e}")
+
+
+def _reset_after_fork():
+    # proces potomny liczy od zera i startuje własny wątek zrzutu
+    global _lock, _dumper, _dumper_stop, _started
+    _lock = threading.Lock()
+    _started = time.time()
+    _dumper = None
+    _dumper_stop = threading.Event()
+    _types.clear()
+    set_backlog(None)
+    _lane_backlog.clear()
+#endregion
+
+
+atexit.register(stop_dumper)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
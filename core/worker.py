@@ -0,0 +1,121 @@
+import argparse
+import multiprocessing
+import signal
+import time
+
+from core import metrics
+from core.event_processor import drain_events, default_worker_id, EVENT_BATCH_SIZE
+from db.db_manager import EVENT_LEASE_SECONDS, count_pending_events, count_pending_by_lane
+from db import profiler
+from db.db_pool import close_connection
+from db.retention import run_retention, RETENTION_INTERVAL_SECONDS
+from utils.logger import log_info as log, flush as flush_logs
+
+# Ile sekund czekamy, gdy kolejka jest pusta
+IDLE_SLEEP_SECONDS = 0.5
+# Ile paczek retencji robi worker za jednym razem (reszta przy kolejnym przebiegu)
+RETENTION_MAX_CHUNKS = 20
+
+
+#region WORKER
+def run_worker(batch_size=EVENT_BATCH_SIZE, lease_seconds=EVENT_LEASE_SECONDS,
+               idle_sleep=IDLE_SLEEP_SECONDS, once=False, stop_event=None, retention_interval=None):
+    """
+    Pętla jednego workera: rezerwuje paczki eventów i przetwarza je,
+    aż dostanie SIGINT/SIGTERM (albo kolejka się opróżni przy once=True).
+    Z retention_interval co tyle sekund archiwizuje stare eventy (db.retention).
+    """
+    worker_id = default_worker_id()
+    stop_event = stop_event or multiprocessing.Event()
+
+    def _stop(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    log(f"🛠 Worker {worker_id} started (batch={batch_size}, lease={lease_seconds}s)")
+    metrics.start_dumper(backlog_fn=count_pending_by_lane)
+    processed = failed = 0
+    last_retention = time.monotonic()
+    try:
+        while not stop_event.is_set():
+            if retention_interval and time.monotonic() - last_retention >= retention_interval:
+                run_retention(max_chunks=RETENTION_MAX_CHUNKS)
+                last_retention = time.monotonic()
+
+            ok, bad = drain_events(batch_size, worker_id, lease_seconds, max_batches=1)
+            processed += ok
+            failed += bad
+            if ok or bad:
+                continue
+            # --once: kończymy dopiero, gdy nic nie czeka (także u innych workerów)
+            if once and not count_pending_events():
+                break
+            stop_event.wait(idle_sleep)
+    finally:
+        metrics.stop_dumper(backlog_fn=count_pending_by_lane)
+        if profiler.ENABLED:
+            # procesy multiprocessing kończą się bez atexit — raport wprost
+            log(profiler.profile_report())
+            profiler.reset_profile()
+        close_connection()
+        log(f"🛑 Worker {worker_id} stopped: {processed} processed, {failed} failed")
+        flush_logs()
+#endregion
+#region URUCHAMIANIE
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless event processor for the warehouse.")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("-b", "--batch-size", type=int, default=EVENT_BATCH_SIZE, help="events claimed per batch")
+    parser.add_argument("-l", "--lease", type=int, default=EVENT_LEASE_SECONDS, help="lease length in seconds")
+    parser.add_argument("--idle-sleep", type=float, default=IDLE_SLEEP_SECONDS, help="sleep when the queue is empty")
+    parser.add_argument("--once", action="store_true", help="drain the queue and exit")
+    parser.add_argument("--profile", action="store_true", help="profile db_manager calls (report on exit)")
+    parser.add_argument("--slow-query-ms", type=float, default=None, help="slow call threshold for --profile")
+    parser.add_argument("--retention-interval", type=float, default=RETENTION_INTERVAL_SECONDS,
+                        help="seconds between event archiving runs (0 = off)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _parse_args(argv)
+    if args.profile:
+        profiler.enable_profiling(args.slow_query_ms)
+    kwargs = {
+        "batch_size": args.batch_size,
+        "lease_seconds": args.lease,
+        "idle_sleep": args.idle_sleep,
+        "once": args.once,
+    }
+
+    if args.workers <= 1:
+        run_worker(**kwargs, retention_interval=args.retention_interval)
+        return
+
+    stop_event = multiprocessing.Event()
+    # retencję robi tylko pierwszy worker
+    processes = [
+        multiprocessing.Process(target=run_worker, name=f"event-worker-{i}", kwargs={
+            **kwargs, "stop_event": stop_event,
+            "retention_interval": args.retention_interval if i == 0 else None,
+        })
+        for i in range(args.workers)
+    ]
+    for p in processes:
+        p.start()
+
+    def _stop(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    try:
+        while any(p.is_alive() for p in processes):
+            time.sleep(0.5)
+    finally:
+        stop_event.set()
+        for p in processes:
+            p.join()
+#endregion
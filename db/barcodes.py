@@ -0,0 +1,84 @@
+import os
+import threading
+
+from db import db_init
+from db.db_pool import on_rollback
+
+# ============================================
+# 🔹 KODY KRESKOWE Z SEKWENCJI (BLOKAMI)
+# ============================================
+# Kody są kolejnymi numerami z tabeli barcode_sequences. Proces rezerwuje
+# naraz blok BARCODE_BLOCK numerów (jeden UPSERT ... RETURNING) i rozdaje
+# je lokalnie, więc równoległe procesy nie rywalizują o ten sam wiersz przy
+# każdym boxie i nigdy nie dostaną tego samego numeru.
+# Blok trzymamy per wątek: rezerwacja idzie w transakcji wywołującego,
+# a jeśli ta transakcja zostanie wycofana, blok jest porzucany (on_rollback)
+# — numery z wycofanej rezerwacji nie mogą trafić do zatwierdzonych boxów.
+# Luki w numeracji (porzucone bloki, koniec procesu) są w porządku.
+
+BARCODE_BLOCK = int(os.environ.get("WAREHOUSE_BARCODE_BLOCK", 1000))
+BOX_SEQUENCE = "box"
+# Stare kody to BOX_<0..65535> — nowe mają stałą szerokość, więc się nie pokrywają
+BOX_BARCODE_FORMAT = "BOX_{:010d}"
+
+_local = threading.local()
+
+
+def _blocks():
+    blocks = getattr(_local, "blocks", None)
+    if blocks is None:
+        blocks = _local.blocks = {}
+    return blocks
+
+
+def _reserve_block(conn, sequence, size):
+    """Rezerwuje `size` kolejnych numerów; zwraca [pierwszy, koniec)."""
+    end = conn.execute("""
+        INSERT INTO barcode_sequences (name, next_value) VALUES (?, 1 + ?)
+        ON CONFLICT (name) DO UPDATE SET next_value = next_value + excluded.next_value - 1
+        RETURNING next_value
+    """, (sequence, size)).fetchone()[0]
+    return [end - size, end]
+
+
+def allocate_numbers(conn, count, sequence=BOX_SEQUENCE):
+    """
+    Zwraca `count` unikalnych numerów z sekwencji (rosnąco).
+    Wołać wewnątrz transakcji (db_pool.transaction), w której powstają boxy.
+    """
+    key = (db_init.DB_PATH, sequence)
+    blocks = _blocks()
+    numbers = []
+    while len(numbers) < count:
+        block = blocks.get(key)
+        if block is None or block[0] >= block[1]:
+            block = blocks[key] = _reserve_block(conn, sequence, max(BARCODE_BLOCK, count - len(numbers)))
+            on_rollback(lambda key=key, block=block: _discard(key, block))
+        take = min(count - len(numbers), block[1] - block[0])
+        numbers.extend(range(block[0], block[0] + take))
+        block[0] += take
+    return numbers
+
+
+def _discard(key, block):
+    blocks = _blocks()
+    if blocks.get(key) is block:
+        del blocks[key]
+
+
+def new_box_barcodes(conn, count):
+    return [BOX_BARCODE_FORMAT.format(n) for n in allocate_numbers(conn, count)]
+
+
+def new_box_barcode(conn):
+    return BOX_BARCODE_FORMAT.format(allocate_numbers(conn, 1)[0])
+
+
+def _reset_after_fork():
+    # blok rodzica nie może być rozdawany także w procesie potomnym
+    global _local
+    _local = threading.local()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,217 @@
+import argparse
+import itertools
+import json
+import time
+
+from db import db_init
+from db.db_pool import transaction
+from db.slot_index import release_slot, SLOT_BOX_EMPTY, SLOT_BOX_WITH_PRODUCTS
+from utils.logger import log_info as log, log_error
+
+# ============================================
+# 🔹 KONSOLIDACJA BOXÓW (DEFRAGMENTACJA)
+# ============================================
+# python -m db.consolidation            — plan (dry-run)
+# python -m db.consolidation --apply    — plan + zapis paczkami
+# Dla każdego produktu bierzemy jego częściowo zapełnione boxy, posortowane
+# od najpełniejszego, i przesypujemy towar z najmniej zapełnionych do
+# najpełniejszych (dwa wskaźniki). Każdy ruch albo dopełnia box docelowy,
+# albo opróżnia źródłowy, więc ruchów jest mniej niż boxów, a zostaje
+# najwyżej jeden częściowy box na produkt (przy równych pojemnościach).
+# Plan liczymy z jednego zapytania dla całego magazynu, zapisujemy paczkami
+# po CONSOLIDATION_CHUNK ruchów — każdy ruch ze sprawdzeniem stanu, więc
+# boxy zmienione w międzyczasie (putaway, pobrania) są po prostu pomijane.
+# Opróżnione boxy stają się pustymi boxami (slot BOX_EMPTY), a z
+# delete_empty=True są usuwane i zwalniają slot.
+
+# Ile ruchów zapisujemy w jednej transakcji
+CONSOLIDATION_CHUNK = 2000
+# Pauza między paczkami (oddajemy blokadę zapisu workerom)
+CHUNK_PAUSE_SECONDS = 0.01
+
+
+class ConsolidationPlan:
+    __slots__ = ("moves", "products", "partial_boxes", "boxes_freed", "units_moved")
+
+    def __init__(self):
+        self.moves = []          # [(product_id, src_box_id, dst_box_id, qty)]
+        self.products = []       # [(product_id, częściowe_przed, częściowe_po, ruchy)]
+        self.partial_boxes = 0
+        self.boxes_freed = 0
+        self.units_moved = 0
+
+    def __repr__(self):
+        return (f"ConsolidationPlan(products={len(self.products)}, moves={len(self.moves)}, "
+                f"partial={self.partial_boxes}, freed={self.boxes_freed}, units={self.units_moved})")
+
+
+def _plan_product(boxes):
+    """
+    boxes: [(box_id, quantity, max_capacity)] od najpełniejszego.
+    Zwraca (ruchy [(src, dst, qty)], liczba opróżnionych, liczba dopełnionych).
+    """
+    qty = [b[1] for b in boxes]
+    moves = []
+    freed = filled = 0
+    dst, src = 0, len(boxes) - 1
+    while dst < src:
+        free = boxes[dst][2] - qty[dst]
+        if free <= 0:
+            dst += 1
+            filled += 1
+            continue
+        take = min(free, qty[src])
+        moves.append((boxes[src][0], boxes[dst][0], take))
+        qty[dst] += take
+        qty[src] -= take
+        if qty[src] == 0:
+            src -= 1
+            freed += 1
+    if dst < len(boxes) and qty[dst] >= boxes[dst][2]:
+        filled += 1
+    return moves, freed, filled
+
+
+def plan_consolidation(conn, product_id=None):
+    """Liczy plan dla jednego produktu albo całego magazynu (jedno zapytanie)."""
+    plan = ConsolidationPlan()
+    where, params = "", ()
+    if product_id is not None:
+        where, params = "AND product_id = ?", (product_id,)
+    rows = conn.execute(f"""
+        SELECT product_id, id, quantity, max_capacity FROM boxes
+        WHERE product_id IS NOT NULL AND quantity > 0 AND quantity < max_capacity {where}
+        ORDER BY product_id, quantity DESC, id
+    """, params)
+
+    for pid, group in itertools.groupby(rows, key=lambda r: r[0]):
+        boxes = [(box_id, qty, cap) for _, box_id, qty, cap in group]
+        plan.partial_boxes += len(boxes)
+        if len(boxes) < 2:
+            continue
+        moves, freed, filled = _plan_product(boxes)
+        if not moves:
+            continue
+        plan.moves.extend((pid, src, dst, qty) for src, dst, qty in moves)
+        plan.products.append((pid, len(boxes), len(boxes) - freed - filled, len(moves)))
+        plan.boxes_freed += freed
+        plan.units_moved += sum(m[2] for m in moves)
+    return plan
+
+
+def _apply_move(conn, product_id, src, dst, qty):
+    """Jeden ruch ze sprawdzeniem stanu obu boxów. False, jeśli stan się zmienił."""
+    cur = conn.execute("""
+        UPDATE boxes SET quantity = quantity - ?
+        WHERE id = ? AND product_id = ? AND quantity >= ?
+    """, (qty, src, product_id, qty))
+    if cur.rowcount != 1:
+        return False
+    cur = conn.execute("""
+        UPDATE boxes SET quantity = quantity + ?
+        WHERE id = ? AND product_id = ? AND quantity + ? <= max_capacity
+    """, (qty, dst, product_id, qty))
+    if cur.rowcount != 1:
+        conn.execute("UPDATE boxes SET quantity = quantity + ? WHERE id = ?", (qty, src))
+        return False
+    return True
+
+
+def free_emptied_boxes(conn, box_ids, delete_empty=False):
+    """Opróżnione boxy → puste (albo usunięte, ze zwolnieniem slotu). Zwraca ich liczbę."""
+    emptied = conn.execute("""
+        SELECT id, slot_id FROM boxes
+        WHERE id IN (SELECT value FROM json_each(?)) AND quantity = 0
+    """, (json.dumps(box_ids),)).fetchall()
+    if not emptied:
+        return 0
+    ids = json.dumps([box_id for box_id, _ in emptied])
+    if delete_empty:
+        for _, slot_id in emptied:
+            release_slot(conn, slot_id)
+        conn.execute("DELETE FROM boxes WHERE id IN (SELECT value FROM json_each(?))", (ids,))
+    else:
+        conn.execute("""
+            UPDATE boxes SET product_id = NULL, max_capacity = 0
+            WHERE id IN (SELECT value FROM json_each(?))
+        """, (ids,))
+        conn.execute("""
+            UPDATE slots SET status = ?
+            WHERE status = ? AND id IN (
+                SELECT slot_id FROM boxes
+                WHERE id IN (SELECT value FROM json_each(?)) AND slot_id IS NOT NULL
+            )
+        """, (SLOT_BOX_EMPTY, SLOT_BOX_WITH_PRODUCTS, ids))
+    return len(emptied)
+
+
+def apply_consolidation(plan, chunk_size=CONSOLIDATION_CHUNK, delete_empty=False):
+    """
+    Zapisuje plan paczkami (każda to osobna transakcja IMMEDIATE).
+    Zwraca słownik {moves, skipped, boxes_freed, units_moved, chunks, seconds}.
+    """
+    started = time.perf_counter()
+    stats = {"moves": 0, "skipped": 0, "boxes_freed": 0, "units_moved": 0, "chunks": 0}
+    for i in range(0, len(plan.moves), chunk_size):
+        chunk = plan.moves[i:i + chunk_size]
+        with transaction(immediate=True) as conn:
+            sources = []
+            for product_id, src, dst, qty in chunk:
+                if _apply_move(conn, product_id, src, dst, qty):
+                    stats["moves"] += 1
+                    stats["units_moved"] += qty
+                    sources.append(src)
+                else:
+                    stats["skipped"] += 1
+            stats["boxes_freed"] += free_emptied_boxes(conn, sources, delete_empty)
+        stats["chunks"] += 1
+        time.sleep(CHUNK_PAUSE_SECONDS)
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    if stats["moves"]:
+        log(f"🧩 Consolidation: {stats['moves']} moves ({stats['units_moved']} units), "
+            f"{stats['boxes_freed']} boxes {'deleted' if delete_empty else 'emptied'}, "
+            f"{stats['skipped']} skipped, {stats['chunks']} chunks ({stats['seconds']}s)")
+    return stats
+
+
+def consolidate(product_id=None, apply=False, chunk_size=CONSOLIDATION_CHUNK, delete_empty=False):
+    """Plan (i opcjonalnie zapis). Zwraca (plan, stats albo None)."""
+    with transaction() as conn:
+        plan = plan_consolidation(conn, product_id)
+    if not apply or not plan.moves:
+        return plan, None
+    try:
+        return plan, apply_consolidation(plan, chunk_size, delete_empty)
+    except Exception as e:
+        log_error(f"❌ Consolidation failed: {e}")
+        return plan, None
+
+
+def print_plan(plan, top=20):
+    print("\n====== KONSOLIDACJA BOXÓW ======")
+    print(f"📦 Częściowo zapełnione boxy: {plan.partial_boxes}")
+    print(f"🔀 Ruchy: {len(plan.moves)} ({plan.units_moved} szt.) w {len(plan.products)} produktach")
+    print(f"📭 Boxy do zwolnienia: {plan.boxes_freed}")
+    for pid, before, after, moves in sorted(plan.products, key=lambda p: p[1] - p[2], reverse=True)[:top]:
+        print(f"  - produkt {pid}: częściowe {before} → {after}, ruchy: {moves}")
+    print("================================\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge partially filled boxes of the same product.")
+    parser.add_argument("--apply", action="store_true", help="write the plan (default: dry-run)")
+    parser.add_argument("--product", type=int, default=None, help="only this product id")
+    parser.add_argument("--chunk", type=int, default=CONSOLIDATION_CHUNK, help="moves per transaction")
+    parser.add_argument("--delete-empty", action="store_true", help="delete emptied boxes and free their slots")
+    args = parser.parse_args(argv)
+
+    db_init.initialize_database()
+    plan, stats = consolidate(args.product, args.apply, args.chunk, args.delete_empty)
+    print_plan(plan)
+    if stats:
+        print(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,37 @@
 import sqlite3
 import os
+import time
 
 DB_PATH = "warehouse.db"
 
+# Ustawienia połączeń (patrz też db/db_pool.py)
+BUSY_TIMEOUT_MS = 5000
+CACHED_STATEMENTS = 256
+CACHE_SIZE_KB = 16384
+
+
+def apply_pragmas(conn):
+    """Applies the tuned pragmas used by every connection."""
+    # must precede journal_mode so a brand new file is created with it;
+    # existing files keep their mode until a VACUUM (db.retention)
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
 def get_connection():
-    """Returns connection to the SQLite database."""
-    return sqlite3.connect(DB_PATH)
+    """Returns a new, tuned connection to the SQLite database."""
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        cached_statements=CACHED_STATEMENTS,
+        check_same_thread=False,
+    )
+    return apply_pragmas(conn)
 
 
 def initialize_database():
@@ -49,6 +75,11 @@ def initialize_database():
         )
     """)
 
+    # szukanie boxów produktu (putaway, sloty przy produkcie)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_boxes_product ON boxes (product_id)")
+    # filtrowanie listy boxów po slocie
+    c.execute("CREATE INDEX IF NOT EXISTS idx_boxes_slot ON boxes (slot_id)")
+
   # --- EXTERNAL_PALETS ---
     c.execute("""
         CREATE TABLE IF NOT EXISTS external_palets (
@@ -56,9 +87,35 @@ def initialize_database():
             barcode TEXT UNIQUE NOT NULL,
             product_id INTEGER NOT NULL,
             quantity INTEGER NOT NULL,
+            received_at DATETIME DEFAULT CURRENT_TIMESTAMP,   -- kolejność FIFO
             FOREIGN KEY(product_id) REFERENCES products(id)
         )
     """)
+    if ensure_column(c, "external_palets", "received_at", "DATETIME"):
+        # starsze bazy: nie znamy daty przyjęcia, FIFO rozstrzyga id
+        c.execute("UPDATE external_palets SET received_at = CURRENT_TIMESTAMP WHERE received_at IS NULL")
+    # pobieranie FIFO: palety produktu od najstarszej
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_palets_fifo
+        ON external_palets (product_id, received_at, id)
+    """)
+
+    # --- REZERWACJE TOWARU Z PALET ---
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS pallet_reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            owner TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            expires_at DATETIME NOT NULL,     -- po tym czasie rezerwacja nie blokuje towaru
+            FOREIGN KEY(product_id) REFERENCES products(id)
+        )
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reservations_product
+        ON pallet_reservations (product_id, expires_at)
+    """)
 
     # --- EVENTS ---
     c.execute("""
@@ -67,15 +124,288 @@ def initialize_database():
             event_type TEXT NOT NULL,
             payload TEXT, 
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            processed INTEGER DEFAULT 0,
-            processed_at DATETIME
+            processed INTEGER DEFAULT 0,       -- 0 = czeka | 1 = przetworzony | -1 = błąd
+            processed_at DATETIME,
+            error_message TEXT,
+            claimed_by TEXT,                   -- worker, który trzyma lease
+            lease_until DATETIME               -- po tym czasie event wraca do kolejki
+        )
+    """)
+    ensure_column(c, "events", "error_message", "TEXT")
+    ensure_column(c, "events", "claimed_by", "TEXT")
+    ensure_column(c, "events", "lease_until", "DATETIME")
+
+    # Kolejka czyta tylko nieprzetworzone eventy po id — indeks częściowy
+    # zawiera wyłącznie oczekujące wiersze, więc nie rośnie z historią.
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_pending
+        ON events (id) WHERE processed = 0
+    """)
+    # pasy priorytetów: oczekujące eventy danego typu po id (db/event_lanes.py)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_pending_type
+        ON events (event_type, id) WHERE processed = 0
+    """)
+    # retencja szuka zakończonych eventów (db/retention.py)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_events_done
+        ON events (id) WHERE processed != 0
+    """)
+
+    # --- ROLLUPY EVENTÓW (liczniki po typie i godzinie, zostają po retencji) ---
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS event_rollups (
+            hour TEXT NOT NULL,               -- "YYYY-MM-DD HH:00" (created_at)
+            event_type TEXT NOT NULL,
+            processed INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            latency_seconds REAL NOT NULL DEFAULT 0,   -- suma processed_at - created_at
+            PRIMARY KEY (hour, event_type)
+        )
+    """)
+
+    # --- LISTY KOMPLETACJI (db/picking.py) ---
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS pick_lines (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            wave_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,             -- kolejność na trasie
+            order_id TEXT NOT NULL,
+            product_id INTEGER NOT NULL,
+            box_id INTEGER NOT NULL,
+            slot_id TEXT,
+            quantity INTEGER NOT NULL,
+            picked_at DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_pick_lines_wave ON pick_lines (wave_id, seq)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_pick_lines_order ON pick_lines (order_id)")
+
+    # --- SEKWENCJE KODÓW KRESKOWYCH (db/barcodes.py) ---
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS barcode_sequences (
+            name TEXT PRIMARY KEY,            -- np. "box"
+            next_value INTEGER NOT NULL       -- pierwsza nieprzydzielona wartość
+        )
+    """)
+
+    # --- AGREGATY STANU (utrzymywane triggerami) ---
+    create_stock_aggregates(c)
 
     conn.commit()
     conn.close()
 
 
+def _box_upsert(r, sign):
+    """Dodaje (sign="") albo odejmuje (sign="-") wkład wiersza boxa r (NEW/OLD)."""
+    return f"""
+        INSERT INTO product_stock (product_id, units_in_boxes, boxes, partial_boxes, free_capacity)
+        SELECT {r}.product_id, {sign}{r}.quantity, {sign}1,
+               {sign}({r}.quantity > 0 AND {r}.quantity < {r}.max_capacity),
+               {sign}MAX({r}.max_capacity - {r}.quantity, 0)
+        WHERE {r}.product_id IS NOT NULL
+        ON CONFLICT(product_id) DO UPDATE SET
+            units_in_boxes = units_in_boxes + excluded.units_in_boxes,
+            boxes = boxes + excluded.boxes,
+            partial_boxes = partial_boxes + excluded.partial_boxes,
+            free_capacity = free_capacity + excluded.free_capacity;"""
+
+
+def _palet_upsert(r, sign):
+    return f"""
+        INSERT INTO product_stock (product_id, units_on_palets, palets)
+        SELECT {r}.product_id, {sign}{r}.quantity, {sign}1
+        WHERE {r}.product_id IS NOT NULL
+        ON CONFLICT(product_id) DO UPDATE SET
+            units_on_palets = units_on_palets + excluded.units_on_palets,
+            palets = palets + excluded.palets;"""
+
+
+def _totals_update(empty_delta, units_delta):
+    return f"""
+        UPDATE stock_totals SET
+            empty_boxes = empty_boxes + ({empty_delta}),
+            units_in_boxes = units_in_boxes + ({units_delta})
+        WHERE id = 1;"""
+
+
+_NEW_EMPTY = "(NEW.quantity = 0 OR NEW.product_id IS NULL)"
+_OLD_EMPTY = "(OLD.quantity = 0 OR OLD.product_id IS NULL)"
+
+
+STOCK_TRIGGERS = {
+    "trg_boxes_stock_insert": f"""
+        AFTER INSERT ON boxes BEGIN
+            {_box_upsert("NEW", "")}
+            {_totals_update(_NEW_EMPTY, "NEW.quantity")}
+        END""",
+    "trg_boxes_stock_delete": f"""
+        AFTER DELETE ON boxes BEGIN
+            {_box_upsert("OLD", "-")}
+            {_totals_update(f"-{_OLD_EMPTY}", "-OLD.quantity")}
+        END""",
+    "trg_boxes_stock_update": f"""
+        AFTER UPDATE OF product_id, quantity, max_capacity ON boxes BEGIN
+            {_box_upsert("OLD", "-")}
+            {_box_upsert("NEW", "")}
+            {_totals_update(f"{_NEW_EMPTY} - {_OLD_EMPTY}", "NEW.quantity - OLD.quantity")}
+        END""",
+    "trg_palets_stock_insert": f"""
+        AFTER INSERT ON external_palets BEGIN
+            {_palet_upsert("NEW", "")}
+        END""",
+    "trg_palets_stock_delete": f"""
+        AFTER DELETE ON external_palets BEGIN
+            {_palet_upsert("OLD", "-")}
+        END""",
+    "trg_palets_stock_update": f"""
+        AFTER UPDATE OF product_id, quantity ON external_palets BEGIN
+            {_palet_upsert("OLD", "-")}
+            {_palet_upsert("NEW", "")}
+        END""",
+}
+
+
+def create_stock_aggregates(cursor):
+    """
+    Per-product stock aggregates kept up to date by triggers, in the same
+    transaction as every box / pallet change. Existing databases are backfilled once.
+    """
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_stock'"
+    ).fetchone()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS product_stock (
+            product_id INTEGER PRIMARY KEY,
+            units_in_boxes INTEGER NOT NULL DEFAULT 0,
+            boxes INTEGER NOT NULL DEFAULT 0,
+            partial_boxes INTEGER NOT NULL DEFAULT 0,   -- 0 < quantity < max_capacity
+            free_capacity INTEGER NOT NULL DEFAULT 0,   -- suma (max_capacity - quantity)
+            units_on_palets INTEGER NOT NULL DEFAULT 0,
+            palets INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            empty_boxes INTEGER NOT NULL DEFAULT 0,     -- quantity = 0 OR product_id IS NULL
+            units_in_boxes INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO stock_totals (id) VALUES (1)")
+
+    for name, body in STOCK_TRIGGERS.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+    if not exists:
+        rebuild_stock_aggregates(cursor)
+
+
+def rebuild_stock_aggregates(cursor):
+    """Recomputes product_stock / stock_totals from boxes and external_palets."""
+    cursor.execute("DELETE FROM product_stock")
+    cursor.execute("""
+        INSERT INTO product_stock (product_id, units_in_boxes, boxes, partial_boxes,
+                                   free_capacity, units_on_palets, palets)
+        SELECT product_id, SUM(units), SUM(boxes), SUM(partial), SUM(free), SUM(on_palets), SUM(palets)
+        FROM (
+            SELECT product_id, quantity AS units, 1 AS boxes,
+                   (quantity > 0 AND quantity < max_capacity) AS partial,
+                   MAX(max_capacity - quantity, 0) AS free, 0 AS on_palets, 0 AS palets
+            FROM boxes WHERE product_id IS NOT NULL
+            UNION ALL
+            SELECT product_id, 0, 0, 0, 0, quantity, 1 FROM external_palets
+        )
+        GROUP BY product_id
+    """)
+    cursor.execute("""
+        UPDATE stock_totals SET
+            empty_boxes = (SELECT COUNT(*) FROM boxes WHERE quantity = 0 OR product_id IS NULL),
+            units_in_boxes = (SELECT IFNULL(SUM(quantity), 0) FROM boxes)
+        WHERE id = 1
+    """)
+
+
+def ensure_column(cursor, table, column, definition):
+    """Adds a column to an existing table (older databases) if it's missing. Returns True if added."""
+    columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        return True
+    return False
+
+
+# Ile wierszy slotów wstawiamy jednym executemany
+SLOT_INSERT_CHUNK = 50000
+
+
+def aisle_label(index):
+    """0 -> A, 25 -> Z, 26 -> AA, 27 -> AB ... (bez limitu 26 alejek)."""
+    label = ""
+    index += 1
+    while index > 0:
+        index, rem = divmod(index - 1, 26)
+        label = chr(65 + rem) + label
+    return label
+
+
+def aisle_index(label):
+    """Odwrotność aisle_label: A -> 0, AA -> 26."""
+    index = 0
+    for ch in label:
+        index = index * 26 + (ord(ch) - 64)
+    return index - 1
+
+
+def slot_id_width(num_columns, slots_per_column):
+    """Szerokość pól kolumny/poziomu w id slotu (min. 2 — format "A0105")."""
+    return max(2, len(str(num_columns)), len(str(slots_per_column)))
+
+
+def format_slot_id(aisle, col, slot, width=2):
+    return f"{aisle}{col:0{width}d}{slot:0{width}d}"
+
+
+def parse_slot_id(slot_id):
+    """Odwrotność format_slot_id: "A0105" -> ("A", 1, 5, 2). None dla złego formatu."""
+    aisle = slot_id.rstrip("0123456789")
+    digits = slot_id[len(aisle):]
+    if not aisle or not digits or len(digits) % 2:
+        return None
+    width = len(digits) // 2
+    return aisle, int(digits[:width]), int(digits[width:]), width
+
+
+def _slot_rows(first_aisle, num_aisles, num_columns, slots_per_column, width):
+    for a in range(first_aisle, first_aisle + num_aisles):
+        aisle = aisle_label(a)
+        for col in range(1, num_columns + 1):
+            for s in range(1, slots_per_column + 1):
+                yield (format_slot_id(aisle, col, s, width), aisle, col, s)
+
+
+def _insert_slots(conn, rows):
+    """Wstawia sloty paczkami po SLOT_INSERT_CHUNK w jednej transakcji."""
+    inserted = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= SLOT_INSERT_CHUNK:
+            conn.executemany("INSERT INTO slots (id, aisle, col, slot, status) VALUES (?, ?, ?, ?, 'EMPTY')", chunk)
+            inserted += len(chunk)
+            chunk = []
+    if chunk:
+        conn.executemany("INSERT INTO slots (id, aisle, col, slot, status) VALUES (?, ?, ?, ?, 'EMPTY')", chunk)
+        inserted += len(chunk)
+    return inserted
+
+
+def _invalidate_slot_index():
+    from db.slot_index import get_slot_index_instance
+    get_slot_index_instance().invalidate()
+
+
 def generate_slots(num_aisles=5, num_columns=10, slots_per_column=20):
     """Generates the full warehouse slot grid, only if it's empty."""
     conn = get_connection()
@@ -87,23 +417,62 @@ def generate_slots(num_aisles=5, num_columns=10, slots_per_column=20):
     if count > 0:
         print("✅ Slots already exist. Skipping generation.")
         conn.close()
-        return
+        return 0
 
     print("🧱 Generating warehouse slots...")
+    started = time.perf_counter()
 
-    for a in range(num_aisles):
-        aisle_letter = chr(65 + a)  # A, B, C, D, E...
-        for col in range(1, num_columns + 1):
-            for s in range(1, slots_per_column + 1):
-                slot_id = f"{aisle_letter}{col:02d}{s:02d}"
-                c.execute("""
-                    INSERT INTO slots (id, aisle, col, slot, status)
-                    VALUES (?, ?, ?, ?, 'EMPTY')
-                """, (slot_id, aisle_letter, col, s))
+    width = slot_id_width(num_columns, slots_per_column)
+    inserted = _insert_slots(conn, _slot_rows(0, num_aisles, num_columns, slots_per_column, width))
 
     conn.commit()
     conn.close()
-    print("✅ Warehouse slots successfully generated!")
+    _invalidate_slot_index()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Warehouse slots successfully generated! {inserted} slots in {elapsed:.2f}s "
+          f"({inserted / max(elapsed, 1e-9):,.0f} slots/s)")
+    return inserted
+
+
+def extend_slots(extra_aisles, num_columns=None, slots_per_column=None):
+    """
+    Adds aisles after the last existing one, without touching the current grid.
+    By default new aisles copy the column/level counts of the existing grid.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+
+    rows = c.execute("SELECT DISTINCT aisle FROM slots").fetchall()
+    if not rows:
+        conn.close()
+        return generate_slots(extra_aisles, num_columns or 10, slots_per_column or 20)
+
+    last_aisle = max(aisle_index(r[0]) for r in rows)
+    max_col, max_slot, sample_id = c.execute("SELECT MAX(col), MAX(slot), MIN(id) FROM slots").fetchone()
+    num_columns = num_columns or max_col
+    slots_per_column = slots_per_column or max_slot
+
+    # ta sama szerokość id co w istniejącej siatce, żeby id się nie kolidowały
+    width = parse_slot_id(sample_id)[3]
+    if slot_id_width(num_columns, slots_per_column) > width:
+        conn.close()
+        raise ValueError(
+            f"Grid ids use {width}-digit columns/levels; {num_columns}x{slots_per_column} doesn't fit"
+        )
+
+    print(f"🧱 Extending warehouse by {extra_aisles} aisles...")
+    started = time.perf_counter()
+    inserted = _insert_slots(conn, _slot_rows(last_aisle + 1, extra_aisles, num_columns, slots_per_column, width))
+
+    conn.commit()
+    conn.close()
+    _invalidate_slot_index()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Added {inserted} slots ({aisle_label(last_aisle + 1)}..{aisle_label(last_aisle + extra_aisles)}) "
+          f"in {elapsed:.2f}s")
+    return inserted
 
 
 def reset_database():
@@ -114,7 +483,15 @@ def reset_database():
     c.execute("DELETE FROM boxes")
     c.execute("DELETE FROM slots")
     c.execute("DELETE FROM products")
+    c.execute("DELETE FROM pallet_reservations")
+    c.execute("DELETE FROM event_rollups")
+    c.execute("DELETE FROM pick_lines")
+    rebuild_stock_aggregates(c)
     conn.commit()
     conn.close()
 
+    from db.product_cache import product_cache
+    product_cache.clear()
+    _invalidate_slot_index()
+
 
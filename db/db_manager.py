@@ -1,24 +1,71 @@
 import sqlite3
 import os
 import json
-from utils.logger import log_info as log
-from db.db_init import get_connection
+import functools
+from utils.logger import log_info as log, log_error
+from db.db_pool import transaction, on_rollback
+from db import profiler
+from db.models import (
+    Product, Box, Pallet, Event, Slot,
+    BOX_STATE_EMPTY, BOX_STATE_PARTIAL, BOX_STATE_FULL, BOX_STATE_NOT_EMPTY,
+)
+from db.product_cache import product_cache
+from db.putaway import plan_putaway, apply_putaway
+from db.barcodes import new_box_barcode, new_box_barcodes
+from db import pallets
+from db.pallets import RESERVATION_TTL_SECONDS
+from db.validation import validate_product, validate_palet, validate_order
+from db.picking import plan_picking, apply_picking, PickPlan
+from db.event_lanes import lane_of, lane_names, split_quota, lane_dependencies, lane_order_key
+from db.reports import STOCK_COLUMNS as _STOCK_COLUMNS, select_stock_summary, stock_report, StockReport
+from db.slot_index import (
+    get_slot_index, allocate_slot, allocate_slot_for_product, occupy_slot, release_slot, update_slot_status,
+    find_slot_near_product, slot_status_for, SLOT_BOX_WITH_PRODUCTS,
+)
+from utils.errors import WarehouseError, ValidationError
 #region Dekorator
 # ============================================
 # 🔹 Dekorator dla połączeń do DB
 # ============================================
-def db_connection(func):
+def db_connection(func=None, *, immediate=False):
+    """
+    Uruchamia funkcję na połączeniu z puli wątku.
+    Poza transaction() każde wywołanie to osobna transakcja (commit na końcu),
+    wewnątrz — SAVEPOINT we wspólnej transakcji.
+    @db_connection(immediate=True) — transakcja od razu bierze blokadę zapisu
+    (sprawdzenie stanu i zapis nie przeplotą się z innym procesem).
+    Błąd jest logowany, a funkcja zwraca None. func.strict(...) robi to samo,
+    ale rzuca wyjątek dalej — dla obsługi eventów, gdzie błąd ma oznaczyć
+    event jako nieudany.
+    Przy włączonym profilowaniu (db/profiler.py) mierzy każde wywołanie.
+    """
+    if func is None:
+        return lambda f: db_connection(f, immediate=immediate)
+
+    @functools.wraps(func)
+    def strict(*args, **kwargs):
+        call = profiler.start(func.__name__) if profiler.ENABLED else None
+        try:
+            with transaction(immediate=immediate) as conn:
+                if call:
+                    call.attach(conn)
+                result = func(conn, *args, **kwargs)
+        except Exception:
+            if call:
+                call.finish(error=True, args=args)
+            raise
+        if call:
+            call.finish(result, args=args)
+        return result
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = get_connection()
         try:
-            result = func(conn, *args, **kwargs)
-            conn.commit()
-            return result
+            return strict(*args, **kwargs)
         except Exception as e:
-            log(f"❌ DB error in {func.__name__}: {e}")
+            log_error(f"❌ DB error in {func.__name__}: {e}")
             return None
-        finally:
-            conn.close()
+    wrapper.strict = strict
     return wrapper
 #endregion
 #region EVENTY
@@ -35,24 +82,204 @@ def add_event(conn, event_type, payload=None):
     log(f"🆕 Event added: {event_type} {payload or ''}")
 
 @db_connection
-def get_new_events(conn):
-    rows = conn.execute("""
-        SELECT id, event_type, payload, created_at 
-        FROM events 
-        WHERE processed = 0
-        ORDER BY created_at ASC
-    """).fetchall()
-    
-    events = []
-    for r in rows:
-        payload = json.loads(r[2]) if r[2] else {}
-        events.append({
-            "id": r[0],
-            "event_type": r[1],
-            "payload": payload,
-            "created_at": r[3]
-        })
-    return events
+def add_events(conn, events):
+    """Dodaje wiele eventów jednym executemany; events = [(event_type, payload), ...]."""
+    rows = [(event_type, json.dumps(payload) if payload else None) for event_type, payload in events]
+    if not rows:
+        return 0
+    conn.executemany("INSERT INTO events (event_type, payload) VALUES (?, ?)", rows)
+    log(f"🆕 {len(rows)} events added")
+    return len(rows)
+
+# Domyślny rozmiar strony przy czytaniu kolejki
+EVENT_PAGE_SIZE = 500
+
+@db_connection
+def get_events_page(conn, after_id=0, limit=EVENT_PAGE_SIZE):
+    """Jedna strona oczekujących eventów o id > after_id (keyset, indeks idx_events_pending)."""
+    rows = conn.execute(f"""
+        SELECT {Event.columns()}
+        FROM events
+        WHERE processed = 0 AND id > ?
+        ORDER BY id ASC
+        LIMIT ?
+    """, (after_id, limit)).fetchall()
+    return [Event.from_row(r) for r in rows]
+
+def iter_event_pages(page_size=EVENT_PAGE_SIZE, after_id=0):
+    """
+    Generator stron oczekujących eventów.
+    Kolejna strona jest pobierana dopiero gdy poprzednia zostanie obsłużona,
+    a kursor (ostatnie id) przesuwa się zawsze do przodu — nawet jeśli
+    eventów nie udało się potwierdzić.
+    """
+    while True:
+        page = get_events_page(after_id, page_size)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        after_id = page[-1].id
+
+def iter_new_events(page_size=EVENT_PAGE_SIZE, after_id=0):
+    """Strumień pojedynczych oczekujących eventów (pamięć ograniczona do jednej strony)."""
+    for page in iter_event_pages(page_size, after_id):
+        yield from page
+
+def get_new_events(limit=EVENT_PAGE_SIZE):
+    """Zwraca maksymalnie `limit` najstarszych oczekujących eventów."""
+    return get_events_page(0, limit) or []
+
+# Jak długo worker trzyma zarezerwowane eventy, zanim wrócą do kolejki
+EVENT_LEASE_SECONDS = 60
+
+# Typy oczekujących eventów — skok po indeksie idx_events_pending_type
+# (jedno wyszukiwanie na typ, bez skanowania kolejki)
+_PENDING_TYPES_SQL = """
+    WITH RECURSIVE t(event_type) AS (
+        SELECT MIN(event_type) FROM events WHERE processed = 0
+        UNION ALL
+        SELECT (SELECT MIN(event_type) FROM events WHERE processed = 0 AND event_type > t.event_type)
+        FROM t WHERE t.event_type IS NOT NULL
+    )
+    SELECT event_type FROM t WHERE event_type IS NOT NULL
+"""
+
+def _claimable_ids(conn, event_type, limit):
+    return [r[0] for r in conn.execute("""
+        SELECT id FROM events
+        WHERE processed = 0 AND event_type = ?
+          AND (lease_until IS NULL OR lease_until < CURRENT_TIMESTAMP)
+        ORDER BY id ASC
+        LIMIT ?
+    """, (event_type, limit))]
+
+def _lane_takes(candidates, order, limit):
+    """Ile eventów z każdego pasa: udział wg wag, miejsce po pustych pasach dla pozostałych."""
+    take = {lane: min(q, len(candidates[lane])) for lane, q in split_quota(limit, order).items()}
+    spare = limit - sum(take.values())
+    # przy małym limicie minimum 1 na pas może przekroczyć limit — oddają najlżejsze pasy
+    for lane in reversed(order):
+        if spare >= 0:
+            break
+        cut = min(-spare, take[lane])
+        take[lane] -= cut
+        spare += cut
+    for lane in order:
+        if spare <= 0:
+            break
+        extra = min(spare, len(candidates[lane]) - take[lane])
+        take[lane] += extra
+        spare -= extra
+    return take
+
+def _oldest_outside(conn, types, taken):
+    """Najstarszy oczekujący event podanych typów spoza paczki (także z cudzym lease) albo None."""
+    claimed = json.dumps(taken)
+    ids = [row[0] for event_type in types for row in conn.execute("""
+        SELECT id FROM events
+        WHERE processed = 0 AND event_type = ?
+          AND id NOT IN (SELECT value FROM json_each(?))
+        ORDER BY id ASC
+        LIMIT 1
+    """, (event_type, claimed))]
+    return min(ids, default=None)
+
+def _pick_fair(conn, limit):
+    """
+    Wybiera id do `limit` wolnych eventów: udział pasów wg wag (db/event_lanes.py),
+    w pasie najstarsze; miejsce po pustych pasach dostają pozostałe.
+    Pas nie wyprzedza starszych eventów pasów, od których zależy (lane_dependencies),
+    jeśli te nie weszły do paczki — np. przyjęcie nie ruszy przed paletą,
+    a kompletacja przed przyjęciem.
+    """
+    candidates = {}
+    pending_types = [r[0] for r in conn.execute(_PENDING_TYPES_SQL).fetchall()]
+    for event_type in pending_types:
+        ids = _claimable_ids(conn, event_type, limit)
+        if ids:
+            candidates.setdefault(lane_of(event_type), []).extend(ids)
+    if not candidates:
+        return []
+
+    order = sorted(candidates, key=lane_order_key)
+    for lane in order:
+        candidates[lane].sort()
+    types_of = {}
+    for event_type in pending_types:
+        types_of.setdefault(lane_of(event_type), []).append(event_type)
+
+    # Obcinamy pasy do najstarszego eventu zależności spoza paczki i liczymy
+    # rozdział od nowa, aż nic się nie zmieni (kandydaci tylko ubywają).
+    while True:
+        take = _lane_takes(candidates, order, limit)
+        taken = {lane: candidates[lane][:take[lane]] for lane in order}
+        changed = False
+        for lane in order:
+            deps = lane_dependencies(lane)
+            types = [t for dep in deps for t in types_of.get(dep, ())]
+            if not types or not candidates[lane]:
+                continue
+            cap = _oldest_outside(conn, types, [i for dep in deps for i in taken.get(dep, ())])
+            if cap is not None and candidates[lane][-1] > cap:
+                candidates[lane] = [i for i in candidates[lane] if i < cap]
+                changed = True
+        if not changed:
+            return [event_id for lane in order for event_id in taken[lane]]
+
+def claim_events(worker_id, limit=EVENT_PAGE_SIZE, lease_seconds=EVENT_LEASE_SECONDS):
+    """
+    Atomowo rezerwuje (lease) do `limit` wolnych eventów dla workera.
+    Event jest wolny, gdy nie ma lease albo lease wygasł (np. worker padł).
+    Paczka jest dzielona między pasy priorytetów (db/event_lanes.py); eventy
+    wracają w kolejności id.
+    """
+    try:
+        with transaction(immediate=True) as conn:
+            ids = _pick_fair(conn, limit)
+            if not ids:
+                return []
+            rows = conn.execute("""
+                UPDATE events
+                SET claimed_by = ?, lease_until = datetime('now', ?)
+                WHERE id IN (SELECT value FROM json_each(?))
+                RETURNING id, event_type, payload, created_at
+            """, (worker_id, f"+{int(lease_seconds)} seconds", json.dumps(ids))).fetchall()
+    except Exception as e:
+        log_error(f"❌ DB error in claim_events: {e}")
+        return []
+
+    # pasy wybierają, KTÓRE eventy bierzemy; przetwarzamy je po kolei (FIFO)
+    rows.sort(key=lambda r: r[0])
+    return [Event.from_row(r) for r in rows]
+
+@db_connection
+def release_events(conn, worker_id, event_ids):
+    """Zwalnia lease eventów (wracają do kolejki od razu)."""
+    if not event_ids:
+        return 0
+    cur = conn.execute("""
+        UPDATE events
+        SET claimed_by = NULL, lease_until = NULL
+        WHERE claimed_by = ? AND processed = 0
+          AND id IN (SELECT value FROM json_each(?))
+    """, (worker_id, json.dumps(list(event_ids))))
+    return cur.rowcount
+
+@db_connection
+def count_pending_events(conn):
+    row = conn.execute("SELECT COUNT(*) FROM events WHERE processed = 0").fetchone()
+    return row[0] if row else 0
+
+@db_connection
+def count_pending_by_lane(conn):
+    """Oczekujące eventy w każdym pasie priorytetów: {pas: liczba}."""
+    counts = dict.fromkeys(lane_names(), 0)
+    for event_type, n in conn.execute("SELECT event_type, COUNT(*) FROM events WHERE processed = 0 GROUP BY event_type"):
+        lane = lane_of(event_type)
+        counts[lane] = counts.get(lane, 0) + n
+    return counts
 
 @db_connection
 def mark_event_processed(conn, event_id):
@@ -67,19 +294,79 @@ def mark_event_processed(conn, event_id):
 def mark_event_as_failed(conn, event_id, error_message=None):
     conn.execute("""
         UPDATE events
-        SET processed = -1, error_message = ?
+        SET processed = -1, processed_at = CURRENT_TIMESTAMP, error_message = ?
         WHERE id = ?
     """, (error_message, event_id))
     log(f"❌ Event {event_id} marked as failed: {error_message}")
 
-def show_pending_events():
-    events = get_new_events()
+@db_connection
+def mark_events_processed(conn, event_ids, worker_id=None):
+    """
+    Oznacza wiele eventów jako przetworzone jednym UPDATE.
+    Z worker_id potwierdza tylko eventy, które ten worker nadal trzyma.
+    Zwraca liczbę faktycznie oznaczonych.
+    """
+    if not event_ids:
+        return 0
+    cur = conn.execute("""
+        UPDATE events
+        SET processed = 1, processed_at = CURRENT_TIMESTAMP
+        WHERE id IN (SELECT value FROM json_each(?))
+          AND processed = 0
+          AND (? IS NULL OR claimed_by = ?)
+    """, (json.dumps(list(event_ids)), worker_id, worker_id))
+    log(f"✅ {cur.rowcount} events marked as processed")
+    return cur.rowcount
+
+@db_connection
+def mark_events_as_failed(conn, failures, worker_id=None):
+    """Oznacza wiele eventów jako błędne; failures = [(event_id, error_message), ...]."""
+    if not failures:
+        return 0
+    cur = conn.executemany("""
+        UPDATE events
+        SET processed = -1, processed_at = CURRENT_TIMESTAMP, error_message = ?
+        WHERE id = ?
+          AND processed = 0
+          AND (? IS NULL OR claimed_by = ?)
+    """, [(msg, event_id, worker_id, worker_id) for event_id, msg in failures])
+    log(f"❌ {cur.rowcount} events marked as failed")
+    return cur.rowcount
+
+@db_connection
+def get_failed_events(conn, limit=10):
+    """Ostatnie eventy oznaczone jako błędne: [(id, event_type, error_message, processed_at)]."""
+    return conn.execute("""
+        SELECT id, event_type, error_message, processed_at
+        FROM events
+        WHERE processed = -1
+        ORDER BY id DESC
+        LIMIT ?
+    """, (limit,)).fetchall()
+
+@db_connection
+def get_event_rollups(conn, since_hours=24):
+    """Liczniki zarchiwizowanych eventów po godzinie i typie (tabela event_rollups)."""
+    rows = conn.execute("""
+        SELECT hour, event_type, processed, failed, latency_seconds
+        FROM event_rollups
+        WHERE hour >= strftime('%Y-%m-%d %H:00', 'now', ?)
+        ORDER BY hour ASC, event_type ASC
+    """, (f"-{since_hours} hours",)).fetchall()
+    return [{"hour": r[0], "event_type": r[1], "processed": r[2], "failed": r[3],
+             "avg_latency_seconds": r[4] / max(r[2] + r[3], 1)} for r in rows]
+
+def show_pending_events(limit=50):
+    events = get_new_events(limit)
     if not events:
         print("Brak oczekujących eventów ✅")
         return
     print("\n--- 📋 Oczekujące eventy ---")
     for ev in events:
-        print(f"#{ev['id']} | {ev['event_type']} | payload: {ev['payload']} | {ev['created_at']}")
+        print(f"#{ev.id} | {ev.event_type} | payload: {ev.payload} | {ev.created_at}")
+    total = count_pending_events() or 0
+    if total > len(events):
+        print(f"... oraz {total - len(events)} kolejnych")
     print("------------------------------\n")
 #endregion
 #region PRODUKTY
@@ -88,41 +375,66 @@ def show_pending_events():
 # ============================================
 @db_connection
 def add_product_type(conn, name: str, weight: float, max_per_box: int):
-    if not name or weight <= 0 or max_per_box <= 0:
-        log("⚠️ Nieprawidłowe dane produktu.")
+    try:
+        name, weight, max_per_box = validate_product(name, weight, max_per_box)
+    except ValidationError as e:
+        log(f"⚠️ Nieprawidłowe dane produktu: {e}")
         return
     try:
         conn.execute("""
             INSERT INTO products (name, weight, max_per_box)
             VALUES (?, ?, ?)
         """, (name, weight, max_per_box))
+        product_cache.invalidate(name=name)
+        # jeśli transakcja zostanie wycofana, id może trafić do innego produktu
+        on_rollback(product_cache.clear)
         log(f"🆕 Added product: {name}, weight={weight}, max_per_box={max_per_box}")
     except sqlite3.IntegrityError:
         log(f"⚠️ Product {name} already exists.")
 
 @db_connection
-def get_product_info(conn, product_id):
-    row = conn.execute("SELECT id, name, weight, max_per_box FROM products WHERE id = ?", (product_id,)).fetchone()
-    return {"id": row[0], "name": row[1], "weight": row[2], "max_per_box": row[3]} if row else None
-
-@db_connection
-def get_product_by_name(conn, name):
-    row = conn.execute("SELECT id, name, weight, max_per_box FROM products WHERE name = ?", (name,)).fetchone()
-    return {"id": row[0], "name": row[1], "weight": row[2], "max_per_box": row[3]} if row else None
+def _load_product(conn, column, value):
+    row = conn.execute(f"SELECT {Product.columns()} FROM products WHERE {column} = ?", (value,)).fetchone()
+    if not row:
+        return None
+    product = Product.from_row(row)
+    product_cache.put(product)
+    return product
 
 @db_connection
-def check_product_exists(conn, product_name):
-    row = conn.execute("SELECT id FROM products WHERE name = ?", (product_name,)).fetchone()
-    return row is not None
+def warm_product_cache(conn):
+    """Ładuje katalog produktów do cache jednym zapytaniem (do rozmiaru cache)."""
+    rows = conn.execute(f"SELECT {Product.columns()} FROM products ORDER BY id LIMIT ?",
+                        (product_cache.max_size,)).fetchall()
+    product_cache.put_many(map(Product.from_row, rows), warmed=True)
+    return len(rows)
+
+def get_product_info(product_id):
+    """Zwraca produkt po id (z cache, przy braku — z bazy)."""
+    product = product_cache.get(product_id)
+    if product is None and not product_cache.warmed:
+        warm_product_cache()
+        product = product_cache.get(product_id)
+    return product or _load_product("id", product_id)
+
+def get_product_by_name(name):
+    """Zwraca produkt po nazwie (z cache, przy braku — z bazy)."""
+    product = product_cache.get_by_name(name)
+    if product is None and not product_cache.warmed:
+        warm_product_cache()
+        product = product_cache.get_by_name(name)
+    return product or _load_product("name", name)
+
+def check_product_exists(product_name):
+    return get_product_by_name(product_name) is not None
 
 @db_connection
 def get_all_products(conn):
     """Zwraca wszystkie produkty w bazie."""
-    rows = conn.execute("SELECT id, name, weight, max_per_box FROM products ORDER BY name ASC").fetchall()
-    return [
-        {"id": r[0], "name": r[1], "weight": r[2], "max_per_box": r[3]}
-        for r in rows
-    ]
+    rows = conn.execute(f"SELECT {Product.columns()} FROM products ORDER BY name ASC").fetchall()
+    products = [Product.from_row(r) for r in rows]
+    product_cache.put_many(products)
+    return products
 #endregion
 #region BOXY
 # ============================================
@@ -131,115 +443,170 @@ def get_all_products(conn):
 @db_connection
 def create_box(conn, product_id=None, quantity=0):
     """Tworzy nowy box z opcjonalnym produktem."""
-    barcode = f"BOX_{int.from_bytes(os.urandom(2), 'big')}"
+    barcode = new_box_barcode(conn)
     max_capacity = 0
 
     if product_id:
         product = get_product_info(product_id)
         if not product:
             raise ValueError("Produkt nie istnieje")
-        max_capacity = product["max_per_box"]
+        max_capacity = product.max_per_box
 
+    slot_id = allocate_slot_for_product(conn, barcode, product_id, quantity)
     conn.execute("""
-        INSERT INTO boxes (barcode, product_id, quantity, max_capacity)
-        VALUES (?, ?, ?, ?)
-    """, (barcode, product_id, quantity, max_capacity))
+        INSERT INTO boxes (barcode, product_id, quantity, max_capacity, slot_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, (barcode, product_id, quantity, max_capacity, slot_id))
 
-    log(f"📦 Box created: {barcode} product={product_id} qty={quantity}")
+    log(f"📦 Box created: {barcode} product={product_id} qty={quantity} slot={slot_id or 'Brak'}")
     return barcode
 
 
+@db_connection(immediate=True)
+def create_boxes(conn, count, product_id=None):
+    """
+    Tworzy `count` pustych boxów (opcjonalnie przypisanych do produktu)
+    jednym INSERT. Sloty przydziela obok siebie. Zwraca listę kodów.
+    """
+    if count <= 0:
+        return []
+    max_capacity = 0
+    if product_id:
+        product = get_product_info(product_id)
+        if not product:
+            raise ValueError("Produkt nie istnieje")
+        max_capacity = product.max_per_box
+
+    barcodes = new_box_barcodes(conn, count)
+    near = find_slot_near_product(conn, product_id) if product_id else None
+    rows = []
+    for barcode in barcodes:
+        slot_id = allocate_slot(conn, barcode, near_slot_id=near)
+        near = slot_id or near
+        rows.append((barcode, slot_id))
+    conn.execute("""
+        INSERT INTO boxes (barcode, product_id, quantity, max_capacity, slot_id)
+        SELECT json_extract(value, '$[0]'), ?, 0, ?, json_extract(value, '$[1]') FROM json_each(?)
+    """, (product_id, max_capacity, json.dumps(rows)))
+
+    log(f"📦 Created {count} boxes ({barcodes[0]}..{barcodes[-1]}) product={product_id}")
+    return barcodes
+
+
 @db_connection
 def delete_box(conn, box_id):
     """Usuwa box tylko jeśli jest pusty i bez produktu."""
-    row = conn.execute("SELECT quantity, product_id FROM boxes WHERE id=?", (box_id,)).fetchone()
+    row = conn.execute("SELECT quantity, product_id, slot_id FROM boxes WHERE id=?", (box_id,)).fetchone()
     if not row:
         return False
 
-    quantity, product_id = row
+    quantity, product_id, slot_id = row
     if quantity != 0 or product_id is not None:
         return False
 
+    release_slot(conn, slot_id)
     conn.execute("DELETE FROM boxes WHERE id=?", (box_id,))
     log(f"🗑 Deleted empty box ID={box_id}")
     return True
 
 
+_BOX_SELECT = f"""
+    SELECT {Box.columns("b", product_name="p.name")}
+    FROM boxes b
+    LEFT JOIN products p ON p.id = b.product_id
+"""
+
 @db_connection
 def get_box(conn, box_id):
     """Zwraca dane jednego boxa."""
-    r = conn.execute("""
-        SELECT id, barcode, product_id, quantity, max_capacity, slot_id
-        FROM boxes WHERE id=?
-    """, (box_id,)).fetchone()
-
-    if not r:
-        return None
-
-    return {
-        "id": r[0],
-        "barcode": r[1],
-        "product_id": r[2],
-        "quantity": r[3],
-        "max_capacity": r[4],
-        "slot_id": r[5]
-    }
+    r = conn.execute(_BOX_SELECT + "WHERE b.id=?", (box_id,)).fetchone()
+    return Box.from_row(r) if r else None
 
 
 @db_connection
 def get_box_by_barcode(conn, barcode):
     """Pobiera box po kodzie."""
-    r = conn.execute("""
-        SELECT id, barcode, product_id, quantity, max_capacity, slot_id
-        FROM boxes WHERE barcode=?
-    """, (barcode,)).fetchone()
-
-    if not r:
-        return None
-
-    return {
-        "id": r[0],
-        "barcode": r[1],
-        "product_id": r[2],
-        "quantity": r[3],
-        "max_capacity": r[4],
-        "slot_id": r[5]
-    }
-
+    r = conn.execute(_BOX_SELECT + "WHERE b.barcode=?", (barcode,)).fetchone()
+    return Box.from_row(r) if r else None
+
+
+# Domyślny rozmiar strony listy boxów
+BOX_PAGE_SIZE = 500
+
+_BOX_STATE_FILTERS = {
+    BOX_STATE_EMPTY: "(b.product_id IS NULL OR b.quantity = 0)",
+    BOX_STATE_PARTIAL: "(b.product_id IS NOT NULL AND b.quantity > 0 AND b.quantity < b.max_capacity)",
+    BOX_STATE_FULL: "(b.product_id IS NOT NULL AND b.quantity > 0 AND b.quantity >= b.max_capacity)",
+    BOX_STATE_NOT_EMPTY: "(b.product_id IS NOT NULL AND b.quantity > 0)",
+}
+
+def _box_filters(product_id=None, state=None, aisle=None, slot_id=None):
+    """Buduje warunki WHERE (i ewentualny JOIN ze slotami) dla listy boxów."""
+    if state is not None and state not in _BOX_STATE_FILTERS:
+        raise ValueError(f"Nieznany stan boxa: {state}")
+    where, params, join = [], [], ""
+    if product_id is not None:
+        where.append("b.product_id = ?")
+        params.append(product_id)
+    if state is not None:
+        where.append(_BOX_STATE_FILTERS[state])
+    if slot_id is not None:
+        where.append("b.slot_id = ?")
+        params.append(slot_id)
+    if aisle is not None:
+        join = "JOIN slots s ON s.id = b.slot_id"
+        where.append("s.aisle = ?")
+        params.append(aisle)
+    return join, where, params
 
 @db_connection
-def get_all_boxes(conn):
-    """Lista wszystkich boxów."""
-    rows = conn.execute("""
-        SELECT b.id, b.barcode, b.product_id, p.name AS product_name,
-               b.quantity, b.max_capacity, b.slot_id
-        FROM boxes b
-        LEFT JOIN products p ON p.id = b.product_id
+def get_boxes_page(conn, after_id=0, limit=BOX_PAGE_SIZE, product_id=None, state=None, aisle=None, slot_id=None):
+    """Jedna strona boxów o id > after_id (keyset), z opcjonalnymi filtrami."""
+    join, where, params = _box_filters(product_id, state, aisle, slot_id)
+    where.insert(0, "b.id > ?")
+    rows = conn.execute(f"""
+        {_BOX_SELECT}
+        {join}
+        WHERE {" AND ".join(where)}
         ORDER BY b.id ASC
-    """).fetchall()
+        LIMIT ?
+    """, (after_id, *params, limit)).fetchall()
+    return [Box.from_row(r) for r in rows]
+
+def iter_box_pages(page_size=BOX_PAGE_SIZE, after_id=0, **filters):
+    """Generator stron boxów — w pamięci jest zawsze tylko jedna strona."""
+    while True:
+        page = get_boxes_page(after_id, page_size, **filters)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        after_id = page[-1].id
+
+def iter_boxes(page_size=BOX_PAGE_SIZE, after_id=0, **filters):
+    """Strumień pojedynczych boxów (filtry jak w get_boxes_page)."""
+    for page in iter_box_pages(page_size, after_id, **filters):
+        yield from page
 
-    return [
-        {
-            "id": r[0],
-            "barcode": r[1],
-            "product_id": r[2],
-            "product_name": r[3],
-            "quantity": r[4],
-            "max_capacity": r[5],
-            "slot_id": r[6]
-        }
-        for r in rows
-    ]
+@db_connection
+def count_boxes(conn, product_id=None, state=None, aisle=None, slot_id=None):
+    """Liczba boxów spełniających filtry."""
+    join, where, params = _box_filters(product_id, state, aisle, slot_id)
+    row = conn.execute(f"""
+        SELECT COUNT(*) FROM boxes b {join}
+        {"WHERE " + " AND ".join(where) if where else ""}
+    """, params).fetchone()
+    return row[0] if row else 0
 
+def get_all_boxes(**filters):
+    """Lista wszystkich boxów (materializuje cały wynik — do dużych magazynów używaj iter_boxes)."""
+    return list(iter_boxes(**filters))
 
-@db_connection
-def get_empty_boxes(conn):
-    """Zwraca wszystkie puste boxy."""
-    rows = conn.execute("""
-        SELECT id, barcode FROM boxes WHERE quantity=0 OR product_id IS NULL
-    """).fetchall()
 
-    return [{"id": r[0], "barcode": r[1]} for r in rows]
+def get_empty_boxes():
+    """Zwraca wszystkie puste boxy."""
+    return get_all_boxes(state=BOX_STATE_EMPTY)
 
 
 @db_connection
@@ -254,7 +621,7 @@ def update_box_quantity(conn, box_barcode, delta, product_id=None):
             UPDATE boxes
             SET product_id=?, max_capacity=?
             WHERE barcode=? AND (product_id IS NULL OR quantity=0)
-        """, (product_id, product["max_per_box"], box_barcode))
+        """, (product_id, product.max_per_box, box_barcode))
 
     conn.execute("""
         UPDATE boxes SET quantity = quantity + ? WHERE barcode=?
@@ -265,48 +632,74 @@ def update_box_quantity(conn, box_barcode, delta, product_id=None):
 
 @db_connection
 def set_box_slot(conn, box_id, slot_id):
-    """Przypisuje box do slotu."""
+    """Przypisuje box do slotu (slot musi być wolny). Zwraca True/False."""
+    box = conn.execute("SELECT barcode, quantity, slot_id FROM boxes WHERE id=?", (box_id,)).fetchone()
+    if not box:
+        return False
+    barcode, quantity, old_slot = box
+    if old_slot == slot_id:
+        return True
+
+    if not occupy_slot(conn, slot_id, barcode, slot_status_for(quantity)):
+        log(f"⚠️ Slot {slot_id} nie istnieje albo jest zajęty")
+        return False
+    release_slot(conn, old_slot)
     conn.execute("UPDATE boxes SET slot_id=? WHERE id=?", (slot_id, box_id))
     log(f"📦 Box {box_id} → Slot {slot_id}")
+    return True
 
 
 @db_connection
 def clear_box_slot(conn, box_id):
     """Usuwa przypisanie boxa do slotu."""
+    row = conn.execute("SELECT slot_id FROM boxes WHERE id=?", (box_id,)).fetchone()
+    if not row:
+        return
+    release_slot(conn, row[0])
     conn.execute("UPDATE boxes SET slot_id=NULL WHERE id=?", (box_id,))
     log(f"📦 Box {box_id} unassigned from slot")
 
 
+@db_connection
+def find_free_slot(conn, near_product_id=None):
+    """Najbliższy wolny slot (przy boxach danego produktu albo przy początku siatki)."""
+    index = get_slot_index(conn)
+    near = find_slot_near_product(conn, near_product_id) if near_product_id else None
+    anchor = index.position(near) if near else None
+    return index.nearest_free(anchor[0], anchor[1]) if anchor else index.nearest_free()
+
+
+@db_connection
+def get_free_slots_count(conn):
+    """Liczba wolnych slotów (z indeksu w pamięci)."""
+    return get_slot_index(conn).free_count()
+
+
+@db_connection
+def get_slot(conn, slot_id):
+    """Zwraca slot po id."""
+    row = conn.execute(f"SELECT {Slot.columns()} FROM slots WHERE id=?", (slot_id,)).fetchone()
+    return Slot.from_row(row) if row else None
+
+
 @db_connection
 def find_box_with_free_space(conn, product_id):
     """Znajduje box z miejscem dla danego produktu."""
-    row = conn.execute("""
-        SELECT id, barcode, quantity, max_capacity
-        FROM boxes
-        WHERE product_id=? AND quantity < max_capacity
-        ORDER BY id ASC
+    row = conn.execute(_BOX_SELECT + """
+        WHERE b.product_id=? AND b.quantity < b.max_capacity
+        ORDER BY b.id ASC
         LIMIT 1
     """, (product_id,)).fetchone()
+    return Box.from_row(row) if row else None
 
-    if not row:
-        return None
-
-    return {
-        "id": row[0],
-        "barcode": row[1],
-        "quantity": row[2],
-        "max_capacity": row[3]
-    }
 @db_connection
 def get_box_by_product(conn, product_id):
     """Zwraca istniejący box z wolnym miejscem."""
-    row = conn.execute("""
-        SELECT barcode, quantity, max_capacity
-        FROM boxes
-        WHERE product_id = ? AND quantity < max_capacity
+    row = conn.execute(_BOX_SELECT + """
+        WHERE b.product_id = ? AND b.quantity < b.max_capacity
         LIMIT 1
     """, (product_id,)).fetchone()
-    return {"barcode": row[0], "quantity": row[1], "max_capacity": row[2]} if row else None
+    return Box.from_row(row) if row else None
 
 
 def create_empty_box():
@@ -315,13 +708,11 @@ def create_empty_box():
 
 @db_connection
 def get_empty_boxes_count(conn):
-    """Zwraca liczbę pustych boxów."""
-    row = conn.execute("""
-        SELECT COUNT(*) FROM boxes WHERE quantity = 0 OR product_id IS NULL
-    """).fetchone()
+    """Zwraca liczbę pustych boxów (z agregatu stock_totals — O(1))."""
+    row = conn.execute("SELECT empty_boxes FROM stock_totals WHERE id = 1").fetchone()
     return row[0] if row else 0
 
-@db_connection
+@db_connection(immediate=True)
 def assign_product_from_pallet_to_box(conn, pallet_id, product_id, box_id, quantity, slot_id=None):
     """Przenosi produkty z palety do boxa i ustawia slot w magazynie."""
     # === 1. Pobierz paletę ===
@@ -330,50 +721,71 @@ def assign_product_from_pallet_to_box(conn, pallet_id, product_id, box_id, quant
         return False
 
     pallet_id_db, p_id, p_qty, pallet_barcode = pallet
+    if p_id != product_id:
+        # inaczej towar z palety trafiłby do boxa z etykietą innego produktu
+        log(f"❌ Paleta {pallet_barcode} zawiera produkt {p_id}, a nie {product_id}")
+        return False
     if p_qty < quantity:
         return False  # za mało na palecie
+    if pallets.available_on_pallets(conn, p_id) < quantity:
+        log(f"⚠️ Towar z palety {pallet_barcode} jest zarezerwowany")
+        return False
 
     # === 2. Pobierz box ===
-    box = conn.execute("SELECT barcode, product_id, quantity, max_capacity FROM boxes WHERE id=?", (box_id,)).fetchone()
+    box = conn.execute("SELECT barcode, product_id, quantity, max_capacity, slot_id FROM boxes WHERE id=?", (box_id,)).fetchone()
     if not box:
         return False
 
-    box_barcode, b_product_id, b_qty, b_cap = box
+    box_barcode, b_product_id, b_qty, b_cap, b_slot = box
 
     # === 3. Pobierz info o produkcie ===
     product = get_product_info(product_id)
     if not product:
         return False
 
-    # === 4. Sprawdzenie i aktualizacja boxa ===
+    # === 4. Sprawdzenie boxa ===
     if b_product_id is None:
         # box pusty → przypisujemy produkt
-        max_cap = product["max_per_box"]
+        max_cap = product.max_per_box
         if quantity > max_cap:
             return False
+    elif b_product_id != product_id or (b_qty + quantity > b_cap):
+        # box zawiera inny produkt albo brak miejsca
+        return False
+
+    # === 5. Slot: wskazany, dotychczasowy albo najbliższy wolny przy produkcie ===
+    if slot_id and slot_id != b_slot:
+        if not occupy_slot(conn, slot_id, box_barcode, SLOT_BOX_WITH_PRODUCTS):
+            return False
+        release_slot(conn, b_slot)
+    elif b_slot:
+        slot_id = b_slot
+        update_slot_status(conn, slot_id, quantity)
+    else:
+        slot_id = allocate_slot_for_product(conn, box_barcode, product_id, quantity)
+
+    # === 6. Aktualizacja boxa ===
+    if b_product_id is None:
         conn.execute("""
             UPDATE boxes
             SET product_id=?, max_capacity=?, quantity=?, slot_id=?
             WHERE id=?
         """, (product_id, max_cap, quantity, slot_id, box_id))
     else:
-        # box zawiera już produkt
-        if b_product_id != product_id or (b_qty + quantity > b_cap):
-            return False
         conn.execute("""
             UPDATE boxes
             SET quantity = quantity + ?, slot_id=?
             WHERE id=?
         """, (quantity, slot_id, box_id))
 
-    # === 5. Zmniejszamy ilość na palecie ===
+    # === 7. Zmniejszamy ilość na palecie ===
     new_qty = p_qty - quantity
     if new_qty <= 0:
         conn.execute("DELETE FROM external_palets WHERE id=?", (pallet_id,))
     else:
         conn.execute("UPDATE external_palets SET quantity=? WHERE id=?", (new_qty, pallet_id))
 
-    log(f"📦 Przeniesiono {quantity} x {product['name']} z palety {pallet_barcode} do boxa {box_barcode} (slot: {slot_id or 'Brak'})")
+    log(f"📦 Przeniesiono {quantity} x {product.name} z palety {pallet_barcode} do boxa {box_barcode} (slot: {slot_id or 'Brak'})")
     return True
 
 
@@ -385,10 +797,15 @@ def assign_product_from_pallet_to_box(conn, pallet_id, product_id, box_id, quant
 
 @db_connection
 def add_external_palet(conn, product_id: int, quantity: int, palet_name: str):
+    try:
+        product_id, quantity, palet_name = validate_palet(product_id, quantity, palet_name)
+    except ValidationError as e:
+        log(f"⚠️ Nieprawidłowe dane palety: {e}")
+        return
     try:
         conn.execute("""
-            INSERT INTO external_palets (barcode, product_id, quantity)
-            VALUES (?, ?, ?)
+            INSERT INTO external_palets (barcode, product_id, quantity, received_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
         """, (palet_name, product_id, quantity))
         log(f"🆕 Added external pallet: {palet_name} (product {product_id}, qty={quantity})")
     except sqlite3.IntegrityError:
@@ -396,100 +813,163 @@ def add_external_palet(conn, product_id: int, quantity: int, palet_name: str):
 
 @db_connection
 def get_external_palets(conn):
-    """Return external pallets as list of dicts: {id, barcode, product_id, quantity}."""
-    # ustawienie row_factory nie jest potrzebne w dekoratorze — mapujemy ręcznie
-    rows = conn.execute("SELECT id, barcode, product_id, quantity FROM external_palets ORDER BY id ASC").fetchall()
-    return [
-        {"id": r[0], "barcode": r[1], "product_id": r[2], "quantity": r[3]}
-        for r in rows
-    ]
+    """Return external pallets (Pallet) in FIFO order."""
+    rows = conn.execute(f"SELECT {Pallet.columns()} FROM external_palets ORDER BY received_at ASC, id ASC").fetchall()
+    return [Pallet.from_row(r) for r in rows]
 @db_connection
 def get_total_on_palets(conn, product_id):
-    row = conn.execute("SELECT IFNULL(SUM(quantity),0) FROM external_palets WHERE product_id = ?", (product_id,)).fetchone()
+    """Ilość produktu na paletach (z agregatu product_stock — O(1))."""
+    row = conn.execute("SELECT units_on_palets FROM product_stock WHERE product_id = ?", (product_id,)).fetchone()
     return row[0] if row else 0
 
-@db_connection
-def take_products_from_palets(conn, product_id: int, quantity: int):
-    total_taken = 0
-    needed = quantity
-    rows = conn.execute("""
-        SELECT id, quantity FROM external_palets
-        WHERE product_id = ? ORDER BY created_at ASC
-    """, (product_id,)).fetchall()
-    for r in rows:
-        if needed <= 0:
-            break
-        palet_id, palet_qty = r
-        take = min(palet_qty, needed)
-        new_qty = palet_qty - take
-        if new_qty > 0:
-            conn.execute("UPDATE external_palets SET quantity=? WHERE id=?", (new_qty, palet_id))
-        else:
-            conn.execute("DELETE FROM external_palets WHERE id=?", (palet_id,))
-        total_taken += take
-        needed -= take
+@db_connection(immediate=True)
+def take_products_from_palets(conn, product_id: int, quantity: int, reservation_id=None):
+    """
+    Zdejmuje do `quantity` sztuk produktu z palet (FIFO, jednym UPDATE).
+    Bez rezerwacji bierze tylko towar niezarezerwowany przez innych.
+    Zwraca liczbę faktycznie pobranych sztuk.
+    """
+    total_taken = min(quantity, pallets.available_on_pallets(conn, product_id, reservation_id))
+    if total_taken > 0:
+        pallets.drain_fifo(conn, product_id, total_taken, reservation_id)
+    else:
+        total_taken = 0
     if total_taken < quantity:
         log(f"⚠️ Nie udało się pobrać całej ilości: chciałeś {quantity}, pobrano {total_taken}")
     return total_taken
 
+# ============================================
+# 🔹 REZERWACJE TOWARU Z PALET
+# ============================================
+@db_connection(immediate=True)
+def reserve_pallet_stock(conn, product_id: int, quantity: int, owner=None, ttl_seconds=RESERVATION_TTL_SECONDS):
+    """Rezerwuje towar na paletach; zwraca id rezerwacji albo None, gdy brakuje towaru."""
+    pallets.purge_expired(conn)
+    try:
+        reservation_id = pallets.reserve(conn, product_id, quantity, owner, ttl_seconds)
+    except WarehouseError as e:
+        log(f"⚠️ {e}")
+        return None
+    log(f"🔒 Reservation {reservation_id}: {quantity} x product {product_id} ({owner or '-'})")
+    return reservation_id
+
+@db_connection
+def release_pallet_reservation(conn, reservation_id):
+    """Zwalnia rezerwację (towar wraca do puli). True, jeśli istniała."""
+    released = pallets.release(conn, reservation_id)
+    if released:
+        log(f"🔓 Reservation {reservation_id} released")
+    return released
+
+@db_connection
+def get_available_on_palets(conn, product_id):
+    """Ilość produktu na paletach, której nikt nie zarezerwował."""
+    return pallets.available_on_pallets(conn, product_id)
+
 # ============================================
 # 🔹 DODAWANIE PRODUKTÓW DO MAGAZYNU
 # ============================================
-def add_products_to_stock(product_id: int, quantity: int):
-    available = get_total_on_palets(product_id)
-    if quantity > available:
-        log(f"❌ Za mało produktów na paletach: dostępne {available}, próbujesz dodać {quantity}")
-        return
-    product_info = get_product_info(product_id)
-    max_per_box = product_info['max_per_box']
-    boxes_needed = (quantity + max_per_box - 1) // max_per_box
-    empty_boxes = get_empty_boxes_count()
-    if boxes_needed > empty_boxes:
-        log(f"❌ Za mało pustych boxów: potrzebne {boxes_needed}, dostępne {empty_boxes}")
-        return
-    taken = take_products_from_palets(product_id, quantity)
-    remaining = taken
-    while remaining > 0:
-        box = get_box_by_product(product_id)
-        if box:
-            box_barcode = box['barcode']
-        else:
-            box_barcode = create_box()  # pusty box
-        box_qty = min(remaining, max_per_box)
-        update_box_quantity(box_barcode, box_qty, product_id=product_id)
-        remaining -= box_qty
+@db_connection(immediate=True)
+def add_products_to_stock(conn, product_id: int, quantity: int, reservation_id=None):
+    """
+    Przenosi `quantity` sztuk produktu z palet do boxów jedną transakcją
+    (dopełnia częściowe boxy, potem puste, potem zakłada nowe).
+    Z reservation_id zużywa wcześniej zarezerwowany towar.
+    Zwraca zastosowany PutawayPlan. Gdy się nie da (brak towaru, produktu,
+    miejsca), plan_putaway rzuca WarehouseError — zwykłe wywołanie loguje
+    błąd i zwraca None, a add_products_to_stock.strict (eventy) rzuca dalej.
+    """
+    plan = plan_putaway(conn, product_id, quantity, reservation_id=reservation_id)
+    apply_putaway(conn, plan)
+    log(f"📦 Putaway {quantity} x product {product_id}: "
+        f"{len(plan.pallet_takes)} palet, {plan.boxes_touched} boxów ({len(plan.new_boxes)} nowych)")
+    return plan
 
 # ============================================
-# 🔹 WYŚWIETLANIE STANU MAGAZYNU
+# 🔹 KOMPLETACJA ZAMÓWIEŃ (db/picking.py)
 # ============================================
-def show_stock():
-    boxes = get_all_boxes()
-    palets = get_external_palets()
+def pick_orders(orders, allow_partial=False):
+    """
+    Kompletuje falę zamówień (payloady PICK_ORDER) w jednej transakcji IMMEDIATE:
+    wybór boxów, trasa, zdjęcie towaru, lista w pick_lines. Zwraca PickPlan.
+    Błędy (brak towaru, złe dane) są rzucane dalej — event ma zostać oznaczony jako błędny.
+    """
+    parsed = [validate_order(order) for order in orders]
+    with transaction(immediate=True) as conn:
+        plan = plan_picking(conn, parsed, allow_partial)
+        apply_picking(conn, plan)
+    log(f"🧺 Wave {plan.wave_id}: {len(parsed)} orders, {len(plan.stops)} stops, {plan.units} units"
+        + (f", short {plan.shortages}" if plan.shortages else ""))
+    return plan
 
-    print("\n====== STAN MAGAZYNU ======\n")
+@db_connection
+def get_pick_list(conn, wave_id=None, order_id=None):
+    """Linie kompletacji fali (w kolejności trasy) albo zamówienia: [(seq, order_id, produkt, box, slot, ilość)]."""
+    column, value = ("wave_id", wave_id) if order_id is None else ("order_id", order_id)
+    return conn.execute(f"""
+        SELECT l.seq, l.order_id, p.name, b.barcode, l.slot_id, l.quantity
+        FROM pick_lines l
+        LEFT JOIN products p ON p.id = l.product_id
+        LEFT JOIN boxes b ON b.id = l.box_id
+        WHERE l.{column} = ?
+        ORDER BY l.wave_id, l.seq, l.id
+    """, (value,)).fetchall()
 
-    # Produkty w boksach
-    boxes_with_products = [b for b in boxes if b['current_quantity'] > 0 and b['product_id']]
-    if not boxes_with_products:
-        print("📦 Produkty w boksach:\n  - Brak produktów w boksach.")
-    else:
-        print("📦 Produkty w boksach:")
-        for b in boxes_with_products:
-            free_space = b['max_capacity'] - b['current_quantity']
-            print(f"  - {b['barcode']} | {b['product_name']} | {b['current_quantity']}/{b['max_capacity']} szt. | wolne: {free_space}")
-
-    # Palety zewnętrzne
-    if not palets:
-        print("\n🪵 Palety zewnętrzne:\n  - Brak palet.")
-    else:
-        print("\n🪵 Palety zewnętrzne:")
-        for p in palets:
-            print(f"  - {p['name']} | {p['product_name']} | {p['quantity']} szt.")
+# ============================================
+# 🔹 AGREGATY STANU (product_stock / stock_totals)
+# ============================================
+
+@db_connection
+def get_product_stock(conn, product_id):
+    """Stan jednego produktu: sztuki w boxach, boxy, częściowe boxy, wolne miejsce, sztuki i liczba palet."""
+    row = conn.execute(f"""
+        SELECT {", ".join(_STOCK_COLUMNS)} FROM product_stock WHERE product_id = ?
+    """, (product_id,)).fetchone()
+    return dict(zip(_STOCK_COLUMNS, row or (0,) * len(_STOCK_COLUMNS)))
 
-    total_in_boxes = sum(b['current_quantity'] for b in boxes_with_products)
-    empty_boxes = sum(1 for b in boxes if not b['product_id'] or b['current_quantity'] == 0)
-    print(f"\n📊 Łączna liczba produktów w boksach: {total_in_boxes} szt.")
-    print(f"📭 Liczba pustych boksów: {empty_boxes}")
+@db_connection
+def get_stock_summary(conn):
+    """Stan wszystkich produktów, które są w boxach albo na paletach (po nazwie)."""
+    return select_stock_summary(conn)
+
+@db_connection
+def get_stock_totals(conn):
+    """Liczba pustych boxów i łączna liczba sztuk w boxach."""
+    row = conn.execute("SELECT empty_boxes, units_in_boxes FROM stock_totals WHERE id = 1").fetchone()
+    return {"empty_boxes": row[0], "units_in_boxes": row[1]} if row else {"empty_boxes": 0, "units_in_boxes": 0}
+
+# ============================================
+# 🔹 WYŚWIETLANIE STANU MAGAZYNU
+# ============================================
+def show_stock(report=None):
+    """Wypisuje raport stanu — wszystkie liczby z jednego snapshotu (db/reports.py)."""
+    report = report or stock_report()
+    totals = report.totals
+
+    print(f"\n====== STAN MAGAZYNU ({report.taken_at} UTC) ======\n")
+
+    # 1️⃣ Produkty w boksach
+    in_boxes = report.in_boxes
+    print("📦 Produkty w boksach:")
+    if not in_boxes:
+        print("  - Brak produktów w boksach.")
+    for s in in_boxes:
+        print(f"  - {s['name']} | {s['units_in_boxes']} szt. w {s['boxes']} boxach "
+              f"(częściowych: {s['partial_boxes']}, wolne miejsce: {s['free_capacity']})")
+
+    # 2️⃣ Palety zewnętrzne
+    on_palets = report.on_palets
+    print("\n🪵 Palety zewnętrzne:")
+    if not on_palets:
+        print("  - Brak palet.")
+    for s in on_palets:
+        print(f"  - {s['name']} x {s['units_on_palets']} ({s['palets']} palet)")
+
+    # 3️⃣ / 4️⃣ Sumy
+    print(f"\n📊 Łączna liczba produktów w boksach: {totals['units_in_boxes']} szt.")
+    print(f"📭 Liczba pustych boksów: {totals['empty_boxes']} (wszystkich: {totals['boxes']})")
+    print(f"🪵 Na paletach: {totals['units_on_palets']} szt. na {totals['palets']} paletach")
+    print(f"📬 Eventy w kolejce: {report.pending_events}")
 
     print("\n============================\n")
 #endregion
@@ -499,10 +979,18 @@ def show_stock():
 # 🔹 EXPORT
 # ============================================
 __all__ = [
-    "add_event","get_new_events","mark_event_processed","mark_event_as_failed","show_pending_events",
-    "add_product_type","get_product_info","get_product_by_name","check_product_exists",
-    "create_box","get_box_by_product","update_box_quantity","get_all_boxes","get_empty_boxes_count",
+    "add_event","add_events","get_new_events","mark_event_processed","mark_event_as_failed","show_pending_events",
+    "mark_events_processed","mark_events_as_failed",
+    "get_events_page","iter_event_pages","iter_new_events","count_pending_events",
+    "claim_events","release_events","count_pending_by_lane","EVENT_LEASE_SECONDS","get_event_rollups","get_failed_events",
+    "warm_product_cache","product_cache","get_product_stock","get_stock_summary","get_stock_totals","find_free_slot","get_free_slots_count",
+    "add_product_type","validate_product","validate_palet","ValidationError","get_product_info","get_product_by_name","check_product_exists",
+    "create_box","create_boxes","get_box_by_product","update_box_quantity","get_all_boxes","get_empty_boxes_count",
+    "Product","Box","Pallet","Event","Slot","get_slot","get_empty_boxes","find_box_with_free_space","BOX_PAGE_SIZE","BOX_STATE_EMPTY","BOX_STATE_PARTIAL","BOX_STATE_FULL","BOX_STATE_NOT_EMPTY",
+    "get_boxes_page","iter_box_pages","iter_boxes","count_boxes",
     "add_external_palet","get_external_palets","get_total_on_palets","take_products_from_palets",
-    "add_products_to_stock","show_stock", "get_all_products", "delete_box", "get_box", "get_box_by_barcode",
-    "set_box_slot", "clear_box_slot", "assign_product_from_pallet_to_box"
+    "reserve_pallet_stock","release_pallet_reservation","get_available_on_palets","RESERVATION_TTL_SECONDS",
+    "add_products_to_stock","pick_orders","get_pick_list","PickPlan","show_stock","stock_report","StockReport", "get_all_products", "delete_box", "get_box", "get_box_by_barcode",
+    "set_box_slot", "clear_box_slot", "assign_product_from_pallet_to_box",
+    "transaction"
 ]
@@ -0,0 +1,176 @@
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+
+from db import db_init
+
+# ============================================
+# 🔹 Pula połączeń (jedno połączenie na wątek)
+# ============================================
+# Każdy wątek trzyma własne, długo żyjące połączenie do bazy (per DB_PATH).
+# Transakcje sterujemy sami (isolation_level=None): najbardziej zewnętrzne
+# wywołanie robi BEGIN/COMMIT, zagnieżdżone — SAVEPOINT/RELEASE.
+
+_local = threading.local()
+_all_entries = []
+_all_lock = threading.Lock()
+_generation = 0  # zwiększane przez close_pool(), unieważnia stare wpisy
+
+
+class _PoolEntry:
+    __slots__ = ("conn", "path", "depth", "generation", "rollback_hooks")
+
+    def __init__(self, conn, path):
+        self.conn = conn
+        self.path = path
+        self.depth = 0
+        self.generation = _generation
+        self.rollback_hooks = []  # [(poziom, callback)]
+
+
+def _entries():
+    entries = getattr(_local, "entries", None)
+    if entries is None:
+        entries = _local.entries = {}
+    return entries
+
+
+def _acquire():
+    """Zwraca wpis puli dla bieżącego wątku i bieżącej ścieżki bazy."""
+    path = db_init.DB_PATH
+    entries = _entries()
+    entry = entries.get(path)
+    if entry is not None and entry.generation != _generation:
+        entry = None
+    if entry is None:
+        conn = db_init.get_connection()
+        conn.isolation_level = None  # transakcje zarządzane ręcznie
+        entry = entries[path] = _PoolEntry(conn, path)
+        with _all_lock:
+            _all_entries.append(entry)
+    return entry
+
+
+def get_pooled_connection():
+    """Zwraca połączenie wątku (bez otwierania transakcji)."""
+    return _acquire().conn
+
+
+def in_transaction():
+    """Czy bieżący wątek jest wewnątrz transaction()."""
+    entry = _entries().get(db_init.DB_PATH)
+    return entry is not None and entry.depth > 0
+
+
+def on_rollback(callback):
+    """
+    Rejestruje callback wywoływany, jeśli bieżąca transakcja (lub savepoint)
+    zostanie wycofana — np. żeby unieważnić cache. Poza transakcją: no-op.
+    """
+    entry = _entries().get(db_init.DB_PATH)
+    if entry is not None and entry.depth > 0:
+        entry.rollback_hooks.append((entry.depth, callback))
+
+
+def _fire_rollback_hooks(entry, level):
+    keep, fire = [], []
+    for hook in entry.rollback_hooks:
+        (fire if hook[0] >= level else keep).append(hook)
+    entry.rollback_hooks = keep
+    for _, callback in fire:
+        try:
+            callback()
+        except Exception:
+            pass
+
+
+@contextmanager
+def transaction(immediate=False):
+    """
+    Wspólna transakcja dla wielu wywołań db_manager w tym samym wątku.
+
+    Zewnętrzny poziom otwiera BEGIN (lub BEGIN IMMEDIATE) i commituje na końcu,
+    zagnieżdżone poziomy używają SAVEPOINT, więc błąd wewnątrz wycofuje tylko
+    swoją część.
+    """
+    entry = _acquire()
+    conn = entry.conn
+
+    if entry.depth == 0:
+        conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        entry.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            _fire_rollback_hooks(entry, 1)
+            raise
+        else:
+            try:
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                _fire_rollback_hooks(entry, 1)
+                raise
+        finally:
+            entry.depth = 0
+            entry.rollback_hooks = []
+        return
+
+    name = f"sp_{entry.depth}"
+    conn.execute(f"SAVEPOINT {name}")
+    entry.depth += 1
+    try:
+        yield conn
+    except BaseException:
+        conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        _fire_rollback_hooks(entry, entry.depth)
+        raise
+    else:
+        conn.execute(f"RELEASE {name}")
+    finally:
+        entry.depth -= 1
+
+
+def close_connection():
+    """Zamyka połączenia bieżącego wątku."""
+    entries = _entries()
+    with _all_lock:
+        for entry in entries.values():
+            _close_entry(entry)
+            if entry in _all_entries:
+                _all_entries.remove(entry)
+    entries.clear()
+
+
+def close_pool():
+    """Zamyka wszystkie połączenia puli (wywoływane przy wyjściu)."""
+    global _generation
+    with _all_lock:
+        _generation += 1
+        for entry in _all_entries:
+            _close_entry(entry)
+        _all_entries.clear()
+    _entries().clear()
+
+
+def _close_entry(entry):
+    try:
+        entry.conn.close()
+    except Exception:
+        pass
+
+
+def _reset_after_fork():
+    # połączeń SQLite nie wolno używać po fork() — proces potomny otwiera własne
+    global _local, _all_entries, _all_lock
+    _local = threading.local()
+    _all_entries = []
+    _all_lock = threading.Lock()
+
+
+atexit.register(close_pool)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
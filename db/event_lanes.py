@@ -0,0 +1,111 @@
+import json
+import os
+
+from utils.logger import log_error
+
+# ============================================
+# 🔹 PASY PRIORYTETÓW KOLEJKI EVENTÓW
+# ============================================
+# Każdy typ eventu należy do pasa (lane) z wagą. claim_events dzieli paczkę
+# między pasy, które mają coś w kolejce, proporcjonalnie do wag (weighted
+# fair), a miejsce niewykorzystane przez puste pasy oddaje pozostałym.
+# Dzięki temu zalew ADD_PRODUCTS_TO_STOCK nie zatrzymuje tanich
+# ADD_PRODUCT_TYPE / ADD_PALETTE. Wagi decydują tylko o tym, KTÓRE eventy
+# trafią do paczki — w paczce eventy są przetwarzane po id (FIFO).
+# Zależności: pas nie wyprzedza starszych oczekujących eventów pasów, od
+# których zależy — jego eventy są brane tylko, jeśli są starsze od
+# najstarszego eventu tych pasów spoza paczki. Pas z "barrier": true
+# (control) nie daje się wyprzedzić żadnemu pasowi, a "after": [pasy]
+# dodaje zależności konkretnego pasa.
+# Typy spoza konfiguracji trafiają do DEFAULT_LANE.
+# Konfiguracja: WAREHOUSE_EVENT_LANES='{"control": {"types": [...], "weight": 4, "barrier": true},
+#                                       "bulk": {"types": [...], "weight": 1, "after": [...]}, ...}'
+
+DEFAULT_LANE = "default"
+DEFAULT_LANE_WEIGHT = 2
+
+DEFAULT_LANES = {
+    "control": {"types": ["ADD_PRODUCT_TYPE", "ADD_PALETTE"], "weight": 4, "barrier": True},
+    # kompletacja czeka na starsze przyjęcia (towar musi już być w boxach)
+    "picking": {"types": ["PICK_ORDER"], "weight": 3, "after": ["bulk"]},
+    "bulk": {"types": ["ADD_PRODUCTS_TO_STOCK"], "weight": 1},
+}
+
+
+def _load_lanes():
+    raw = os.environ.get("WAREHOUSE_EVENT_LANES")
+    if not raw:
+        return DEFAULT_LANES
+    try:
+        lanes = json.loads(raw)
+        for name, lane in lanes.items():
+            if int(lane["weight"]) <= 0 or not isinstance(lane["types"], list):
+                raise ValueError(f"lane {name}: weight must be > 0 and types a list")
+            if not isinstance(lane.get("after", []), list):
+                raise ValueError(f"lane {name}: after must be a list")
+        return lanes
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        log_error(f"❌ Invalid WAREHOUSE_EVENT_LANES ({e}), using defaults")
+        return DEFAULT_LANES
+
+
+_lane_of_type = {}
+_weights = {}
+_barriers = set()
+_after = {}
+
+
+def configure_lanes(lanes):
+    """Ustawia pasy: {nazwa: {"types": [...], "weight": n, "barrier": bool, "after": [...]}}."""
+    _lane_of_type.clear()
+    _weights.clear()
+    _barriers.clear()
+    _after.clear()
+    _weights[DEFAULT_LANE] = DEFAULT_LANE_WEIGHT
+    for name, lane in lanes.items():
+        _weights[name] = int(lane["weight"])
+        if lane.get("barrier"):
+            _barriers.add(name)
+        _after[name] = set(lane.get("after", ()))
+        for event_type in lane["types"]:
+            _lane_of_type[event_type] = name
+
+
+def lane_of(event_type):
+    return _lane_of_type.get(event_type, DEFAULT_LANE)
+
+
+def lane_weight(lane):
+    return _weights.get(lane, DEFAULT_LANE_WEIGHT)
+
+
+def lane_names():
+    return list(_weights)
+
+
+def is_barrier(lane):
+    return lane in _barriers
+
+
+def lane_dependencies(lane):
+    """Pasy, których starszych eventów `lane` nie może wyprzedzić."""
+    return (_barriers | _after.get(lane, set())) - {lane}
+
+
+def lane_order_key(lane):
+    """Kolejność pasów przy rozdziale miejsca w paczce: od największej wagi."""
+    return -lane_weight(lane), lane
+
+
+def split_quota(limit, lanes):
+    """
+    Dzieli `limit` między pasy proporcjonalnie do wag (każdy niepusty pas
+    dostaje co najmniej 1). Zwraca {pas: ile}.
+    """
+    total = sum(lane_weight(lane) for lane in lanes)
+    if not total:
+        return {}
+    return {lane: max(1, limit * lane_weight(lane) // total) for lane in lanes}
+
+
+configure_lanes(_load_lanes())
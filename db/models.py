@@ -1,35 +1,127 @@
-import sqlite3
-
-def init_db():
-    conn = sqlite3.connect("warehouse.db")
-    cur = conn.cursor()
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS products (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,
-        location TEXT
-    )
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS events (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        event_type TEXT,
-        product_id INTEGER,
-        location TEXT,
-        processed INTEGER DEFAULT 0
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE external_palets (
-    id INTEGER PRIMARY KEY,
-    name TEXT,
-    product_id INTEGER,
-    quantity INTEGER,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    conn.commit()
-    conn.close()
+import json
+from operator import itemgetter
 
+# ============================================
+# 🔹 MODELE DOMENOWE
+# ============================================
+# Wiersze z bazy trzymamy jako krotki (tuple) z nazwanymi polami — bez
+# słownika na każdy obiekt. Budowa z wiersza to jedno tuple.__new__,
+# a kolejność pól = kolejność kolumn w SELECT (patrz `columns`).
+# Dla zgodności ze starym kodem działa też model["pole"].
+
+BOX_STATE_EMPTY = "empty"
+BOX_STATE_PARTIAL = "partial"
+BOX_STATE_FULL = "full"
+BOX_STATE_NOT_EMPTY = "not_empty"
+
+
+class Model(tuple):
+    __slots__ = ()
+    _fields = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for i, name in enumerate(cls._fields):
+            setattr(cls, name, property(itemgetter(i), doc=f"Pole {name}"))
+
+    def __new__(cls, *args, **kwargs):
+        """Brakujące pola dostają None."""
+        if len(args) > len(cls._fields):
+            raise TypeError(f"{cls.__name__}: za dużo pól ({len(args)})")
+        values = args + tuple(kwargs.pop(name, None) for name in cls._fields[len(args):])
+        if kwargs:
+            raise TypeError(f"{cls.__name__}: nieznane pola {', '.join(kwargs)}")
+        return tuple.__new__(cls, values)
+
+    @classmethod
+    def columns(cls, alias=None, **sources):
+        """
+        Lista kolumn do SELECT w kolejności pól modelu.
+        sources: pole → wyrażenie SQL, np. Box.columns("b", product_name="p.name")
+        dla pól z dołączonej tabeli.
+        """
+        unknown = set(sources) - set(cls._fields)
+        if unknown:
+            raise TypeError(f"{cls.__name__}: nieznane pola {', '.join(sorted(unknown))}")
+        prefix = f"{alias}." if alias else ""
+        return ", ".join(sources.get(name, prefix + name) for name in cls._fields)
+
+    @classmethod
+    def from_row(cls, row):
+        return tuple.__new__(cls, row)
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """Do użycia jako cursor.row_factory."""
+        return cls.from_row(row)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def keys(self):
+        return self._fields
+
+    def as_dict(self):
+        return dict(zip(self._fields, self))
+
+    def replace(self, **changes):
+        return tuple.__new__(type(self), [changes.pop(name, value) for name, value in zip(self._fields, self)])
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={value!r}" for name, value in zip(self._fields, self))
+        return f"{type(self).__name__}({fields})"
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+
+class Product(Model):
+    __slots__ = ()
+    _fields = ("id", "name", "weight", "max_per_box")
+
+
+class Box(Model):
+    __slots__ = ()
+    _fields = ("id", "barcode", "product_id", "quantity", "max_capacity", "slot_id", "product_name")
+
+    @property
+    def is_empty(self):
+        return self[2] is None or self[3] == 0
+
+    @property
+    def state(self):
+        if self.is_empty:
+            return BOX_STATE_EMPTY
+        return BOX_STATE_PARTIAL if self[3] < self[4] else BOX_STATE_FULL
+
+    @property
+    def free_space(self):
+        return max(self[4] - self[3], 0)
+
+
+class Pallet(Model):
+    __slots__ = ()
+    _fields = ("id", "barcode", "product_id", "quantity", "received_at")
+
+
+class Event(Model):
+    __slots__ = ()
+    _fields = ("id", "event_type", "payload", "created_at")
+
+    @classmethod
+    def from_row(cls, row):
+        # payload jest w bazie jako JSON — dekodujemy raz, przy odczycie
+        return tuple.__new__(cls, (row[0], row[1], json.loads(row[2]) if row[2] else {}, row[3]))
+
+
+class Slot(Model):
+    __slots__ = ()
+    _fields = ("id", "aisle", "col", "slot", "status", "box_barcode")
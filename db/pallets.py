@@ -0,0 +1,117 @@
+from utils.errors import InsufficientStockError
+
+# ============================================
+# 🔹 PALETY: POBIERANIE FIFO I REZERWACJE
+# ============================================
+# Towar zdejmujemy z palet od najstarszej (received_at, id) — jednym
+# UPDATE liczącym narastającą sumę funkcją okna po indeksie
+# idx_palets_fifo, a puste palety usuwamy jednym DELETE.
+# Rezerwacja blokuje ilość produktu (nie konkretne palety): dostępne dla
+# innych = units_on_palets - aktywne rezerwacje. Założenie rezerwacji to
+# warunkowy INSERT, więc dwóch workerów nie zarezerwuje tego samego towaru.
+# Funkcje przyjmują conn i mają być wołane wewnątrz transakcji.
+
+# Jak długo rezerwacja blokuje towar, jeśli nikt jej nie zrealizuje
+RESERVATION_TTL_SECONDS = 300
+
+_ACTIVE = "expires_at > CURRENT_TIMESTAMP"
+
+
+def reserved_quantity(conn, product_id, exclude_reservation_id=None):
+    """Suma aktywnych rezerwacji produktu (bez wskazanej rezerwacji)."""
+    row = conn.execute(f"""
+        SELECT IFNULL(SUM(quantity), 0) FROM pallet_reservations
+        WHERE product_id = ? AND {_ACTIVE} AND id IS NOT ?
+    """, (product_id, exclude_reservation_id)).fetchone()
+    return row[0]
+
+
+def available_on_pallets(conn, product_id, reservation_id=None):
+    """Ile sztuk można zdjąć z palet (z uwzględnieniem cudzych rezerwacji)."""
+    row = conn.execute("SELECT units_on_palets FROM product_stock WHERE product_id = ?",
+                       (product_id,)).fetchone()
+    on_pallets = row[0] if row else 0
+    return on_pallets - reserved_quantity(conn, product_id, reservation_id)
+
+
+def reserve(conn, product_id, quantity, owner=None, ttl_seconds=RESERVATION_TTL_SECONDS):
+    """Rezerwuje `quantity` sztuk produktu. Zwraca id rezerwacji; brak towaru → InsufficientStockError."""
+    if quantity <= 0:
+        raise InsufficientStockError(f"Nieprawidłowa ilość: {quantity}")
+    cur = conn.execute(f"""
+        INSERT INTO pallet_reservations (product_id, quantity, owner, expires_at)
+        SELECT ?, ?, ?, datetime('now', ?)
+        WHERE IFNULL((SELECT units_on_palets FROM product_stock WHERE product_id = ?), 0)
+            - (SELECT IFNULL(SUM(quantity), 0) FROM pallet_reservations
+               WHERE product_id = ? AND {_ACTIVE}) >= ?
+    """, (product_id, quantity, owner, f"+{int(ttl_seconds)} seconds", product_id, product_id, quantity))
+    if cur.rowcount != 1:
+        raise InsufficientStockError(
+            f"Nie można zarezerwować {quantity} szt. produktu {product_id}: "
+            f"dostępne {available_on_pallets(conn, product_id)}"
+        )
+    return cur.lastrowid
+
+
+def get_reservation(conn, reservation_id):
+    """Aktywna rezerwacja jako (product_id, quantity) albo None."""
+    return conn.execute(f"""
+        SELECT product_id, quantity FROM pallet_reservations WHERE id = ? AND {_ACTIVE}
+    """, (reservation_id,)).fetchone()
+
+
+def release(conn, reservation_id):
+    """Usuwa rezerwację. True, jeśli istniała."""
+    return conn.execute("DELETE FROM pallet_reservations WHERE id = ?", (reservation_id,)).rowcount == 1
+
+
+def purge_expired(conn):
+    """Usuwa wygasłe rezerwacje; zwraca ich liczbę."""
+    return conn.execute(f"DELETE FROM pallet_reservations WHERE NOT ({_ACTIVE})").rowcount
+
+
+def _use_reservation(conn, reservation_id, product_id, quantity):
+    reservation = get_reservation(conn, reservation_id)
+    if not reservation or reservation[0] != product_id:
+        raise InsufficientStockError(f"Rezerwacja {reservation_id} nie istnieje albo wygasła")
+    if quantity >= reservation[1]:
+        release(conn, reservation_id)
+    else:
+        conn.execute("UPDATE pallet_reservations SET quantity = quantity - ? WHERE id = ?",
+                     (quantity, reservation_id))
+
+
+def drain_fifo(conn, product_id, quantity, reservation_id=None):
+    """
+    Zdejmuje `quantity` sztuk produktu z palet w kolejności FIFO.
+    Z reservation_id korzysta z zarezerwowanego towaru (i zmniejsza rezerwację).
+    Zwraca [(pallet_id, pozostało_na_palecie)] dla dotkniętych palet.
+    """
+    if quantity <= 0:
+        raise InsufficientStockError(f"Nieprawidłowa ilość: {quantity}")
+    available = available_on_pallets(conn, product_id, reservation_id)
+    if available < quantity:
+        raise InsufficientStockError(
+            f"Za mało produktów na paletach: dostępne {available}, próbujesz pobrać {quantity}"
+        )
+    if reservation_id is not None:
+        _use_reservation(conn, reservation_id, product_id, quantity)
+
+    # palety, których narastająca suma (przed nimi) < quantity, są zdejmowane;
+    # ostatnia z nich zostaje z resztą (running - quantity), pozostałe z 0
+    touched = conn.execute("""
+        WITH fifo AS (
+            SELECT id, quantity,
+                   SUM(quantity) OVER (ORDER BY received_at, id ROWS UNBOUNDED PRECEDING) AS running
+            FROM external_palets
+            WHERE product_id = ?
+        )
+        UPDATE external_palets
+        SET quantity = MAX(fifo.running - ?, 0)
+        FROM fifo
+        WHERE fifo.id = external_palets.id AND fifo.running - fifo.quantity < ?
+        RETURNING external_palets.id, external_palets.quantity
+    """, (product_id, quantity, quantity)).fetchall()
+    if any(remaining == 0 for _, remaining in touched):
+        conn.execute("DELETE FROM external_palets WHERE product_id = ? AND quantity <= 0", (product_id,))
+    return touched
@@ -0,0 +1,165 @@
+import bisect
+import itertools
+import json
+
+from db.barcodes import allocate_numbers
+from db.consolidation import free_emptied_boxes
+from db.db_init import parse_slot_id
+from db.slot_index import aisle_sort_key
+from utils.errors import InsufficientStockError
+
+# ============================================
+# 🔹 KOMPLETACJA ZAMÓWIEŃ (PICKING)
+# ============================================
+# Fala (wave) to jedno lub wiele zamówień kompletowanych jedną trasą.
+# 1. Zapotrzebowanie sumujemy per produkt dla całej fali.
+# 2. Boxy źródłowe: jeśli jeden box wystarczy — najmniejszy wystarczający
+#    (często opróżnia się w całości), w przeciwnym razie od największego,
+#    żeby przystanków było jak najmniej. Boxy bez slotu — na końcu.
+# 3. Trasa serpentynowa po siatce slotów: alejki po kolei, w co drugiej
+#    odwiedzanej alejce kolumny w odwrotnym kierunku (wchodzimy tam, gdzie
+#    wyszliśmy z poprzedniej), w kolumnie poziomy od dołu.
+# 4. Zapis w transakcji wywołującego: warunkowe zmniejszenie ilości w boxach
+#    (quantity >= ?), opróżnione boxy stają się puste, lista trafia do pick_lines.
+# Plan i zapis mają być w tej samej transakcji IMMEDIATE (db_manager.pick_orders).
+
+WAVE_SEQUENCE = "wave"
+
+
+class PickPlan:
+    __slots__ = ("wave_id", "orders", "stops", "shortages")
+
+    def __init__(self, orders):
+        self.wave_id = None      # nadawane przy zapisie
+        self.orders = orders     # [(order_id, [(product_id, qty)])]
+        self.stops = []          # [(slot_id, box_id, barcode, product_id, qty, [(order_id, qty)])] w kolejności trasy
+        self.shortages = {}      # {product_id: brakująca ilość}
+
+    @property
+    def units(self):
+        return sum(stop[4] for stop in self.stops)
+
+    def __repr__(self):
+        return (f"PickPlan(wave={self.wave_id}, orders={len(self.orders)}, stops={len(self.stops)}, "
+                f"units={self.units}, shortages={len(self.shortages)})")
+
+
+def route(stops):
+    """Kolejność przystanków na trasie serpentynowej; przystanki bez slotu na końcu."""
+    located, unplaced = [], []
+    for stop in stops:
+        parsed = parse_slot_id(stop[0]) if stop[0] else None
+        if parsed:
+            located.append((parsed, stop))
+        else:
+            unplaced.append(stop)
+    aisles = sorted({parsed[0] for parsed, _ in located}, key=aisle_sort_key)
+    rank = {aisle: i for i, aisle in enumerate(aisles)}
+
+    def key(item):
+        (aisle, col, level, _), stop = item
+        i = rank[aisle]
+        return i, col if i % 2 == 0 else -col, level, stop[1]
+
+    located.sort(key=key)
+    return [stop for _, stop in located] + unplaced
+
+
+def _choose_boxes(boxes, demand):
+    """
+    boxes: [(box_id, barcode, quantity, slot_id)] od największej ilości.
+    Zwraca ([(box, ile)], brakująca_ilość).
+    """
+    keys = [-box[2] for box in boxes]
+    chosen = []
+    remaining = demand
+    i = 0
+    while remaining > 0 and i < len(boxes):
+        # boxy z ilością >= remaining to prefiks boxes[i:] — bierzemy ostatni (najmniejszy)
+        fit = bisect.bisect_right(keys, -remaining, lo=i)
+        if fit > i:
+            box = boxes[fit - 1]
+            chosen.append((box, remaining))
+            return chosen, 0
+        chosen.append((boxes[i], boxes[i][2]))
+        remaining -= boxes[i][2]
+        i += 1
+    return chosen, remaining
+
+
+def plan_picking(conn, orders, allow_partial=False):
+    """
+    Liczy falę dla zamówień [(order_id, [(product_id, qty)])] (po validate_order).
+    Bez allow_partial brak towaru → InsufficientStockError; z allow_partial
+    zamówienia są obsługiwane w kolejności, a braki trafiają do plan.shortages.
+    """
+    plan = PickPlan(orders)
+    demand = {}
+    for order_id, lines in orders:
+        for product_id, qty in lines:
+            demand.setdefault(product_id, []).append((order_id, qty))
+
+    rows = conn.execute("""
+        SELECT product_id, id, barcode, quantity, slot_id FROM boxes
+        WHERE product_id IN (SELECT value FROM json_each(?)) AND quantity > 0
+        ORDER BY product_id, quantity DESC, id
+    """, (json.dumps(list(demand)),))
+    boxes = {
+        product_id: [r[1:] for r in group]
+        for product_id, group in itertools.groupby(rows, key=lambda r: r[0])
+    }
+
+    stops = []
+    for product_id, wants in demand.items():
+        candidates = boxes.get(product_id, [])
+        total = sum(qty for _, qty in wants)
+        chosen, missing = _choose_boxes([b for b in candidates if b[3]], total)
+        if missing:
+            more, missing = _choose_boxes([b for b in candidates if not b[3]], missing)
+            chosen += more
+        if missing:
+            plan.shortages[product_id] = missing
+
+        # rozdział zdjętych sztuk na zamówienia (w kolejności fali)
+        wants = iter(wants)
+        order_id, left = next(wants)
+        for (box_id, barcode, _, slot_id), take in chosen:
+            allocations = []
+            taken = take
+            while taken:
+                while not left:
+                    order_id, left = next(wants)
+                part = min(taken, left)
+                allocations.append((order_id, part))
+                taken -= part
+                left -= part
+            stops.append((slot_id, box_id, barcode, product_id, take, allocations))
+
+    if plan.shortages and not allow_partial:
+        missing = ", ".join(f"produkt {pid}: brakuje {qty} szt." for pid, qty in plan.shortages.items())
+        raise InsufficientStockError(f"Za mało towaru w boxach do kompletacji ({missing})")
+    plan.stops = route(stops)
+    return plan
+
+
+def apply_picking(conn, plan):
+    """Zdejmuje towar z boxów i zapisuje listę kompletacji (wewnątrz transakcji)."""
+    for slot_id, box_id, barcode, product_id, qty, _ in plan.stops:
+        cur = conn.execute("""
+            UPDATE boxes SET quantity = quantity - ?
+            WHERE id = ? AND product_id = ? AND quantity >= ?
+        """, (qty, box_id, product_id, qty))
+        if cur.rowcount != 1:
+            raise InsufficientStockError(f"Box {barcode}: stan zmienił się w trakcie kompletacji")
+    free_emptied_boxes(conn, [stop[1] for stop in plan.stops])
+
+    plan.wave_id = allocate_numbers(conn, 1, WAVE_SEQUENCE)[0]
+    conn.executemany("""
+        INSERT INTO pick_lines (wave_id, seq, order_id, product_id, box_id, slot_id, quantity)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (plan.wave_id, seq, order_id, product_id, box_id, slot_id, qty)
+        for seq, (slot_id, box_id, _, product_id, _, allocations) in enumerate(plan.stops, start=1)
+        for order_id, qty in allocations
+    ])
+    return plan
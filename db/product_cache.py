@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+
+from db import db_init
+
+# ============================================
+# 🔹 CACHE KATALOGU PRODUKTÓW
+# ============================================
+# Produkty praktycznie się nie zmieniają, a get_product_info jest wołane
+# w pętlach (listy palet, boxów, putaway). Trzymamy je w pamięci (LRU),
+# indeksowane po id i po nazwie. Product jest niezmienny (krotka), więc
+# zwracamy ten sam obiekt bez kopiowania.
+
+PRODUCT_CACHE_SIZE = 10000
+
+
+class ProductCache:
+    def __init__(self, max_size=PRODUCT_CACHE_SIZE):
+        self.max_size = max_size
+        self._by_id = OrderedDict()  # id -> Product (kolejność = LRU)
+        self._by_name = {}           # nazwa -> id
+        self._lock = threading.Lock()
+        self._path = None
+        self.warmed = False
+        self.hits = 0
+        self.misses = 0
+
+    def _check_path(self):
+        # inna baza (np. benchmark na pliku tymczasowym) → inny katalog
+        if self._path != db_init.DB_PATH:
+            self._by_id.clear()
+            self._by_name.clear()
+            self.warmed = False
+            self._path = db_init.DB_PATH
+
+    def get(self, product_id):
+        with self._lock:
+            self._check_path()
+            product = self._by_id.get(product_id)
+            if product is None:
+                self.misses += 1
+                return None
+            self._by_id.move_to_end(product_id)
+            self.hits += 1
+            return product
+
+    def get_by_name(self, name):
+        with self._lock:
+            self._check_path()
+            product_id = self._by_name.get(name)
+            product = self._by_id.get(product_id) if product_id is not None else None
+            if product is None:
+                self.misses += 1
+                return None
+            self._by_id.move_to_end(product_id)
+            self.hits += 1
+            return product
+
+    def put(self, product):
+        with self._lock:
+            self._check_path()
+            self._put(product)
+
+    def put_many(self, products, warmed=False):
+        with self._lock:
+            self._check_path()
+            for product in products:
+                self._put(product)
+            if warmed:
+                self.warmed = True
+
+    def _put(self, product):
+        product_id = product.id
+        old = self._by_id.pop(product_id, None)
+        if old is not None:
+            self._by_name.pop(old.name, None)
+        self._by_id[product_id] = product
+        self._by_name[product.name] = product_id
+        while len(self._by_id) > self.max_size:
+            _, evicted = self._by_id.popitem(last=False)
+            self._by_name.pop(evicted.name, None)
+
+    def invalidate(self, product_id=None, name=None):
+        with self._lock:
+            if name is not None and product_id is None:
+                product_id = self._by_name.get(name)
+            if name is not None:
+                self._by_name.pop(name, None)
+            if product_id is not None:
+                old = self._by_id.pop(product_id, None)
+                if old is not None:
+                    self._by_name.pop(old.name, None)
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._by_name.clear()
+            self.warmed = False
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def stats(self):
+        return {"size": len(self._by_id), "max_size": self.max_size,
+                "hits": self.hits, "misses": self.misses}
+
+
+product_cache = ProductCache()
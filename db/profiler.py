@@ -0,0 +1,177 @@
+import atexit
+import collections
+import os
+import threading
+import time
+
+from utils.logger import log_info, log_warning
+
+# ============================================
+# 🔹 PROFILOWANIE WYWOŁAŃ db_connection
+# ============================================
+# Włączane zmienną WAREHOUSE_DB_PROFILE=1 albo enable_profiling().
+# Dla każdej funkcji z @db_connection zbiera: liczbę wywołań, błędy,
+# czas (łączny / maks.), zwrócone wiersze i liczbę poleceń SQL (trace
+# callback SQLite). Czasy i polecenia są łączne — z zagnieżdżonymi
+# wywołaniami innych funkcji db_manager.
+# Wywołania dłuższe niż SLOW_QUERY_MS trafiają do logu razem z ostatnimi
+# poleceniami SQL. Raport zbiorczy — na koniec procesu (atexit).
+# Wyłączone profilowanie kosztuje jedno sprawdzenie flagi na wywołanie.
+
+ENABLED = os.environ.get("WAREHOUSE_DB_PROFILE", "").strip().lower() in ("1", "true", "yes", "on")
+SLOW_QUERY_MS = float(os.environ.get("WAREHOUSE_SLOW_QUERY_MS", 100))
+# Ile ostatnich poleceń SQL pokazujemy przy wolnym wywołaniu
+SLOW_QUERY_STATEMENTS = 10
+# Ile funkcji pokazuje raport końcowy
+REPORT_TOP = 30
+
+
+class FunctionStats:
+    __slots__ = ("calls", "errors", "seconds", "max_seconds", "rows", "statements", "slow")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.statements = 0
+        self.slow = 0
+
+
+_lock = threading.Lock()
+_stats = collections.defaultdict(FunctionStats)
+_local = threading.local()
+
+
+def enable_profiling(slow_query_ms=None):
+    global ENABLED, SLOW_QUERY_MS
+    ENABLED = True
+    if slow_query_ms is not None:
+        SLOW_QUERY_MS = slow_query_ms
+
+
+def disable_profiling():
+    global ENABLED
+    ENABLED = False
+
+
+def reset_profile():
+    with _lock:
+        _stats.clear()
+
+
+def _state():
+    state = getattr(_local, "state", None)
+    if state is None:
+        state = _local.state = {"conn": None, "statements": 0,
+                                "recent": collections.deque(maxlen=SLOW_QUERY_STATEMENTS)}
+    return state
+
+
+def _trace(sql):
+    state = _state()
+    state["statements"] += 1
+    state["recent"].append(sql)
+
+
+def _count_rows(result):
+    if result is None or isinstance(result, bool):
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+class ProfiledCall:
+    """Pomiar jednego wywołania (start → attach(conn) → finish)."""
+    __slots__ = ("name", "started", "statements")
+
+    def __init__(self, name):
+        self.name = name
+        self.statements = _state()["statements"]
+        self.started = time.perf_counter()
+
+    def attach(self, conn):
+        # jedno połączenie z puli na wątek — callback ustawiamy raz
+        state = _state()
+        if state["conn"] is not conn:
+            conn.set_trace_callback(_trace)
+            state["conn"] = conn
+
+    def finish(self, result=None, error=False, args=()):
+        elapsed = time.perf_counter() - self.started
+        state = _state()
+        statements = state["statements"] - self.statements
+        slow = elapsed * 1000 >= SLOW_QUERY_MS
+        with _lock:
+            s = _stats[self.name]
+            s.calls += 1
+            s.errors += error
+            s.seconds += elapsed
+            s.max_seconds = max(s.max_seconds, elapsed)
+            s.rows += _count_rows(result)
+            s.statements += statements
+            s.slow += slow
+        if slow:
+            recent = list(state["recent"])[-min(statements, SLOW_QUERY_STATEMENTS):] if statements else []
+            sql = "\n    ".join(" ".join(q.split())[:300] for q in recent)
+            log_warning(f"🐢 Slow DB call {self.name}{_short_args(args)}: {elapsed * 1000:.1f} ms, "
+                        f"{statements} SQL statements" + (f"\n    {sql}" if sql else ""))
+
+
+def start(name):
+    return ProfiledCall(name)
+
+
+def _short_args(args):
+    text = ", ".join(repr(a) for a in args)
+    return f"({text[:120]}{'…' if len(text) > 120 else ''})"
+
+
+def profile_stats():
+    """Zebrane statystyki jako słownik {funkcja: {...}}."""
+    with _lock:
+        return {
+            name: {
+                "calls": s.calls, "errors": s.errors,
+                "total_ms": round(s.seconds * 1000, 3),
+                "mean_ms": round(s.seconds * 1000 / s.calls, 3) if s.calls else 0.0,
+                "max_ms": round(s.max_seconds * 1000, 3),
+                "rows": s.rows, "statements": s.statements, "slow": s.slow,
+            }
+            for name, s in _stats.items()
+        }
+
+
+def profile_report(top=REPORT_TOP):
+    """Tabela funkcji posortowana po łącznym czasie."""
+    stats = sorted(profile_stats().items(), key=lambda kv: kv[1]["total_ms"], reverse=True)
+    if not stats:
+        return "📊 DB profile: no calls recorded"
+    lines = [
+        "📊 DB profile (inclusive times):",
+        f"{'function':<36}{'calls':>9}{'total ms':>12}{'mean ms':>10}{'max ms':>10}"
+        f"{'rows':>10}{'sql':>9}{'slow':>6}{'err':>5}",
+    ]
+    for name, s in stats[:top]:
+        lines.append(f"{name:<36}{s['calls']:>9}{s['total_ms']:>12.1f}{s['mean_ms']:>10.3f}{s['max_ms']:>10.1f}"
+                     f"{s['rows']:>10}{s['statements']:>9}{s['slow']:>6}{s['errors']:>5}")
+    return "\n".join(lines)
+
+
+def _report_at_exit():
+    if ENABLED and _stats:
+        log_info(profile_report())
+
+
+def _reset_after_fork():
+    global _lock, _local
+    _lock = threading.Lock()
+    _local = threading.local()
+    _stats.clear()
+
+
+atexit.register(_report_at_exit)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
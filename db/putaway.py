@@ -0,0 +1,143 @@
+import json
+
+from db.barcodes import new_box_barcodes
+from db.pallets import available_on_pallets, drain_fifo
+from db.slot_index import (
+    allocate_slot, find_slot_near_product, slot_status_for, SLOT_BOX_EMPTY, SLOT_BOX_WITH_PRODUCTS,
+)
+from utils.errors import InsufficientStockError, ProductNotFoundError
+
+# ============================================
+# 🔹 PLANOWANIE ROZMIESZCZENIA (PUTAWAY)
+# ============================================
+# Plan liczymy z jednego odczytu stanu (produkt, palety, boxy), a potem
+# zapisujemy go w całości w jednej transakcji — albo wszystko, albo nic.
+
+
+class PutawayPlan:
+    __slots__ = ("product_id", "quantity", "max_per_box", "reservation_id", "pallet_takes",
+                 "partial_fills", "empty_fills", "new_boxes")
+
+    def __init__(self, product_id, quantity, max_per_box, reservation_id=None):
+        self.product_id = product_id
+        self.quantity = quantity
+        self.max_per_box = max_per_box
+        self.reservation_id = reservation_id
+        self.pallet_takes = []   # [(pallet_id, remaining_on_pallet)] — wypełniane przy zapisie
+        self.partial_fills = []  # [(box_id, add_qty)] — boxy z tym produktem
+        self.empty_fills = []    # [(box_id, qty)] — puste boxy przejmowane przez produkt
+        self.new_boxes = []      # [qty] — nowe boxy do utworzenia
+
+    @property
+    def boxes_touched(self):
+        return len(self.partial_fills) + len(self.empty_fills) + len(self.new_boxes)
+
+    def __repr__(self):
+        return (f"PutawayPlan(product={self.product_id}, qty={self.quantity}, "
+                f"pallets={len(self.pallet_takes)}, partial={len(self.partial_fills)}, "
+                f"empty={len(self.empty_fills)}, new={len(self.new_boxes)})")
+
+
+def plan_putaway(conn, product_id, quantity, allow_new_boxes=True, reservation_id=None):
+    """
+    Liczy pełny przydział: najpierw dopełnia częściowo zapełnione boxy produktu,
+    potem zajmuje puste boxy, na końcu (opcjonalnie) zakłada nowe.
+    Palety są zdejmowane w kolejności FIFO przy zapisie (db.pallets.drain_fifo).
+    """
+    if quantity <= 0:
+        raise InsufficientStockError(f"Nieprawidłowa ilość: {quantity}")
+
+    product = conn.execute("SELECT max_per_box FROM products WHERE id = ?", (product_id,)).fetchone()
+    if not product:
+        raise ProductNotFoundError(f"Produkt {product_id} nie istnieje")
+    max_per_box = product[0]
+    plan = PutawayPlan(product_id, quantity, max_per_box, reservation_id)
+
+    # === 1. Dostępność na paletach (agregat minus cudze rezerwacje) ===
+    available = available_on_pallets(conn, product_id, reservation_id)
+    if available < quantity:
+        raise InsufficientStockError(
+            f"Za mało produktów na paletach: dostępne {available}, próbujesz dodać {quantity}"
+        )
+
+    # === 2. Częściowo zapełnione boxy produktu (najpełniejsze najpierw) ===
+    remaining = quantity
+    for box_id, box_qty, box_cap in conn.execute("""
+        SELECT id, quantity, max_capacity FROM boxes
+        WHERE product_id = ? AND quantity < max_capacity
+        ORDER BY quantity DESC, id ASC
+    """, (product_id,)):
+        add = min(box_cap - box_qty, remaining)
+        plan.partial_fills.append((box_id, add))
+        remaining -= add
+        if remaining == 0:
+            return plan
+
+    # === 3. Puste boxy ===
+    boxes_needed = (remaining + max_per_box - 1) // max_per_box
+    for (box_id,) in conn.execute("""
+        SELECT id FROM boxes
+        WHERE (product_id IS NULL OR quantity = 0)
+          AND (product_id IS NULL OR product_id != ?)
+        ORDER BY product_id IS NOT NULL, id ASC
+        LIMIT ?
+    """, (product_id, boxes_needed)):
+        qty = min(max_per_box, remaining)
+        plan.empty_fills.append((box_id, qty))
+        remaining -= qty
+
+    # === 4. Nowe boxy ===
+    if remaining > 0:
+        if not allow_new_boxes:
+            raise InsufficientStockError(
+                f"Za mało pustych boxów: brakuje miejsca na {remaining} szt."
+            )
+        while remaining > 0:
+            qty = min(max_per_box, remaining)
+            plan.new_boxes.append(qty)
+            remaining -= qty
+
+    return plan
+
+
+def apply_putaway(conn, plan):
+    """Zapisuje plan zbiorczymi poleceniami (wywoływać wewnątrz transakcji)."""
+    plan.pallet_takes = drain_fifo(conn, plan.product_id, plan.quantity, plan.reservation_id)
+
+    if plan.partial_fills:
+        conn.executemany(
+            "UPDATE boxes SET quantity = quantity + ? WHERE id = ?",
+            [(add, box_id) for box_id, add in plan.partial_fills],
+        )
+
+    if plan.empty_fills:
+        conn.executemany(
+            "UPDATE boxes SET product_id = ?, max_capacity = ?, quantity = ? WHERE id = ?",
+            [(plan.product_id, plan.max_per_box, qty, box_id) for box_id, qty in plan.empty_fills],
+        )
+
+    # sloty wypełnionych boxów: BOX_EMPTY → BOX_WITH_PRODUCTS
+    filled_ids = [box_id for box_id, _ in plan.partial_fills] + [box_id for box_id, _ in plan.empty_fills]
+    if filled_ids:
+        conn.execute("""
+            UPDATE slots SET status = ?
+            WHERE status = ? AND id IN (
+                SELECT slot_id FROM boxes
+                WHERE id IN (SELECT value FROM json_each(?)) AND slot_id IS NOT NULL
+            )
+        """, (SLOT_BOX_WITH_PRODUCTS, SLOT_BOX_EMPTY, json.dumps(filled_ids)))
+
+    if plan.new_boxes:
+        # nowe boxy stawiamy jak najbliżej istniejących boxów produktu
+        near = find_slot_near_product(conn, plan.product_id)
+        rows = []
+        for qty, barcode in zip(plan.new_boxes, new_box_barcodes(conn, len(plan.new_boxes))):
+            slot_id = allocate_slot(conn, barcode, slot_status_for(qty), near)
+            near = slot_id or near
+            rows.append((barcode, plan.product_id, qty, plan.max_per_box, slot_id))
+        conn.executemany("""
+            INSERT INTO boxes (barcode, product_id, quantity, max_capacity, slot_id)
+            VALUES (?, ?, ?, ?, ?)
+        """, rows)
+
+    return plan
@@ -0,0 +1,137 @@
+import contextlib
+import os
+import threading
+
+from db import db_init
+from db.models import Pallet
+
+# ============================================
+# 🔹 RAPORTY Z JEDNEGO SNAPSHOTU (TYLKO ODCZYT)
+# ============================================
+# Raporty czytają na osobnym połączeniu tylko do odczytu (query_only),
+# trzymanym per wątek poza pulą db_pool. Wszystkie zapytania raportu idą
+# w jednej transakcji odczytu — w trybie WAL to jeden spójny snapshot:
+# sumy zgadzają się ze sobą, nawet gdy workery w tym czasie zapisują,
+# a długi odczyt nie blokuje zapisów (i zapisy nie blokują raportu).
+
+STOCK_COLUMNS = ("units_in_boxes", "boxes", "partial_boxes", "free_capacity", "units_on_palets", "palets")
+
+_local = threading.local()
+
+
+def _read_connection():
+    entries = getattr(_local, "entries", None)
+    if entries is None:
+        entries = _local.entries = {}
+    conn = entries.get(db_init.DB_PATH)
+    if conn is None:
+        conn = db_init.get_connection()
+        conn.isolation_level = None   # transakcje otwieramy sami
+        conn.execute("PRAGMA query_only=ON")
+        entries[db_init.DB_PATH] = conn
+    return conn
+
+
+def close_read_connection():
+    """Zamyka połączenia raportowe bieżącego wątku."""
+    for conn in getattr(_local, "entries", {}).values():
+        conn.close()
+    _local.entries = {}
+
+
+@contextlib.contextmanager
+def read_snapshot():
+    """Transakcja odczytu: wszystkie zapytania w środku widzą ten sam stan bazy."""
+    conn = _read_connection()
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        # tylko odczyt — zakończenie transakcji zwalnia snapshot (i checkpoint WAL)
+        conn.execute("COMMIT")
+
+
+def select_stock_summary(conn):
+    """Stan produktów, które są w boxach albo na paletach (po nazwie) — na podanym połączeniu."""
+    rows = conn.execute(f"""
+        SELECT p.id, p.name, {", ".join("s." + c for c in STOCK_COLUMNS)}
+        FROM product_stock s
+        JOIN products p ON p.id = s.product_id
+        WHERE s.units_in_boxes > 0 OR s.units_on_palets > 0
+        ORDER BY p.name ASC
+    """).fetchall()
+    return [{"product_id": r[0], "name": r[1], **dict(zip(STOCK_COLUMNS, r[2:]))} for r in rows]
+
+
+class StockReport:
+    __slots__ = ("taken_at", "products", "totals", "pending_events", "pallets")
+
+    def __init__(self, taken_at, products, totals, pending_events, pallets=None):
+        self.taken_at = taken_at
+        self.products = products              # [{product_id, name, units_in_boxes, ...}]
+        self.totals = totals                  # {units_in_boxes, empty_boxes, boxes, units_on_palets, palets}
+        self.pending_events = pending_events
+        self.pallets = pallets                # [(Pallet, nazwa produktu)] albo None
+
+    @property
+    def in_boxes(self):
+        return [p for p in self.products if p["units_in_boxes"] > 0]
+
+    @property
+    def on_palets(self):
+        return [p for p in self.products if p["units_on_palets"] > 0]
+
+    def as_dict(self):
+        report = {
+            "taken_at": self.taken_at,
+            "totals": self.totals,
+            "pending_events": self.pending_events,
+            "products": self.products,
+        }
+        if self.pallets is not None:
+            report["pallets"] = [{**p.as_dict(), "product_name": name} for p, name in self.pallets]
+        return report
+
+    def __repr__(self):
+        return (f"StockReport(taken_at={self.taken_at!r}, products={len(self.products)}, "
+                f"units_in_boxes={self.totals['units_in_boxes']}, empty_boxes={self.totals['empty_boxes']})")
+
+
+def stock_report(include_pallets=False):
+    """Stan magazynu (agregaty, sumy, kolejka, opcjonalnie lista palet) z jednego snapshotu."""
+    with read_snapshot() as conn:
+        taken_at = conn.execute("SELECT datetime('now')").fetchone()[0]
+        products = select_stock_summary(conn)
+        row = conn.execute("SELECT empty_boxes, units_in_boxes FROM stock_totals WHERE id = 1").fetchone()
+        boxes = conn.execute("SELECT COUNT(*) FROM boxes").fetchone()[0]
+        pending = conn.execute("SELECT COUNT(*) FROM events WHERE processed = 0").fetchone()[0]
+        pallets = None
+        if include_pallets:
+            pallets = [
+                (Pallet.from_row(r[:-1]), r[-1])
+                for r in conn.execute(f"""
+                    SELECT {Pallet.columns("e")}, p.name
+                    FROM external_palets e
+                    LEFT JOIN products p ON p.id = e.product_id
+                    ORDER BY e.received_at ASC, e.id ASC
+                """)
+            ]
+
+    totals = {
+        "units_in_boxes": row[1] if row else 0,
+        "empty_boxes": row[0] if row else 0,
+        "boxes": boxes,
+        "units_on_palets": sum(p["units_on_palets"] for p in products),
+        "palets": sum(p["palets"] for p in products),
+    }
+    return StockReport(taken_at, products, totals, pending, pallets)
+
+
+def _reset_after_fork():
+    # połączenia rodzica nie używamy w procesie potomnym
+    global _local
+    _local = threading.local()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import time
+
+from db import db_init
+from utils.logger import log_info as log, log_error
+
+# ============================================
+# 🔹 RETENCJA EVENTÓW (ARCHIWUM, ROLLUPY, VACUUM)
+# ============================================
+# python -m db.retention --older-than-hours 168
+# Przetworzone (1) i błędne (-1) eventy starsze niż EVENT_RETENTION_HOURS
+# przenosimy paczkami do osobnej bazy archiwum (warehouse_archive.db),
+# a przed usunięciem dopisujemy ich liczniki do event_rollups (typ / godzina).
+# Każda paczka to krótka transakcja IMMEDIATE, między paczkami jest pauza,
+# więc producenci i workery czekają najwyżej na jedną paczkę.
+# Zwolnione strony oddajemy systemowi przez PRAGMA incremental_vacuum.
+
+EVENT_RETENTION_HOURS = float(os.environ.get("WAREHOUSE_EVENT_RETENTION_HOURS", 24 * 7))
+# Ile eventów przenosimy w jednej transakcji
+ARCHIVE_CHUNK = 5000
+# Pauza między paczkami (oddajemy blokadę zapisu innym)
+CHUNK_PAUSE_SECONDS = 0.02
+# Ile stron zwalniamy jednym incremental_vacuum
+VACUUM_PAGES_PER_STEP = 2000
+# Co ile sekund worker uruchamia retencję
+RETENTION_INTERVAL_SECONDS = 3600
+
+_EVENT_COLUMNS = ("id", "event_type", "payload", "created_at", "processed", "processed_at",
+                  "error_message", "claimed_by", "lease_until")
+
+
+def archive_path_for(db_path):
+    """warehouse.db -> warehouse_archive.db"""
+    root, ext = os.path.splitext(db_path)
+    return f"{root}_archive{ext or '.db'}"
+
+
+def _attach_archive(conn, archive_path):
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_path,))
+    conn.execute("PRAGMA archive.journal_mode=WAL")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS archive.events_archive (
+            id INTEGER PRIMARY KEY,
+            event_type TEXT NOT NULL,
+            payload TEXT,
+            created_at DATETIME,
+            processed INTEGER,
+            processed_at DATETIME,
+            error_message TEXT,
+            claimed_by TEXT,
+            lease_until DATETIME,
+            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_archive_created ON events_archive (created_at)")
+
+
+def _archive_chunk(conn, cutoff, chunk_size, archive):
+    """Jedna paczka: archiwum + rollupy + DELETE. Zwraca liczbę usuniętych eventów."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        ids = [r[0] for r in conn.execute("""
+            SELECT id FROM events
+            WHERE processed != 0 AND COALESCE(processed_at, created_at) < ?
+            ORDER BY id ASC
+            LIMIT ?
+        """, (cutoff, chunk_size))]
+        if not ids:
+            conn.execute("COMMIT")
+            return 0
+        id_list = json.dumps(ids)
+
+        if archive:
+            columns = ", ".join(_EVENT_COLUMNS)
+            # OR IGNORE: paczka przerwana po zapisie archiwum może być powtórzona
+            conn.execute(f"""
+                INSERT OR IGNORE INTO archive.events_archive ({columns})
+                SELECT {columns} FROM events WHERE id IN (SELECT value FROM json_each(?))
+            """, (id_list,))
+
+        conn.execute("""
+            INSERT INTO event_rollups (hour, event_type, processed, failed, latency_seconds)
+            SELECT strftime('%Y-%m-%d %H:00', created_at), event_type,
+                   SUM(processed = 1), SUM(processed = -1),
+                   IFNULL(SUM((julianday(processed_at) - julianday(created_at)) * 86400.0), 0)
+            FROM events
+            WHERE id IN (SELECT value FROM json_each(?))
+            GROUP BY 1, 2
+            ON CONFLICT (hour, event_type) DO UPDATE SET
+                processed = processed + excluded.processed,
+                failed = failed + excluded.failed,
+                latency_seconds = latency_seconds + excluded.latency_seconds
+        """, (id_list,))
+
+        deleted = conn.execute("DELETE FROM events WHERE id IN (SELECT value FROM json_each(?))",
+                               (id_list,)).rowcount
+        conn.execute("COMMIT")
+        return deleted
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def incremental_vacuum(conn, max_steps=None):
+    """Oddaje wolne strony systemowi małymi krokami. Zwraca liczbę zwolnionych stron."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    freed = 0
+    steps = 0
+    while max_steps is None or steps < max_steps:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free:
+            break
+        # executescript: pragma zwalnia jedną stronę na krok, a sqlite3_exec robi wszystkie
+        conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP});")
+        freed += min(free, VACUUM_PAGES_PER_STEP)
+        steps += 1
+        time.sleep(CHUNK_PAUSE_SECONDS)
+    return freed
+
+
+def run_retention(older_than_hours=None, chunk_size=ARCHIVE_CHUNK, max_chunks=None,
+                  archive=True, archive_path=None, vacuum=True):
+    """
+    Jeden przebieg retencji. Zwraca słownik {archived, chunks, freed_pages, seconds}.
+    max_chunks ogranicza pracę jednego przebiegu (reszta przy następnym).
+    """
+    hours = EVENT_RETENTION_HOURS if older_than_hours is None else older_than_hours
+    started = time.perf_counter()
+    stats = {"archived": 0, "chunks": 0, "freed_pages": 0}
+
+    conn = db_init.get_connection()
+    conn.isolation_level = None
+    try:
+        if archive:
+            _attach_archive(conn, archive_path or archive_path_for(db_init.DB_PATH))
+        cutoff = conn.execute("SELECT datetime('now', ?)", (f"-{hours} hours",)).fetchone()[0]
+
+        while max_chunks is None or stats["chunks"] < max_chunks:
+            deleted = _archive_chunk(conn, cutoff, chunk_size, archive)
+            if not deleted:
+                break
+            stats["archived"] += deleted
+            stats["chunks"] += 1
+            time.sleep(CHUNK_PAUSE_SECONDS)
+
+        if vacuum and stats["archived"]:
+            stats["freed_pages"] = incremental_vacuum(conn)
+    except Exception as e:
+        log_error(f"❌ Event retention failed: {e}")
+    finally:
+        conn.close()
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    if stats["archived"]:
+        log(f"🗄 Retention: {stats['archived']} events older than {hours:g}h "
+            f"{'archived' if archive else 'deleted'} in {stats['chunks']} chunks, "
+            f"{stats['freed_pages']} pages freed ({stats['seconds']}s)")
+    return stats
+
+
+def enable_incremental_vacuum():
+    """
+    Przełącza istniejącą bazę na auto_vacuum=INCREMENTAL (pełny VACUUM — blokuje bazę,
+    uruchamiać przy zatrzymanych workerach). Nowe bazy mają to od początku.
+    """
+    conn = db_init.get_connection()
+    try:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        return conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive and compact old processed events.")
+    parser.add_argument("--older-than-hours", type=float, default=None,
+                        help=f"retention age (default: {EVENT_RETENTION_HOURS:g})")
+    parser.add_argument("--chunk", type=int, default=ARCHIVE_CHUNK, help="events per transaction")
+    parser.add_argument("--max-chunks", type=int, default=None)
+    parser.add_argument("--no-archive", action="store_true", help="delete without copying to the archive")
+    parser.add_argument("--no-vacuum", action="store_true")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="one-off VACUUM converting an existing database (stop workers first)")
+    args = parser.parse_args(argv)
+
+    db_init.initialize_database()
+    if args.enable_incremental_vacuum:
+        print("✅ auto_vacuum=INCREMENTAL" if enable_incremental_vacuum() else "❌ auto_vacuum unchanged")
+    stats = run_retention(args.older_than_hours, args.chunk, args.max_chunks,
+                          archive=not args.no_archive, vacuum=not args.no_vacuum)
+    print(stats)
+
+
+if __name__ == "__main__":
+    main()
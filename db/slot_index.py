@@ -0,0 +1,299 @@
+import threading
+import time
+
+from db import db_init
+from db.db_init import format_slot_id, parse_slot_id
+from db.db_pool import on_rollback
+
+# ============================================
+# 🔹 INDEKS WOLNYCH SLOTÓW
+# ============================================
+# Siatka slotów (alejka / kolumna / poziom) trzymana w pamięci jako bitmapy:
+#   - dla każdej kolumny: bity wolnych poziomów,
+#   - dla każdej alejki: bity kolumn, w których jest coś wolnego,
+#   - dla całej siatki: bity alejek, w których jest coś wolnego.
+# Id slotu wynika z pozycji (db_init.format_slot_id), więc nie trzymamy
+# w pamięci nic per slot.
+# Szukanie najbliższego wolnego slotu to kilka operacji bitowych, bez
+# skanowania tabeli slots. Tabela slots pozostaje źródłem prawdy — zajęcie
+# slotu jest warunkowym UPDATE (status = 'EMPTY'), więc inny proces nie
+# dostanie tego samego slotu.
+
+SLOT_EMPTY = "EMPTY"
+SLOT_BOX_EMPTY = "BOX_EMPTY"
+SLOT_BOX_WITH_PRODUCTS = "BOX_WITH_PRODUCTS"
+
+# Co ile sekund indeks jest przeładowywany (zmiany z innych procesów)
+SLOT_INDEX_MAX_AGE = 300
+# Ile razy próbujemy, gdy wybrany slot zajął w międzyczasie ktoś inny
+ALLOCATE_RETRIES = 16
+
+
+def slot_status_for(quantity):
+    return SLOT_BOX_WITH_PRODUCTS if quantity and quantity > 0 else SLOT_BOX_EMPTY
+
+
+def aisle_sort_key(aisle):
+    # A..Z, potem AA, AB... (krótsze etykiety najpierw) — zgodnie z db_init.aisle_label
+    return (len(aisle), aisle)
+
+
+def _lowest_bit(mask):
+    return (mask & -mask).bit_length() - 1
+
+
+def _nearest_bit(mask, i):
+    """Indeks ustawionego bitu najbliższego pozycji i (przy remisie niższy)."""
+    if mask >> i & 1:
+        return i
+    upper = mask >> (i + 1)
+    up = i + 1 + _lowest_bit(upper) if upper else None
+    lower = mask & ((1 << i) - 1)
+    down = lower.bit_length() - 1 if lower else None
+    if up is None:
+        return down
+    if down is None or up - i < i - down:
+        return up
+    return down
+
+
+class SlotIndex:
+    def __init__(self):
+        self.aisles = []        # etykiety alejek w kolejności
+        self._aisle_idx = {}    # etykieta -> numer alejki
+        self._width = 2         # szerokość pól w id slotu (db_init.format_slot_id)
+        self._size = 0
+        self._col_free = {}     # (alejka, kolumna) -> bity wolnych poziomów
+        self._aisle_cols = {}   # alejka -> bity kolumn z wolnym miejscem
+        self._aisle_mask = 0    # bity alejek z wolnym miejscem
+        self._lock = threading.Lock()
+        self.loaded_at = 0.0
+        self.path = None
+        self.stale = True
+
+    #region ładowanie
+    def load(self, conn):
+        """
+        Buduje indeks z tabeli slots. Id slotów nie są trzymane w pamięci —
+        wynikają z (alejka, kolumna, poziom), patrz db_init.format_slot_id.
+        Bitmapy kolumn składa SQLite (GROUP BY), gdy poziomy mieszczą się w 62 bitach.
+        """
+        with self._lock:
+            self._reset()
+            aisles = [r[0] for r in conn.execute("SELECT DISTINCT aisle FROM slots")]
+            self.aisles = sorted(aisles, key=aisle_sort_key)
+            self._aisle_idx = {a: i for i, a in enumerate(self.aisles)}
+            size, max_level, sample_id = conn.execute("SELECT COUNT(*), MAX(slot), MIN(id) FROM slots").fetchone()
+            self._size = size
+            parsed = parse_slot_id(sample_id) if sample_id else None
+            self._width = parsed[3] if parsed else 2
+
+            if max_level is not None and max_level < 62:
+                rows = conn.execute("""
+                    SELECT aisle, col, SUM(1 << slot) FROM slots
+                    WHERE status = ? GROUP BY aisle, col
+                """, (SLOT_EMPTY,))
+                for aisle, col, mask in rows:
+                    a = self._aisle_idx[aisle]
+                    self._col_free[(a, col)] = mask
+                    self._aisle_cols[a] = self._aisle_cols.get(a, 0) | (1 << col)
+                    self._aisle_mask |= 1 << a
+            else:
+                rows = conn.execute("SELECT aisle, col, slot FROM slots WHERE status = ?", (SLOT_EMPTY,))
+                for aisle, col, level in rows:
+                    self._set_free(self._aisle_idx[aisle], col, level)
+
+            self.loaded_at = time.monotonic()
+            self.path = db_init.DB_PATH
+            self.stale = False
+        return self
+
+    def _reset(self):
+        self._col_free.clear()
+        self._aisle_cols.clear()
+        self._aisle_mask = 0
+        self._size = 0
+
+    def invalidate(self):
+        self.stale = True
+
+    def needs_reload(self):
+        return (self.stale or self.path != db_init.DB_PATH
+                or time.monotonic() - self.loaded_at > SLOT_INDEX_MAX_AGE)
+
+    def _locate(self, slot_id):
+        parsed = parse_slot_id(slot_id) if slot_id else None
+        if not parsed:
+            return None
+        a = self._aisle_idx.get(parsed[0])
+        return (a, parsed[1], parsed[2]) if a is not None else None
+
+    def _slot_id(self, a, col, level):
+        return format_slot_id(self.aisles[a], col, level, self._width)
+    #endregion
+    #region bitmapy
+    def _set_free(self, a, col, level):
+        key = (a, col)
+        self._col_free[key] = self._col_free.get(key, 0) | (1 << level)
+        self._aisle_cols[a] = self._aisle_cols.get(a, 0) | (1 << col)
+        self._aisle_mask |= 1 << a
+
+    def _set_used(self, a, col, level):
+        key = (a, col)
+        mask = self._col_free.get(key, 0) & ~(1 << level)
+        self._col_free[key] = mask
+        if not mask:
+            cols = self._aisle_cols.get(a, 0) & ~(1 << col)
+            self._aisle_cols[a] = cols
+            if not cols:
+                self._aisle_mask &= ~(1 << a)
+
+    def mark_free(self, slot_id):
+        pos = self._locate(slot_id)
+        if pos:
+            with self._lock:
+                self._set_free(*pos)
+
+    def mark_used(self, slot_id):
+        pos = self._locate(slot_id)
+        if pos:
+            with self._lock:
+                self._set_used(*pos)
+
+    def is_free(self, slot_id):
+        pos = self._locate(slot_id)
+        if not pos:
+            return False
+        a, col, level = pos
+        return bool(self._col_free.get((a, col), 0) >> level & 1)
+    #endregion
+    #region wyszukiwanie
+    def position(self, slot_id):
+        """(etykieta alejki, kolumna, poziom) albo None."""
+        pos = self._locate(slot_id)
+        return (self.aisles[pos[0]], pos[1], pos[2]) if pos else None
+
+    def _nearest(self, aisle=None, col=0):
+        if not self._aisle_mask:
+            return None
+        a = self._aisle_idx.get(aisle, 0) if aisle is not None else 0
+        a = _nearest_bit(self._aisle_mask, a)
+        c = _nearest_bit(self._aisle_cols[a], col)
+        level = _lowest_bit(self._col_free[(a, c)])
+        return self._slot_id(a, c, level)
+
+    def nearest_free(self, aisle=None, col=0):
+        """
+        Najbliższy wolny slot: ta sama (albo najbliższa) alejka, w niej
+        najbliższa kolumna, w kolumnie najniższy poziom. Bez argumentów —
+        slot najbliżej początku siatki.
+        """
+        with self._lock:
+            return self._nearest(aisle, col)
+
+    def take_nearest(self, aisle=None, col=0):
+        """Jak nearest_free, ale od razu oznacza slot jako zajęty."""
+        with self._lock:
+            slot_id = self._nearest(aisle, col)
+            if slot_id is not None:
+                self._set_used(*self._locate(slot_id))
+            return slot_id
+
+    def free_count(self):
+        with self._lock:
+            return sum(bin(m).count("1") for m in self._col_free.values())
+
+    def __len__(self):
+        return self._size
+    #endregion
+
+
+_index = SlotIndex()
+_index_lock = threading.Lock()
+
+
+def get_slot_index_instance():
+    """Indeks bez ładowania (np. żeby go unieważnić)."""
+    return _index
+
+
+def get_slot_index(conn):
+    """Zwraca indeks slotów (ładuje / przeładowuje gdy trzeba)."""
+    if _index.needs_reload():
+        with _index_lock:
+            if _index.needs_reload():
+                _index.load(conn)
+    return _index
+
+
+#region operacje na tabeli slots
+def occupy_slot(conn, slot_id, box_barcode, status=SLOT_BOX_EMPTY):
+    """Zajmuje konkretny slot. False, jeśli slot nie istnieje albo jest zajęty."""
+    index = get_slot_index(conn)
+    cur = conn.execute("""
+        UPDATE slots SET status = ?, box_barcode = ?
+        WHERE id = ? AND status = ?
+    """, (status, box_barcode, slot_id, SLOT_EMPTY))
+    index.mark_used(slot_id)
+    on_rollback(index.invalidate)
+    return cur.rowcount == 1
+
+
+def allocate_slot(conn, box_barcode, status=SLOT_BOX_EMPTY, near_slot_id=None):
+    """
+    Przydziela boxowi najbliższy wolny slot (względem near_slot_id albo
+    początku siatki) i zapisuje go w tabeli slots. Zwraca slot_id albo None.
+    """
+    index = get_slot_index(conn)
+    anchor = index.position(near_slot_id) if near_slot_id else None
+    aisle, col = (anchor[0], anchor[1]) if anchor else (None, 0)
+
+    for _ in range(ALLOCATE_RETRIES):
+        slot_id = index.take_nearest(aisle, col)
+        if slot_id is None:
+            return None
+        cur = conn.execute("""
+            UPDATE slots SET status = ?, box_barcode = ?
+            WHERE id = ? AND status = ?
+        """, (status, box_barcode, slot_id, SLOT_EMPTY))
+        if cur.rowcount == 1:
+            on_rollback(index.invalidate)
+            return slot_id
+        # slot zajęty przez inny proces — indeks jest już poprawiony, próbujemy dalej
+
+    index.invalidate()
+    return None
+
+
+def release_slot(conn, slot_id):
+    """Zwalnia slot (status EMPTY, bez boxa)."""
+    if not slot_id:
+        return
+    index = get_slot_index(conn)
+    conn.execute("UPDATE slots SET status = ?, box_barcode = NULL WHERE id = ?", (SLOT_EMPTY, slot_id))
+    index.mark_free(slot_id)
+    on_rollback(index.invalidate)
+
+
+def update_slot_status(conn, slot_id, quantity):
+    """Aktualizuje status zajętego slotu wg ilości w boxie."""
+    if slot_id:
+        conn.execute("UPDATE slots SET status = ? WHERE id = ? AND status != ?",
+                     (slot_status_for(quantity), slot_id, SLOT_EMPTY))
+
+
+def find_slot_near_product(conn, product_id):
+    """Slot ostatnio umieszczonego boxa z tym produktem (punkt odniesienia)."""
+    row = conn.execute("""
+        SELECT slot_id FROM boxes
+        WHERE product_id = ? AND slot_id IS NOT NULL
+        ORDER BY id DESC LIMIT 1
+    """, (product_id,)).fetchone()
+    return row[0] if row else None
+
+
+def allocate_slot_for_product(conn, box_barcode, product_id, quantity):
+    """Przydziela slot możliwie blisko innych boxów tego produktu."""
+    near = find_slot_near_product(conn, product_id) if product_id else None
+    return allocate_slot(conn, box_barcode, slot_status_for(quantity), near)
+#endregion
@@ -0,0 +1,92 @@
+import math
+
+from utils.errors import ValidationError
+
+# ============================================
+# 🔹 WALIDACJA DANYCH PRODUKTÓW I PALET
+# ============================================
+# Wspólna dla pojedynczych zapisów (add_product_type, add_external_palet)
+# i importu zbiorczego (source/bulk_import.py). Funkcje przyjmują też tekst
+# (np. z CSV) i zwracają wartości znormalizowane; błąd → ValidationError.
+# validate_order sprawdza zamówienia PICK_ORDER (db/picking.py).
+
+MAX_NAME_LENGTH = 200
+
+
+def _number(value, field, cast):
+    if isinstance(value, bool):
+        raise ValidationError(f"{field}: nieprawidłowa wartość {value!r}")
+    try:
+        number = cast(value.strip() if isinstance(value, str) else value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"{field}: nieprawidłowa wartość {value!r}") from None
+    if isinstance(number, float) and not math.isfinite(number):
+        raise ValidationError(f"{field}: nieprawidłowa wartość {value!r}")
+    return number
+
+
+def _integer(value, field):
+    # 10, "10" i 10.0 (np. z JSON) są w porządku, 10.5 już nie
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValidationError(f"{field}: oczekiwano liczby całkowitej, jest {value!r}")
+        value = int(value)
+    return _number(value, field, int)
+
+
+def _text(value, field):
+    text = value.strip() if isinstance(value, str) else ""
+    if not text:
+        raise ValidationError(f"{field}: wartość jest wymagana")
+    if len(text) > MAX_NAME_LENGTH:
+        raise ValidationError(f"{field}: za długie ({len(text)} > {MAX_NAME_LENGTH} znaków)")
+    return text
+
+
+def validate_product(name, weight, max_per_box):
+    """Zwraca (name, weight, max_per_box) albo rzuca ValidationError."""
+    name = _text(name, "name")
+    weight = _number(weight, "weight", float)
+    max_per_box = _integer(max_per_box, "max_per_box")
+    if weight <= 0:
+        raise ValidationError(f"weight: musi być dodatnia, jest {weight:g}")
+    if max_per_box <= 0:
+        raise ValidationError(f"max_per_box: musi być dodatnie, jest {max_per_box}")
+    return name, weight, max_per_box
+
+
+def validate_palet(product_id, quantity, palet_name):
+    """Zwraca (product_id, quantity, palet_name) albo rzuca ValidationError."""
+    product_id = _integer(product_id, "product_id")
+    quantity = _integer(quantity, "quantity")
+    palet_name = _text(palet_name, "palet_name")
+    if product_id <= 0:
+        raise ValidationError(f"product_id: nieprawidłowe id {product_id}")
+    if quantity <= 0:
+        raise ValidationError(f"quantity: musi być dodatnia, jest {quantity}")
+    return product_id, quantity, palet_name
+
+
+def validate_order(order):
+    """
+    Zamówienie {"order_id", "lines": [{"product_id", "quantity"}]} →
+    (order_id, [(product_id, quantity)]) albo ValidationError.
+    Powtórzone produkty w liniach są sumowane.
+    """
+    if not isinstance(order, dict):
+        raise ValidationError("zamówienie: oczekiwano obiektu")
+    order_id = order.get("order_id")
+    order_id = _text(str(order_id) if isinstance(order_id, int) else order_id, "order_id")
+    lines = order.get("lines")
+    if not isinstance(lines, list) or not lines:
+        raise ValidationError(f"zamówienie {order_id}: brak linii")
+    quantities = {}
+    for line in lines:
+        if not isinstance(line, dict):
+            raise ValidationError(f"zamówienie {order_id}: nieprawidłowa linia {line!r}")
+        product_id = _integer(line.get("product_id"), "product_id")
+        quantity = _integer(line.get("quantity"), "quantity")
+        if product_id <= 0 or quantity <= 0:
+            raise ValidationError(f"zamówienie {order_id}: nieprawidłowa linia {line!r}")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return order_id, list(quantities.items())
@@ -1,6 +1,9 @@
 from core.core_loop import core_loop
+from db.db_init import initialize_database
 
 if __name__ == "__main__":
+    # tworzymy brakujące tabele / kolumny
+    initialize_database()
     # uruchamiamy główną pętlę magazynową
     core_loop()
 
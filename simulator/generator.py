@@ -1,30 +1,207 @@
+import argparse
+import itertools
+import multiprocessing
 import random
+import threading
 import time
-import sqlite3
-from utils.logger import log_info
-
-DB_PATH = "warehouse.db"
-
-def add_event(event_type, location):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("INSERT INTO events (event_type, location, processed) VALUES (?, ?, 0)",
-              (event_type, location))
-    conn.commit()
-    conn.close()
-
-def simulate_events():
-    names = ["Box_A", "Box_B", "Box_C"]
-    locations = ["A-01-01", "B-02-03", "C-03-04"]
-
-    while True:
-        name = random.choice(names)
-        loc = random.choice(locations)
-        add_event("PRODUCT_ADDED", loc)
-        log_info(f"📦 Event queued: add product {name} at {loc}")
-        time.sleep(5)
 
-if __name__ == "__main__":
-    log_info("🧪 Starting event simulator...")
-    simulate_events()
+from db.db_init import initialize_database
+from db.db_manager import add_events, add_product_type, count_pending_events, get_all_products
+from db.db_pool import close_connection, transaction
+from utils.logger import log_info, set_console_level, flush as flush_logs
+
+# ============================================
+# 🔹 GENERATOR OBCIĄŻENIA (SYMULATOR EVENTÓW)
+# ============================================
+# python -m simulator.generator --rate 2000 --producers 4 --duration 60
+# Kilku producentów (wątki albo procesy) wrzuca eventy w formacie, który
+# rozumie process_event, paczkami w jednej transakcji, ze stałym tempem.
+
+DEFAULT_MIX = {
+    "ADD_PRODUCT_TYPE": 0.05,
+    "ADD_PALETTE": 0.45,
+    "ADD_PRODUCTS_TO_STOCK": 0.50,
+}
+
+# Co ile sekund producent wysyła paczkę zaległych eventów
+TICK_SECONDS = 0.1
+# Co ile sekund raport na konsoli
+REPORT_SECONDS = 1.0
+# Co ile sekund producent odświeża listę produktów (nowe z ADD_PRODUCT_TYPE)
+PRODUCT_REFRESH_SECONDS = 5.0
+# Ile produktów zakładamy od razu, gdy katalog jest pusty
+BOOTSTRAP_PRODUCTS = 100
+
+
+#region PAYLOADY
+class PayloadFactory:
+    """Buduje payloady eventów dla jednego producenta."""
+
+    def __init__(self, producer_id, product_ids, mix, seed=None):
+        self.producer_id = producer_id
+        self.product_ids = list(product_ids)
+        self.types = list(mix)
+        self.weights = [mix[t] for t in self.types]
+        self.rng = random.Random(seed)
+        self.seq = itertools.count(1)
+
+    def make(self):
+        event_type = self.rng.choices(self.types, self.weights)[0]
+        n = next(self.seq)
+
+        # bez produktów w bazie najpierw trzeba jakieś zdefiniować
+        if not self.product_ids or event_type == "ADD_PRODUCT_TYPE":
+            return "ADD_PRODUCT_TYPE", {
+                "name": f"SIM-{self.producer_id}-{n}-{self.rng.randrange(1 << 30)}",
+                "weight": round(self.rng.uniform(0.1, 10.0), 2),
+                "max_per_box": self.rng.choice((5, 10, 20, 50)),
+            }
+
+        if event_type == "PICK_ORDER":
+            return "PICK_ORDER", {
+                "order_id": f"SIM-ORD-{self.producer_id}-{n}",
+                "lines": [
+                    {"product_id": product_id, "quantity": self.rng.randint(1, 5)}
+                    for product_id in self.rng.sample(self.product_ids, min(len(self.product_ids),
+                                                                             self.rng.randint(1, 4)))
+                ],
+            }
+
+        product_id = self.rng.choice(self.product_ids)
+        if event_type == "ADD_PALETTE":
+            return "ADD_PALETTE", {
+                "product_id": product_id,
+                "quantity": self.rng.randint(50, 500),
+                "palet_name": f"SIM-PAL-{self.producer_id}-{n}-{self.rng.randrange(1 << 30)}",
+            }
+        return "ADD_PRODUCTS_TO_STOCK", {
+            "product_id": product_id,
+            "quantity": self.rng.randint(1, 60),
+        }
+#endregion
+#region PRODUCENT
+def run_producer(producer_id, rate, duration, mix, product_ids, sent, stop_event, seed=None):
+    """
+    Jeden producent: co TICK_SECONDS wysyła tyle eventów, ile wynika
+    z zadanego tempa (rate / s), jednym executemany.
+    """
+    factory = PayloadFactory(producer_id, product_ids, mix, seed)
+    started = time.perf_counter()
+    refreshed = started
+    produced = 0
+    try:
+        while not stop_event.is_set():
+            elapsed = time.perf_counter() - started
+            if duration and elapsed >= duration:
+                break
+            if time.perf_counter() - refreshed >= PRODUCT_REFRESH_SECONDS:
+                factory.product_ids = [p.id for p in (get_all_products() or [])] or factory.product_ids
+                refreshed = time.perf_counter()
+            due = int(elapsed * rate) - produced
+            if due > 0:
+                batch = [factory.make() for _ in range(due)]
+                if add_events(batch):
+                    produced += due
+                    with sent.get_lock():
+                        sent.value += due
+            stop_event.wait(TICK_SECONDS)
+    finally:
+        close_connection()
+        flush_logs()
+#endregion
+#region SYMULACJA
+def bootstrap_products(count, seed=None):
+    """Zakłada `count` produktów bezpośrednio (bez kolejki), gdy katalog jest pusty."""
+    rng = random.Random(seed)
+    with transaction():
+        for i in range(count):
+            add_product_type(f"SIM-SKU-{i:05d}", round(rng.uniform(0.1, 10.0), 2), rng.choice((5, 10, 20, 50)))
+    log_info(f"🧪 Bootstrapped {count} products for the simulator")
+    return [p.id for p in (get_all_products() or [])]
+
 
+def simulate_events(rate=100.0, producers=1, duration=None, mix=None, use_processes=False, seed=None):
+    """
+    Uruchamia producentów i co sekundę raportuje osiągnięte tempo
+    oraz długość kolejki (oczekujące eventy).
+    """
+    mix = mix or DEFAULT_MIX
+    product_ids = [p.id for p in (get_all_products() or [])]
+    if not product_ids:
+        product_ids = bootstrap_products(BOOTSTRAP_PRODUCTS, seed)
+    sent = multiprocessing.Value("q", 0)
+    stop_event = multiprocessing.Event() if use_processes else threading.Event()
+    per_producer = rate / producers
+
+    worker_cls = multiprocessing.Process if use_processes else threading.Thread
+    workers = [
+        worker_cls(
+            target=run_producer,
+            args=(i, per_producer, duration, mix, product_ids, sent, stop_event,
+                  None if seed is None else seed + i),
+            name=f"producer-{i}",
+            daemon=True,
+        )
+        for i in range(producers)
+    ]
+
+    log_info(f"🧪 Starting load generator: {rate:g} ev/s, {producers} "
+             f"{'processes' if use_processes else 'threads'}, mix={mix}")
+    for w in workers:
+        w.start()
+
+    started = last_time = time.perf_counter()
+    last_sent = 0
+    try:
+        while any(w.is_alive() for w in workers):
+            time.sleep(REPORT_SECONDS)
+            now = time.perf_counter()
+            total = sent.value
+            backlog = count_pending_events()
+            print(f"📈 {now - started:6.1f}s | sent {total:>9} | "
+                  f"{(total - last_sent) / (now - last_time):>9,.0f} ev/s "
+                  f"(target {rate:,.0f}) | backlog {backlog}")
+            last_time, last_sent = now, total
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        for w in workers:
+            w.join()
+
+    elapsed = time.perf_counter() - started
+    log_info(f"🧪 Load generator finished: {sent.value} events in {elapsed:.1f}s "
+             f"({sent.value / max(elapsed, 1e-9):,.0f} ev/s)")
+    return sent.value
+
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        event_type, _, weight = part.partition("=")
+        mix[event_type.strip()] = float(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warehouse event load generator.")
+    parser.add_argument("-r", "--rate", type=float, default=100.0, help="target events per second (total)")
+    parser.add_argument("-p", "--producers", type=int, default=1, help="number of concurrent producers")
+    parser.add_argument("-d", "--duration", type=float, default=None, help="seconds to run (default: until Ctrl+C)")
+    parser.add_argument("--processes", action="store_true", help="use processes instead of threads")
+    parser.add_argument("--mix", type=_parse_mix, default=None,
+                        help="event mix, e.g. ADD_PRODUCT_TYPE=0.05,ADD_PALETTE=0.45,ADD_PRODUCTS_TO_STOCK=0.5"
+                             " (PICK_ORDER also supported)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--quiet", action="store_true", help="don't echo log lines on the console")
+    args = parser.parse_args(argv)
+
+    if args.quiet:
+        set_console_level(None)
+    initialize_database()
+    simulate_events(args.rate, args.producers, args.duration, args.mix, args.processes, args.seed)
+
+
+if __name__ == "__main__":
+    main()
+#endregion
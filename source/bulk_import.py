@@ -0,0 +1,252 @@
+import argparse
+import collections
+import csv
+import datetime
+import json
+import os
+import time
+
+from db import db_init
+from db.product_cache import product_cache
+from db.validation import validate_product, validate_palet
+from utils.errors import ValidationError
+from utils.logger import log_info as log, log_error
+
+# ============================================
+# 🔹 IMPORT ZBIORCZY PRODUKTÓW I PALET
+# ============================================
+# python -m source.bulk_import products katalog.csv
+# python -m source.bulk_import pallets dostawa.jsonl --rejects odrzucone.jsonl
+# Plik czytamy strumieniowo (CSV z nagłówkiem albo JSONL), wiersze
+# sprawdzamy tą samą walidacją co add_product_type / add_external_palet
+# i zapisujemy paczkami po IMPORT_BATCH w jednej transakcji IMMEDIATE —
+# z pominięciem kolejki eventów. Duplikaty (w bazie i w pliku) oraz błędne
+# wiersze trafiają do odrzuconych, razem z numerem linii i powodem.
+#
+# Kolumny:
+#   products: name, weight, max_per_box
+#   pallets:  palet_name (albo barcode), product_id albo product (nazwa),
+#             quantity, opcjonalnie received_at (ISO 8601)
+
+# Ile wierszy zapisujemy w jednej transakcji
+IMPORT_BATCH = 10000
+# Pauza między paczkami (oddajemy blokadę zapisu workerom)
+BATCH_PAUSE_SECONDS = 0.01
+# Co ile paczek logujemy postęp
+PROGRESS_EVERY_BATCHES = 10
+# Ile przykładowych odrzuceń trzymamy w wyniku
+REJECT_EXAMPLES = 10
+
+KINDS = ("products", "pallets")
+
+
+#region CZYTANIE PLIKÓW
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    return "jsonl" if ext in (".jsonl", ".ndjson", ".json") else "csv"
+
+
+def read_rows(path, fmt=None):
+    """
+    Strumień (nr_linii, wiersz) z pliku CSV albo JSONL.
+    Wiersz to słownik; linia, której nie da się odczytać, daje ValidationError.
+    """
+    fmt = fmt or detect_format(path)
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, ValidationError(f"nieprawidłowy JSON: {e.msg}")
+                continue
+            if not isinstance(row, dict):
+                yield line_no, ValidationError("oczekiwano obiektu JSON")
+                continue
+            yield line_no, row
+#endregion
+#region PARSOWANIE WIERSZY
+def _parse_product(row):
+    return validate_product(row.get("name"), row.get("weight"), row.get("max_per_box"))
+
+
+def _received_at(value):
+    if value in (None, ""):
+        return None
+    try:
+        return datetime.datetime.fromisoformat(str(value).strip()).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise ValidationError(f"received_at: nieprawidłowa data {value!r}") from None
+
+
+def _parse_pallet(row):
+    """Zwraca (product_id albo nazwa produktu, quantity, barcode, received_at)."""
+    barcode = row.get("palet_name") or row.get("barcode")
+    product_name = row.get("product")
+    if row.get("product_id") in (None, "") and isinstance(product_name, str) and product_name.strip():
+        # id jeszcze nie znamy — walidujemy resztę z tymczasowym id
+        _, quantity, barcode = validate_palet(1, row.get("quantity"), barcode)
+        return product_name.strip(), quantity, barcode, _received_at(row.get("received_at"))
+    product_id, quantity, barcode = validate_palet(row.get("product_id"), row.get("quantity"), barcode)
+    return product_id, quantity, barcode, _received_at(row.get("received_at"))
+#endregion
+#region ZAPIS PACZEK
+def _existing(conn, sql, values):
+    return {r[0] for r in conn.execute(sql, (json.dumps(list(values)),))}
+
+
+def _write_products(conn, batch, reject):
+    """batch: [(nr_linii, (name, weight, max_per_box))]. Zwraca liczbę zapisanych."""
+    existing = _existing(conn, "SELECT name FROM products WHERE name IN (SELECT value FROM json_each(?))",
+                         {values[0] for _, values in batch})
+    rows = []
+    for line_no, values in batch:
+        if values[0] in existing:
+            reject(line_no, "duplicate", f"produkt {values[0]!r} już istnieje")
+            continue
+        existing.add(values[0])
+        rows.append(values)
+    conn.executemany("INSERT INTO products (name, weight, max_per_box) VALUES (?, ?, ?)", rows)
+    return len(rows)
+
+
+def _write_pallets(conn, batch, reject):
+    """batch: [(nr_linii, (produkt, quantity, barcode, received_at))]. Zwraca liczbę zapisanych."""
+    names = {values[0] for _, values in batch if isinstance(values[0], str)}
+    ids = {values[0] for _, values in batch if not isinstance(values[0], str)}
+    by_name = dict(conn.execute(
+        "SELECT name, id FROM products WHERE name IN (SELECT value FROM json_each(?))",
+        (json.dumps(list(names)),),
+    )) if names else {}
+    known_ids = _existing(conn, "SELECT id FROM products WHERE id IN (SELECT value FROM json_each(?))",
+                          ids) if ids else set()
+    known_ids.update(by_name.values())
+    barcodes = _existing(conn, "SELECT barcode FROM external_palets WHERE barcode IN (SELECT value FROM json_each(?))",
+                         {values[2] for _, values in batch})
+
+    rows = []
+    for line_no, (product, quantity, barcode, received_at) in batch:
+        product_id = by_name.get(product) if isinstance(product, str) else product
+        if product_id is None or product_id not in known_ids:
+            reject(line_no, "unknown_product", f"nie ma produktu {product!r}")
+            continue
+        if barcode in barcodes:
+            reject(line_no, "duplicate", f"paleta {barcode!r} już istnieje")
+            continue
+        barcodes.add(barcode)
+        rows.append((barcode, product_id, quantity, received_at))
+    conn.executemany("""
+        INSERT INTO external_palets (barcode, product_id, quantity, received_at)
+        VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+    """, rows)
+    return len(rows)
+
+
+_PARSERS = {"products": _parse_product, "pallets": _parse_pallet}
+_WRITERS = {"products": _write_products, "pallets": _write_pallets}
+
+
+def _write_batch(conn, kind, batch, reject):
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        written = _WRITERS[kind](conn, batch, reject)
+        conn.execute("COMMIT")
+        return written
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+#endregion
+#region IMPORT
+def bulk_import(kind, path, fmt=None, batch_size=IMPORT_BATCH, rejects_path=None):
+    """
+    Importuje produkty albo palety z pliku. Zwraca słownik
+    {rows, imported, rejected, reasons, examples, seconds, rows_per_second}.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Nieznany rodzaj importu: {kind} (dostępne: {', '.join(KINDS)})")
+    parse = _PARSERS[kind]
+    started = time.perf_counter()
+    stats = {"rows": 0, "imported": 0, "rejected": 0,
+             "reasons": collections.Counter(), "examples": []}
+    rejects_file = open(rejects_path, "w", encoding="utf-8") if rejects_path else None
+
+    def reject(line_no, reason, message, row=None):
+        stats["rejected"] += 1
+        stats["reasons"][reason] += 1
+        if len(stats["examples"]) < REJECT_EXAMPLES:
+            stats["examples"].append(f"linia {line_no}: {message}")
+        if rejects_file:
+            rejects_file.write(json.dumps({"line": line_no, "reason": reason, "error": message, "row": row},
+                                          ensure_ascii=False, default=str) + "\n")
+
+    conn = db_init.get_connection()
+    conn.isolation_level = None
+    batch = []
+    batches = 0
+    try:
+        for line_no, row in read_rows(path, fmt):
+            stats["rows"] += 1
+            if isinstance(row, ValidationError):
+                reject(line_no, "invalid", str(row))
+                continue
+            try:
+                batch.append((line_no, parse(row)))
+            except ValidationError as e:
+                reject(line_no, "invalid", str(e), row)
+                continue
+            if len(batch) >= batch_size:
+                stats["imported"] += _write_batch(conn, kind, batch, reject)
+                batch = []
+                batches += 1
+                if batches % PROGRESS_EVERY_BATCHES == 0:
+                    elapsed = time.perf_counter() - started
+                    log(f"📥 Import {kind}: {stats['rows']} rows, {stats['imported']} imported, "
+                        f"{stats['rejected']} rejected ({stats['rows'] / elapsed:.0f} rows/s)")
+                time.sleep(BATCH_PAUSE_SECONDS)
+        if batch:
+            stats["imported"] += _write_batch(conn, kind, batch, reject)
+    except Exception as e:
+        log_error(f"❌ Bulk import of {kind} from {path} failed at row {stats['rows']}: {e}")
+        stats["error"] = str(e)
+    finally:
+        conn.close()
+        if rejects_file:
+            rejects_file.close()
+        if kind == "products":
+            product_cache.clear()
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["rows_per_second"] = round(stats["rows"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    stats["reasons"] = dict(stats["reasons"])
+    log(f"📥 Imported {stats['imported']} {kind} from {path}: {stats['rows']} rows, "
+        f"{stats['rejected']} rejected, {stats['seconds']}s ({stats['rows_per_second']:.0f} rows/s)")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import of products or pallets from CSV/JSONL.")
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default=None, help="default: by file extension")
+    parser.add_argument("--batch", type=int, default=IMPORT_BATCH, help="rows per transaction")
+    parser.add_argument("--rejects", default=None, help="write rejected rows to this JSONL file")
+    args = parser.parse_args(argv)
+
+    db_init.initialize_database()
+    stats = bulk_import(args.kind, args.path, args.format, args.batch, args.rejects)
+    print(f"✅ Zaimportowano: {stats['imported']} | odrzucone: {stats['rejected']} {stats['reasons'] or ''} | "
+          f"{stats['rows_per_second']:.0f} wierszy/s")
+    for example in stats["examples"]:
+        print(f"  - {example}")
+
+
+if __name__ == "__main__":
+    main()
+#endregion
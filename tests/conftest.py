@@ -0,0 +1,20 @@
+import pytest
+
+from db import db_init, event_lanes
+from db.db_pool import close_connection
+from utils import logger
+
+
+@pytest.fixture
+def warehouse_db(tmp_path, monkeypatch):
+    """Świeża baza w katalogu tymczasowym, domyślne pasy, bez logów na konsolę i do pliku."""
+    monkeypatch.setattr(db_init, "DB_PATH", str(tmp_path / "warehouse.db"))
+    monkeypatch.setattr(logger, "CONSOLE_LEVEL", 100)
+    monkeypatch.setattr(logger, "FILE_LEVEL", 100)
+    event_lanes.configure_lanes(event_lanes.DEFAULT_LANES)
+    db_init.initialize_database()
+    conn = db_init.get_connection()
+    yield conn
+    conn.close()
+    close_connection()
+    event_lanes.configure_lanes(event_lanes._load_lanes())
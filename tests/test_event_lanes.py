@@ -0,0 +1,43 @@
+from core.event_processor import drain_events
+from db.db_manager import add_events, add_product_type, claim_events
+
+
+def _pallets(count, quantity=20):
+    return [("ADD_PALETTE", {"product_id": 1, "quantity": quantity, "palet_name": f"P-{i}"})
+            for i in range(count)]
+
+
+def test_receipt_does_not_overtake_older_pallets(warehouse_db):
+    # 5 palet po 20 szt., potem przyjęcie 100 szt. — paczki po 2 eventy
+    add_product_type("SKU-1", 1.0, 10)
+    add_events(_pallets(5) + [("ADD_PRODUCTS_TO_STOCK", {"product_id": 1, "quantity": 100})])
+
+    drain_events(batch_size=2, max_batches=1)
+    first = warehouse_db.execute("SELECT event_type FROM events WHERE processed != 0 ORDER BY id").fetchall()
+    assert first == [("ADD_PALETTE",), ("ADD_PALETTE",)]
+
+    drain_events(batch_size=2)
+    stock = warehouse_db.execute(
+        "SELECT processed, error_message FROM events WHERE event_type = 'ADD_PRODUCTS_TO_STOCK'").fetchone()
+    assert stock == (1, None)
+    assert warehouse_db.execute(
+        "SELECT units_in_boxes FROM product_stock WHERE product_id = 1").fetchone() == (100,)
+
+
+def test_claimed_batch_is_in_id_order(warehouse_db):
+    add_product_type("SKU-1", 1.0, 10)
+    add_events([("ADD_PRODUCTS_TO_STOCK", {"product_id": 1, "quantity": 1})] * 3 + _pallets(3))
+
+    events = claim_events("test", 10)
+    assert [e.id for e in events] == sorted(e.id for e in events)
+    assert len(events) == 6
+
+
+def test_weights_still_let_control_through_a_bulk_flood(warehouse_db):
+    # przyjęcia starsze od palet nie blokują palet (to palety mają pierwszeństwo)
+    add_product_type("SKU-1", 1.0, 10)
+    add_events([("ADD_PRODUCTS_TO_STOCK", {"product_id": 1, "quantity": 1})] * 50 + _pallets(10))
+
+    events = claim_events("test", 20)
+    assert sum(e.event_type == "ADD_PALETTE" for e in events) == 10
+    assert [e.id for e in events] == sorted(e.id for e in events)
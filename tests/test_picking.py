@@ -0,0 +1,50 @@
+from core.event_processor import drain_events
+from db.db_manager import add_events, add_external_palet, add_product_type, claim_events
+
+
+def _order(order_id, quantity):
+    return ("PICK_ORDER", {"order_id": order_id, "lines": [{"product_id": 1, "quantity": quantity}]})
+
+
+def _setup(warehouse_db):
+    # towar jest tylko na palecie — kompletacja zależy od przyjęcia do boxów
+    add_product_type("SKU-1", 1.0, 10)
+    add_external_palet(1, 100, "P-1")
+
+
+def _events(warehouse_db):
+    return warehouse_db.execute("SELECT event_type, processed, error_message FROM events ORDER BY id").fetchall()
+
+
+def test_pick_waits_for_older_receipt_across_batches(warehouse_db):
+    _setup(warehouse_db)
+    add_events([("ADD_PRODUCTS_TO_STOCK", {"product_id": 1, "quantity": 50}), _order("ORD-1", 30)])
+
+    assert [e.event_type for e in claim_events("test", 1)] == ["ADD_PRODUCTS_TO_STOCK"]
+    warehouse_db.execute("UPDATE events SET claimed_by = NULL, lease_until = NULL")
+    warehouse_db.commit()
+
+    drain_events(batch_size=1)
+    assert _events(warehouse_db) == [("ADD_PRODUCTS_TO_STOCK", 1, None), ("PICK_ORDER", 1, None)]
+    assert warehouse_db.execute("SELECT units_in_boxes FROM product_stock").fetchone() == (20,)
+
+
+def test_receipt_then_picks_in_one_batch(warehouse_db):
+    _setup(warehouse_db)
+    add_events([("ADD_PRODUCTS_TO_STOCK", {"product_id": 1, "quantity": 50}),
+                _order("ORD-1", 30), _order("ORD-2", 20)])
+
+    assert drain_events(batch_size=10) == (3, 0)
+    assert [e[1] for e in _events(warehouse_db)] == [1, 1, 1]
+    # dwa kolejne zamówienia — jedna fala
+    assert warehouse_db.execute("SELECT COUNT(DISTINCT wave_id), SUM(quantity) FROM pick_lines").fetchone() == (1, 50)
+
+
+def test_failed_wave_falls_back_to_single_orders(warehouse_db):
+    _setup(warehouse_db)
+    add_events([("ADD_PRODUCTS_TO_STOCK", {"product_id": 1, "quantity": 50}),
+                _order("ORD-1", 30), _order("ORD-BIG", 1000), _order("ORD-2", 20)])
+
+    assert drain_events(batch_size=10) == (3, 1)
+    failed = warehouse_db.execute("SELECT payload FROM events WHERE processed = -1").fetchone()[0]
+    assert "ORD-BIG" in failed
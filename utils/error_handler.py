@@ -1,5 +1,5 @@
 # utils/error_handler.py
-from .logger import log_info as log_error  # aliasujemy log_info na log_error
+from .logger import log_error
 
 
 def handle_exception(e):
@@ -12,3 +12,14 @@ class StockLimitExceededError(WarehouseError):
     """Przekroczono maksymalną ilość w pudełku"""
     pass
 
+class InsufficientStockError(WarehouseError):
+    """Za mało produktu na paletach albo za mało miejsca w boxach"""
+    pass
+
+class LeaseLostError(WarehouseError):
+    """Lease eventu wygasł i event przejął inny worker"""
+    pass
+
+class ValidationError(WarehouseError):
+    """Nieprawidłowe dane wejściowe (produkt, paleta)"""
+    pass
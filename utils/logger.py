@@ -1,24 +1,176 @@
+import atexit
 import datetime
 import os
+import queue
+import threading
+import time
 
 # Używamy aktualnego katalogu roboczego
 BASE_DIR = os.getcwd()
 LOG_DIR = os.path.join(BASE_DIR, "logs")
 
+# Poziomy logowania
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+_LEVEL_NAMES = {"DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "ERROR": ERROR, "OFF": 100}
+
+
+def _level_from_env(name, default):
+    value = os.environ.get(name, "").strip().upper()
+    return _LEVEL_NAMES.get(value, default)
+
+
+# Minimalny poziom zapisywany do pliku i wypisywany na konsolę.
+# Konsolę można wyłączyć: WAREHOUSE_CONSOLE_LOG_LEVEL=OFF
+FILE_LEVEL = _level_from_env("WAREHOUSE_LOG_LEVEL", INFO)
+CONSOLE_LEVEL = _level_from_env("WAREHOUSE_CONSOLE_LOG_LEVEL", INFO)
+
+_STOP = object()
+_queue = queue.Queue()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def set_level(level):
+    """Ustawia minimalny poziom zapisu do pliku."""
+    global FILE_LEVEL
+    FILE_LEVEL = level
+
+
+def set_console_level(level):
+    """Ustawia minimalny poziom wypisywany na konsolę (None = wyłączone)."""
+    global CONSOLE_LEVEL
+    CONSOLE_LEVEL = 100 if level is None else level
+
+
+#region API
+def log(message, level=INFO):
+    if level >= CONSOLE_LEVEL:
+        now = datetime.datetime.now()
+        print(now.strftime("[%Y-%m-%d %H:%M:%S] ") + str(message))
+
+    if level >= FILE_LEVEL:
+        _ensure_writer()
+        _queue.put((time.time(), level, message))
+
+
+def log_debug(message):
+    log(message, DEBUG)
+
+
 def log_info(message):
-    os.makedirs(LOG_DIR, exist_ok=True)
-    
-    now = datetime.datetime.now()
-    log_filename = now.strftime("%Y-%m-%d_%H.log")
-    log_path = os.path.join(LOG_DIR, log_filename)
-    
-    timestamp = now.strftime("[%Y-%m-%d %H:%M:%S]")
-    line = f"{timestamp} {message}"
-    
-    # DEBUG
-    print(f"[LOG] {line} -> {log_path}")
-    
-    # Zapis do pliku i wypis na konsolę
-    print(line)
-    with open(log_path, "a") as f:
-        f.write(line + "\n")
+    log(message, INFO)
+
+
+def log_warning(message):
+    log(message, WARNING)
+
+
+def log_error(message):
+    log(message, ERROR)
+
+
+def flush():
+    """Czeka aż wszystkie zakolejkowane wpisy trafią do pliku."""
+    if _writer is not None and _writer.is_alive():
+        _queue.join()
+
+
+def shutdown():
+    """Zapisuje zaległe wpisy i zatrzymuje wątek zapisu."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            return
+        if _writer.is_alive():
+            _queue.put(_STOP)
+            _writer.join()
+        _writer = None
+#endregion
+#region WĄTEK ZAPISU
+def _ensure_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_writer_loop, name="log-writer", daemon=True)
+            _writer.start()
+
+
+def _writer_loop():
+    current_hour = None
+    handle = None
+    stop = False
+
+    while not stop:
+        records = [_queue.get()]
+        # zbieramy wszystko co już czeka — jeden zapis na paczkę
+        while True:
+            try:
+                records.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        lines = []
+        for record in records:
+            if record is _STOP:
+                stop = True
+                continue
+            created, level, message = record
+            now = datetime.datetime.fromtimestamp(created)
+            hour = now.strftime("%Y-%m-%d_%H")
+
+            # nowa godzina → nowy plik
+            if hour != current_hour:
+                if handle is not None:
+                    handle.write("".join(lines))
+                    handle.close()
+                    lines = []
+                try:
+                    os.makedirs(LOG_DIR, exist_ok=True)
+                    handle = open(os.path.join(LOG_DIR, f"{hour}.log"), "a", encoding="utf-8")
+                    current_hour = hour
+                except OSError as e:
+                    print(f"⚠️ Nie można otworzyć pliku logu: {e}")
+                    handle = None
+
+            prefix = "" if level == INFO else f"[{_level_name(level)}] "
+            lines.append(now.strftime("[%Y-%m-%d %H:%M:%S] ") + prefix + str(message) + "\n")
+
+        if handle is not None and lines:
+            try:
+                handle.write("".join(lines))
+                handle.flush()
+            except OSError as e:
+                print(f"⚠️ Błąd zapisu logu: {e}")
+
+        for _ in records:
+            _queue.task_done()
+
+    if handle is not None:
+        handle.close()
+
+
+def _level_name(level):
+    for name, value in _LEVEL_NAMES.items():
+        if value == level:
+            return name
+    return str(level)
+
+
+def _reset_after_fork():
+    # wątek zapisu nie przeżywa fork() — proces potomny startuje własny
+    global _queue, _writer, _writer_lock
+    _queue = queue.Queue()
+    _writer = None
+    _writer_lock = threading.Lock()
+#endregion
+
+
+atexit.register(shutdown)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
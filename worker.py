@@ -0,0 +1,8 @@
+from core.worker import main
+from db.db_init import initialize_database
+
+if __name__ == "__main__":
+    # tworzymy brakujące tabele / kolumny
+    initialize_database()
+    # uruchamiamy workery przetwarzające eventy (bez menu)
+    main()